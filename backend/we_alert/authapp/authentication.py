@@ -0,0 +1,159 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10_000,
+    # entries are dropped at token expiry or after this long, whichever comes first
+    'MAX_TTL_SECONDS': 300,
+}
+
+
+def auth_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'JWT_AUTH_CACHE', {})}
+
+
+class TokenCache:
+    """LRU of raw token -> (user, validated token), with per-entry expiry and a per-user index."""
+
+    def __init__(self, max_entries=DEFAULTS['MAX_ENTRIES'], max_ttl=DEFAULTS['MAX_TTL_SECONDS'], clock=time.time):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (user, token, expires_at)
+        self._by_user = {}  # user pk -> set of keys
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self.key(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= self.clock():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, raw_token, user, token):
+        now = self.clock()
+        expires_at = min(float(token.get('exp', now)), now + self.max_ttl)
+        if expires_at <= now:
+            return
+        key = self.key(raw_token)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (user, token, expires_at)
+            self._by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[0].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[0].pk]
+
+    def invalidate_user(self, user_pk):
+        with self._lock:
+            for key in list(self._by_user.get(user_pk, ())):
+                self._discard(key)
+
+    def discard(self, raw_token):
+        with self._lock:
+            self._discard(self.key(raw_token))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                conf = auth_cache_settings()
+                _cache = TokenCache(conf['MAX_ENTRIES'], conf['MAX_TTL_SECONDS'])
+    return _cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that skips signature checks and the user query for tokens seen recently.
+
+    Each request gets its own copy of the cached user, so views may modify it freely.
+    Entries go when the user is saved or deleted (authapp.signals) or the token is revoked.
+    Revocations live in the token blacklist tables, shared by all workers, so each request
+    still checks them: one indexed query in place of the signature check and user load.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return self.resolve(raw_token)
+
+    def resolve(self, raw_token):
+        cache = get_token_cache()
+        cached = cache.get(raw_token)
+        if cached is not None:
+            user, token = cached
+            # revoked, possibly by another worker, after this entry was cached
+            if is_revoked(token):
+                cache.discard(raw_token)
+                raise InvalidToken("Token has been revoked")
+            return copy.copy(user), token
+        token = self.get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken("Token has been revoked")
+        user = self.get_user(token)
+        cache.put(raw_token, copy.copy(user), token)
+        return user, token
+
+
+def is_revoked(token):
+    return BlacklistedToken.objects.filter(token__jti=token.get(jwt_settings.JTI_CLAIM)).exists()
+
+
+def revoke_token(raw_token, token):
+    """Blacklist an access token for every worker until it expires, as simplejwt does refresh tokens."""
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=token[jwt_settings.JTI_CLAIM],
+        defaults={
+            'user_id': token.get(jwt_settings.USER_ID_CLAIM),
+            'token': raw_token.decode() if isinstance(raw_token, bytes) else raw_token,
+            'expires_at': datetime_from_epoch(token['exp']),
+        },
+    )
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    get_token_cache().discard(raw_token)
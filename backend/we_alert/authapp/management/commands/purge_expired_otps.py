@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from authapp.otp import DatabaseOTPStore, get_otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired OTP rows and sweep the configured OTP store"
+
+    def handle(self, *args, **options):
+        # the table is cleaned whatever the backend, for rows left from before it changed
+        rows = DatabaseOTPStore().sweep()
+        store = get_otp_store()
+        swept = 0 if isinstance(store, DatabaseOTPStore) else store.sweep()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {rows} expired OTP rows, swept {swept} cached codes"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0002_customuser_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['user', 'created_at'], name='authapp_otp_user_id_18cc0f_idx'),
+        ),
+    ]
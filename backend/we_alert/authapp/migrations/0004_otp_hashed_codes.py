@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otp',
+            name='otp',
+            field=models.CharField(max_length=64),
+        ),
+    ]
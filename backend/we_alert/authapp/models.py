@@ -33,12 +33,17 @@ class CustomUser(AbstractBaseUser,PermissionsMixin):
 
 class OTP(models.Model):
     user=models.ForeignKey(CustomUser,on_delete=models.CASCADE)
-    otp=models.CharField(max_length=6)
+    # HMAC-SHA256 of the code (authapp.otp.hash_code), never the code itself
+    otp=models.CharField(max_length=64)
     created_at=models.DateTimeField(auto_now_add=True)
     expires_at=models.DateTimeField()
     attempts=models.IntegerField(default=0)
     is_verified=models.BooleanField(default=False)
 
+    class Meta:
+        # the latest OTP of a user is what VerifyOTPView checks
+        indexes=[models.Index(fields=['user','created_at'])]
+
     def  is_valid(self):
         return timezone.now() < self.expires_at and not self.is_verified 
     def __str__(self):
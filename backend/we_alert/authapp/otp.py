@@ -0,0 +1,308 @@
+import hashlib
+import heapq
+import hmac
+import socket
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.metrics import external_call
+
+DEFAULTS = {
+    'BACKEND': 'authapp.otp.DatabaseOTPStore',
+    'OPTIONS': {},
+    'TTL_SECONDS': 240,
+    'MAX_ATTEMPTS': 3,
+}
+# verify() outcomes
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+MISSING = 'missing'
+# expired codes are kept this long so a late verify says "expired" rather than "missing"
+EXPIRED_GRACE_SECONDS = 300
+
+
+def hash_code(phone_number, code):
+    # keyed with SECRET_KEY so a leaked store cannot be brute-forced offline
+    message = f"{phone_number}:{code}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+class InMemoryOTPStore:
+    """Codes held in this process only, for tests: other workers never see a code issued here."""
+
+    def __init__(self, sweep_interval=30.0, clock=time.time):
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._codes = {}  # phone -> [code hash, expires_at, attempts]
+        self._expiries = []  # heap of (forget_at, phone, expires_at)
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self):
+        return len(self._codes)
+
+    def issue(self, phone_number, code, ttl):
+        now = self.clock()
+        expires_at = now + ttl
+        with self._lock:
+            self._codes[phone_number] = [hash_code(phone_number, code), expires_at, 0]
+            heapq.heappush(self._expiries, (expires_at + EXPIRED_GRACE_SECONDS, phone_number, expires_at))
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def verify(self, phone_number, code, max_attempts):
+        now = self.clock()
+        with self._lock:
+            entry = self._codes.get(phone_number)
+            if entry is None:
+                return MISSING
+            code_hash, expires_at, attempts = entry
+            entry[2] = attempts = attempts + 1
+            if attempts > max_attempts:
+                return LOCKED
+            if now >= expires_at:
+                return EXPIRED
+            if not hmac.compare_digest(code_hash, hash_code(phone_number, code)):
+                return INVALID
+            del self._codes[phone_number]
+            return VERIFIED
+
+    def _sweep(self, now):
+        removed = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            _, phone_number, expires_at = heapq.heappop(self._expiries)
+            entry = self._codes.get(phone_number)
+            # a newer code for the same number has its own heap entry
+            if entry is not None and entry[1] == expires_at:
+                del self._codes[phone_number]
+                removed += 1
+        self._next_sweep = now + self.sweep_interval
+        return removed
+
+    def sweep(self):
+        with self._lock:
+            return self._sweep(self.clock())
+
+
+class RedisError(Exception):
+    pass
+
+
+class RespClient:
+    """Minimal blocking Redis (RESP2) client, enough for the OTP store; one connection guarded by a lock."""
+
+    def __init__(self, url='redis://localhost:6379/0', timeout=2.0):
+        parts = urlparse(url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        if self.password:
+            self._call([('AUTH', self.password)])
+        if self.db:
+            self._call([('SELECT', self.db)])
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    @staticmethod
+    def _encode(args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(out)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Redis closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)[:-2]
+            return data.decode()
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def _call(self, commands):
+        self._sock.sendall(b''.join(self._encode(args) for args in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def pipeline(self, *commands):
+        """Send commands in one round trip; returns their replies. Reconnects once on a dropped connection."""
+        with self._lock, external_call():
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(commands)
+                except (ConnectionError, OSError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def execute(self, *args):
+        return self.pipeline(args)[0]
+
+    def transaction(self, *commands):
+        """MULTI ... EXEC in one round trip; returns the EXEC results."""
+        replies = self.pipeline(('MULTI',), *commands, ('EXEC',))
+        results = replies[-1]
+        if results is None:
+            raise RedisError("Transaction aborted")
+        for result in results:
+            if isinstance(result, RedisError):
+                raise result
+        return results
+
+
+class RedisOTPStore:
+    """Codes in Redis (or anything speaking its protocol), shared by every worker.
+
+    One hash per phone number holds the code hash, expiry and attempt count; Redis
+    expires the key itself, so there is nothing to sweep.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='otp:', client=None):
+        self.client = client or RespClient(url)
+        self.prefix = prefix
+
+    def _key(self, phone_number):
+        return f"{self.prefix}{phone_number}"
+
+    def issue(self, phone_number, code, ttl):
+        key = self._key(phone_number)
+        expires_ms = int((time.time() + ttl) * 1000)
+        self.client.transaction(
+            ('DEL', key),
+            ('HSET', key, 'code', hash_code(phone_number, code), 'exp', expires_ms, 'attempts', 0),
+            ('PEXPIRE', key, int((ttl + EXPIRED_GRACE_SECONDS) * 1000)),
+        )
+
+    def verify(self, phone_number, code, max_attempts):
+        key = self._key(phone_number)
+        # HINCRBY counts the attempt atomically; on a missing key it creates a stub,
+        # which the NX expiry (only set when the key has none) cleans up
+        attempts, (code_hash, expires_ms), _ = self.client.transaction(
+            ('HINCRBY', key, 'attempts', 1),
+            ('HMGET', key, 'code', 'exp'),
+            ('PEXPIRE', key, EXPIRED_GRACE_SECONDS * 1000, 'NX'),
+        )
+        if code_hash is None:
+            # the NX expiry removes the stub; a DEL here could delete a code issued meanwhile
+            return MISSING
+        if attempts > max_attempts:
+            return LOCKED
+        if time.time() * 1000 >= int(expires_ms):
+            return EXPIRED
+        if not hmac.compare_digest(code_hash, hash_code(phone_number, code)):
+            return INVALID
+        # only one of two concurrent correct guesses gets to delete the key
+        return VERIFIED if self.client.execute('DEL', key) else MISSING
+
+    def sweep(self):
+        return 0
+
+
+class DatabaseOTPStore:
+    """Codes in the OTP table, hashed, with atomic attempt counting and expired-row cleanup."""
+
+    def __init__(self, sweep_interval=60.0):
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def issue(self, phone_number, code, ttl):
+        from .models import OTP, CustomUser
+        user = CustomUser.objects.get(phone_number=phone_number)
+        OTP.objects.create(user=user, otp=hash_code(phone_number, code), expires_at=timezone.now() + timedelta(seconds=ttl))
+        if time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    def verify(self, phone_number, code, max_attempts):
+        from .models import OTP
+        otp = (
+            OTP.objects.filter(user__phone_number=phone_number)
+            .order_by('-created_at').only('id', 'otp', 'expires_at', 'is_verified').first()
+        )
+        if otp is None or otp.is_verified:
+            return MISSING
+        if not OTP.objects.filter(pk=otp.pk, attempts__lt=max_attempts).update(attempts=F('attempts') + 1):
+            return LOCKED
+        if timezone.now() >= otp.expires_at:
+            return EXPIRED
+        if not hmac.compare_digest(otp.otp, hash_code(phone_number, code)):
+            return INVALID
+        if not OTP.objects.filter(pk=otp.pk, is_verified=False).update(is_verified=True):
+            return MISSING
+        return VERIFIED
+
+    def sweep(self):
+        from .models import OTP
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        cutoff = timezone.now() - timedelta(seconds=EXPIRED_GRACE_SECONDS)
+        deleted, _ = OTP.objects.filter(expires_at__lt=cutoff).delete()
+        return deleted
+
+
+def otp_settings():
+    return {**DEFAULTS, **getattr(settings, 'OTP_STORE', {})}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                conf = otp_settings()
+                _store = import_string(conf['BACKEND'])(**conf['OPTIONS'])
+    return _store
+
+
+def set_otp_store(store):
+    global _store
+    with _store_lock:
+        _store = store
@@ -1,3 +1,364 @@
-from django.test import TestCase
+import socketserver
+import threading
+import time
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.notifications import FakeTransport, NotificationDispatcher, set_dispatcher
+from core.throttling import DEFAULTS as RATE_LIMIT_DEFAULTS
+from core.throttling import get_limiter, reset_limiters
+
+from .authentication import TokenCache, get_token_cache, revoke_token
+from .models import OTP, CustomUser
+from .otp import (
+    EXPIRED, INVALID, LOCKED, MISSING, VERIFIED, DatabaseOTPStore, InMemoryOTPStore, RedisOTPStore,
+    RespClient, get_otp_store, hash_code, set_otp_store,
+)
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """Speaks just enough RESP2 for RedisOTPStore: hashes, DEL, PEXPIRE [NX] and MULTI/EXEC."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.expiry = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def live(self, key):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+    def run(self, args):
+        command, args = args[0].upper(), args[1:]
+        if command in ('PING', 'SELECT', 'AUTH'):
+            return 'OK'
+        if command == 'DEL':
+            removed = 0
+            for key in args:
+                removed += self.live(key) is not None
+                self.data.pop(key, None)
+                self.expiry.pop(key, None)
+            return removed
+        if command == 'HSET':
+            values = self.data.setdefault(args[0], {})
+            for field, value in zip(args[1::2], args[2::2]):
+                values[field] = value
+            return len(args[1:]) // 2
+        if command == 'HMGET':
+            values = self.live(args[0]) or {}
+            return [values.get(field) for field in args[1:]]
+        if command == 'HINCRBY':
+            values = self.live(args[0])
+            if values is None:
+                values = self.data[args[0]] = {}
+            values[args[1]] = str(int(values.get(args[1], 0)) + int(args[2]))
+            return int(values[args[1]])
+        if command == 'PEXPIRE':
+            if self.live(args[0]) is None or (args[2:] and args[2].upper() == 'NX' and args[0] in self.expiry):
+                return 0
+            self.expiry[args[0]] = time.time() + int(args[1]) / 1000
+            return 1
+        if command == 'PTTL':
+            if self.live(args[0]) is None:
+                return -2
+            return int((self.expiry[args[0]] - time.time()) * 1000) if args[0] in self.expiry else -1
+        return RuntimeError(f"ERR unknown command '{command}'")
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def encode(self, reply):
+        if isinstance(reply, RuntimeError):
+            return f"-{reply}\r\n".encode()
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(self.encode(item) for item in reply)
+        if reply == 'OK' or reply == 'QUEUED':
+            return f"+{reply}\r\n".encode()
+        data = reply.encode()
+        return b'$%d\r\n%s\r\n' % (len(data), data)
+
+    def handle(self):
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == 'MULTI':
+                queued = []
+                reply = 'OK'
+            elif name == 'EXEC':
+                with self.server.lock:
+                    reply = [self.server.run(command) for command in queued]
+                queued = None
+            elif queued is not None:
+                queued.append(args)
+                reply = 'QUEUED'
+            else:
+                with self.server.lock:
+                    reply = self.server.run(args)
+            self.wfile.write(self.encode(reply))
+
+
+class OTPStoreContract:
+    """Behaviour every OTP store must share; subclasses provide make_store()."""
+
+    phone = '+919876543210'
+
+    def test_correct_code_verifies_once(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', 60)
+        self.assertEqual(store.verify(self.phone, '123456', 3), VERIFIED)
+        self.assertEqual(store.verify(self.phone, '123456', 3), MISSING)
+
+    def test_wrong_codes_lock_after_max_attempts(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', 60)
+        for _ in range(3):
+            self.assertEqual(store.verify(self.phone, '000000', 3), INVALID)
+        self.assertEqual(store.verify(self.phone, '123456', 3), LOCKED)
+
+    def test_new_code_replaces_old_one(self):
+        store = self.make_store()
+        store.issue(self.phone, '111111', 60)
+        store.verify(self.phone, '000000', 3)
+        store.issue(self.phone, '222222', 60)
+        self.assertEqual(store.verify(self.phone, '111111', 3), INVALID)
+        self.assertEqual(store.verify(self.phone, '222222', 3), VERIFIED)
+
+    def test_unknown_number(self):
+        self.assertEqual(self.make_store().verify('+910000000000', '123456', 3), MISSING)
+
+    def test_expired_code(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', -1)
+        self.assertEqual(store.verify(self.phone, '123456', 3), EXPIRED)
+
+
+class InMemoryOTPStoreTests(OTPStoreContract, TestCase):
+    def make_store(self):
+        return InMemoryOTPStore()
+
+    def test_sweep_forgets_expired_codes(self):
+        now = [1000.0]
+        store = InMemoryOTPStore(sweep_interval=10, clock=lambda: now[0])
+        store.issue(self.phone, '123456', 60)
+        store.issue('+911111111111', '123456', 600)
+        now[0] += 60 + 301
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(len(store), 1)
+
+
+class RedisOTPStoreTests(OTPStoreContract, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedis()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.data.clear()
+        self.server.expiry.clear()
+
+    def make_store(self):
+        return RedisOTPStore(self.server.url)
+
+    def test_codes_are_hashed_and_expire(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', 60)
+        stored = self.server.data[f"otp:{self.phone}"]
+        self.assertEqual(stored['code'], hash_code(self.phone, '123456'))
+        self.assertNotIn('123456', stored.values())
+        self.assertGreater(RespClient(self.server.url).execute('PTTL', f"otp:{self.phone}"), 60_000)
+
+    def test_verify_of_missing_key_leaves_only_an_expiring_stub(self):
+        store = self.make_store()
+        self.assertEqual(store.verify(self.phone, '123456', 3), MISSING)
+        self.assertEqual(self.server.data, {f"otp:{self.phone}": {'attempts': '1'}})
+        self.assertLessEqual(RespClient(self.server.url).execute('PTTL', f"otp:{self.phone}"), 300_000)
+        # a code sent after the failed attempt starts from scratch
+        store.issue(self.phone, '123456', 60)
+        self.assertEqual(store.verify(self.phone, '123456', 3), VERIFIED)
+
+    def test_concurrent_attempts_are_all_counted(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', 60)
+        threads = [threading.Thread(target=store.verify, args=(self.phone, '000000', 100)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.data[f"otp:{self.phone}"]['attempts'], '20')
+
+
+class DatabaseOTPStoreTests(OTPStoreContract, TestCase):
+    def setUp(self):
+        CustomUser.objects.create(phone_number=self.phone)
+
+    def make_store(self):
+        return DatabaseOTPStore()
+
+    def test_sweep_deletes_expired_rows(self):
+        store = self.make_store()
+        store.issue(self.phone, '123456', -400)
+        store.issue(self.phone, '654321', 60)
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(OTP.objects.count(), 1)
+
+
+class VerifyOTPViewTests(TestCase):
+    phone = '+919876543210'
+
+    def setUp(self):
+        CustomUser.objects.create(phone_number=self.phone)
+        reset_limiters()
+        self.store = InMemoryOTPStore()
+        set_otp_store(self.store)
+        self.addCleanup(set_otp_store, None)
+
+    def verify(self, code):
+        return APIClient().post('/api/auth/verify-otp/', {'phone_number': self.phone, 'otp': code})
+
+    @override_settings(OTP_STORE={'MAX_ATTEMPTS': 2})
+    def test_flow(self):
+        self.store.issue(self.phone, '123456', 60)
+        self.assertEqual(self.verify('000000').status_code, 400)
+        response = self.verify('123456')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data['token'])
+        self.assertEqual(self.verify('123456').status_code, 404)
+
+    def test_verify_does_not_touch_the_database(self):
+        self.store.issue(self.phone, '123456', 60)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.verify('000000').status_code, 400)
+
+    def test_default_store_is_shared_between_workers(self):
+        set_otp_store(None)
+        self.assertIsInstance(get_otp_store(), DatabaseOTPStore)
+        # a code issued by another worker's store verifies here
+        DatabaseOTPStore().issue(self.phone, '123456', 60)
+        self.assertEqual(self.verify('123456').status_code, 200)
+
+
+@override_settings(RATE_LIMITS={'RATES': {**RATE_LIMIT_DEFAULTS['RATES'], 'otp_phone': (2, 600)}})
+class SendOTPThrottleTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        self.addCleanup(reset_limiters)
+        set_otp_store(InMemoryOTPStore())
+        self.addCleanup(set_otp_store, None)
+        self.transport = FakeTransport()
+        set_dispatcher(NotificationDispatcher(self.transport))
+        self.addCleanup(set_dispatcher, None)
+
+    def test_sms_sends_are_limited_per_phone(self):
+        send = lambda phone: APIClient().post('/api/auth/send-otp/', {'phone_number': phone}).status_code
+        self.assertEqual([send('+919876543210') for _ in range(3)], [200, 200, 429])
+        self.assertEqual(send('+911111111111'), 200)
+        self.assertEqual(len(self.transport.sent), 3)
+
+    @override_settings(RATE_LIMITS={'RATES': {**RATE_LIMIT_DEFAULTS['RATES'], 'otp_phone': (2, 600), 'otp_ip': (3, 600)}})
+    def test_a_refused_phone_does_not_spend_the_ip_allowance(self):
+        send = lambda phone: APIClient().post('/api/auth/send-otp/', {'phone_number': phone}).status_code
+        self.assertEqual([send('+919876543210') for _ in range(3)], [200, 200, 429])
+        self.assertEqual([send('+911111111111'), send('+912222222222')], [200, 429])
+        # the IP refusal handed the phone's token back
+        self.assertEqual(get_limiter('otp_phone').take('+912222222222'), 0)
+        self.assertEqual(get_limiter('otp_phone').take('+912222222222'), 0)
+
+    @override_settings(RATE_LIMITS={'RATES': {**RATE_LIMIT_DEFAULTS['RATES'], 'otp_ip': (2, 600)}})
+    def test_forwarded_for_is_not_trusted_without_proxies(self):
+        codes = [
+            APIClient().post('/api/auth/send-otp/', {'phone_number': f'+91987654321{i}'}, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [200, 200, 429])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.client = APIClient()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access = self.refresh.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_user_is_loaded_once(self):
+        # revocation check, user, alerts
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 200)
+
+    def test_user_changes_invalidate(self):
+        self.client.get('/api/core/past-sos-alerts/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 401)
+
+    def test_logout_revokes_both_tokens(self):
+        self.client.get('/api/core/past-sos-alerts/')
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 400)
+        response = self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 401)
+        response = APIClient().post('/api/auth/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_needs_the_users_own_refresh_token(self):
+        other = RefreshToken.for_user(CustomUser.objects.create(phone_number='+919812345678'))
+        response = self.client.post('/api/auth/logout/', {'refresh': str(other)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 200)
+
+    def test_revocation_by_another_worker_is_seen_on_a_cache_hit(self):
+        raw = str(self.access)
+        self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 200)
+        self.assertIsNotNone(get_token_cache().get(raw))
+        # another process: the blacklist rows exist, this process's cache still holds the token
+        revoke_token(raw, self.access)
+        get_token_cache().put(raw, self.user, self.access)
+        self.assertEqual(self.client.get('/api/core/past-sos-alerts/').status_code, 401)
+        self.assertIsNone(get_token_cache().get(raw))
+
+    def test_entries_expire_with_the_token(self):
+        now = [1000.0]
+        cache = TokenCache(max_ttl=300, clock=lambda: now[0])
+        cache.put('raw', self.user, {'exp': 1010})
+        self.assertIsNotNone(cache.get('raw'))
+        now[0] = 1011
+        self.assertIsNone(cache.get('raw'))
+        self.assertEqual(len(cache), 0)
@@ -2,16 +2,22 @@ from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status, permissions, viewsets
-from .models import CustomUser, OTP
+from .models import CustomUser
+from .otp import EXPIRED, LOCKED, MISSING, VERIFIED, get_otp_store, otp_settings
 from .serializers import UserSerializer, OTPSerializer
 from django.utils import timezone
 from django.conf import settings
-from twilio.rest import Client
-from datetime import timedelta
-import random
+import secrets
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import CachedJWTAuthentication, revoke_token
+from core.notifications import send_sms
+from core.throttling import OTPSendThrottle, OTPVerifyIPThrottle
 
 class SendOTPView(APIView):
+    throttle_classes=[OTPSendThrottle]
+
     def post(self,request):
         phone_number=request.data.get('phone_number')
         if not phone_number:
@@ -19,33 +25,29 @@ class SendOTPView(APIView):
         
         user, created=CustomUser.objects.get_or_create(phone_number=phone_number)
 
-        code=str(random.randint(100000,999999))
-
-        expires_at=timezone.now()+timedelta(minutes=4)
-        otp=OTP.objects.create(user=user,otp=code,expires_at=expires_at)
+        code=str(secrets.randbelow(900000)+100000)
+        get_otp_store().issue(phone_number,code,otp_settings()['TTL_SECONDS'])
 
-        client=Client(settings.TWILIO_ACCOUNT_SID,settings.TWILIO_AUTH_TOKEN)
-        message = client.messages.create(
-            body=f"Your OTP is {code}",
-            from_ =settings.TWILIO_NUMBER,
-            to=phone_number
-        )
+        send_sms(phone_number,f"Your OTP is {code}")
         return Response({"message":"OTP sent sucessfully to your Number", "is_new_user":created},status=status.HTTP_200_OK)
 class VerifyOTPView(APIView):
+    throttle_classes=[OTPVerifyIPThrottle]
+
     def post(self,request):
         phone_number=request.data.get('phone_number')
         code=request.data.get('otp')
+        if not phone_number or not code:
+            return Response({"error":"Phone number and OTP are required"},status=status.HTTP_400_BAD_REQUEST)
         try:
-            user=CustomUser.objects.get(phone_number=phone_number)
-            otp=OTP.objects.filter(user=user).latest('created_at')
-
-            if otp.attempts>=3:
+            result=get_otp_store().verify(phone_number,str(code),otp_settings()['MAX_ATTEMPTS'])
+            if result==MISSING:
+                return Response({"error":"OTP does not exist"},status=status.HTTP_404_NOT_FOUND)
+            if result==LOCKED:
                 return Response({"error":"Maximum attempts exceeded"},status=status.HTTP_403_FORBIDDEN)
-            if not otp.is_valid():
+            if result==EXPIRED:
                 return Response({"error":"OTP expired"},status=status.HTTP_400_BAD_REQUEST)
-            if otp.otp==code:
-                otp.is_verified=True
-                otp.save()
+            if result==VERIFIED:
+                user=CustomUser.objects.get(phone_number=phone_number)
                 refresh = RefreshToken.for_user(user)
                 return Response({"message":"OTP verified successfully",
                     "token":{
@@ -57,11 +59,24 @@ class VerifyOTPView(APIView):
                         "name":user.name if user.name else None
                     }             },status=status.HTTP_200_OK)
             else:
-                otp.attempts+=1
-                otp.save()
                 return Response({"error":"Invalid OTP"},status=status.HTTP_400_BAD_REQUEST)
         except CustomUser.DoesNotExist:
             return Response({"error":"User does not exist"},status=status.HTTP_404_NOT_FOUND)
-        except OTP.DoesNotExist:
-            return Response({"error":"OTP does not exist"},status=status.HTTP_404_NOT_FOUND)
 
+
+class LogoutView(APIView):
+    permission_classes=[permissions.IsAuthenticated]
+
+    def post(self,request):
+        # both tokens are blacklisted for every worker: the access token stops working at once
+        # and the refresh token can no longer mint new ones
+        try:
+            refresh=RefreshToken(request.data.get('refresh') or '')
+        except TokenError:
+            return Response({"error":"A valid refresh token is required"},status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh.get(jwt_settings.USER_ID_CLAIM))!=str(request.user.pk):
+            return Response({"error":"Refresh token belongs to another user"},status=status.HTTP_400_BAD_REQUEST)
+        refresh.blacklist()
+        auth=CachedJWTAuthentication()
+        revoke_token(auth.get_raw_token(auth.get_header(request)),request.auth)
+        return Response({"message":"Logged out"},status=status.HTTP_200_OK)
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserSettings
+
+
+@admin.register(UserSettings)
+class UserSettingsAdmin(admin.ModelAdmin):
+    # where staff verify responders
+    list_display = ['user', 'available_as_responder']
+    list_filter = ['available_as_responder']
+    list_editable = ['available_as_responder']
+    search_fields = ['user__phone_number']
@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .heatmap import invalidate_points
+from .models import PastSOSAlert, SOSAlert
+from .routing import alert_hazard, hazards_changed
+
+ARCHIVED_FIELDS = ['id', 'user_id', 'timestamp', 'latitude', 'longitude', 'is_resolved']
+
+
+def archivable_alerts(older_than=timedelta(days=30), now=None):
+    cutoff = (now or timezone.now()) - older_than
+    return SOSAlert.objects.filter(Q(is_resolved=True) | Q(timestamp__lt=cutoff))
+
+
+def archive_chunk(queryset, chunk_size):
+    """Move one chunk of `queryset` into PastSOSAlert; returns the number of rows moved.
+
+    The rows are deleted with a single DELETE rather than through the collector, which would
+    read them again and run the per-row post_delete receivers inside the transaction; their
+    heatmap tiles and route hazards are cleared once per chunk after the commit instead.
+    """
+    with transaction.atomic():
+        rows = list(queryset.order_by('id').values_list(*ARCHIVED_FIELDS)[:chunk_size])
+        if not rows:
+            return 0
+        PastSOSAlert.objects.bulk_create([
+            PastSOSAlert(user_id=user_id, timestamp=timestamp, latitude=lat, longitude=lng, is_resolved=is_resolved)
+            for _, user_id, timestamp, lat, lng, is_resolved in rows
+        ])
+        deleted = SOSAlert.objects.filter(id__in=[row[0] for row in rows])
+        deleted._raw_delete(deleted.db)
+        points = [(lat, lng) for _, _, _, lat, lng, _ in rows]
+        transaction.on_commit(lambda: _forget_alerts(points))
+    return len(rows)
+
+
+def _forget_alerts(points):
+    invalidate_points(points)
+    hazards_changed(removed=[alert_hazard(lat, lng) for lat, lng in points])
+
+
+def archive_sos_alerts(older_than=timedelta(days=30), chunk_size=1000, pause=0.0, max_rows=None, progress=None):
+    """Archive resolved or old alerts in chunks, sleeping `pause` seconds between chunks.
+
+    Each chunk is its own transaction so writers to the hot table are only blocked
+    briefly. Returns (rows_moved, elapsed_seconds).
+    """
+    queryset = archivable_alerts(older_than)
+    moved = 0
+    start = time.perf_counter()
+    while max_rows is None or moved < max_rows:
+        size = chunk_size if max_rows is None else min(chunk_size, max_rows - moved)
+        count = archive_chunk(queryset, size)
+        moved += count
+        if progress is not None and count:
+            progress(moved, time.perf_counter() - start)
+        if count < size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved, time.perf_counter() - start
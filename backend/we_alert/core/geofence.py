@@ -0,0 +1,128 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from .geo import haversine_m_np
+from .models import SOSSession, UserSettings
+from .spatial import get_unsafe_area_index
+from .writer import write
+
+GeofenceEntry = namedtuple('GeofenceEntry', ['user_id', 'area_ids', 'latitude', 'longitude'])
+
+
+class GeofenceEngine:
+    """Tracks which UnsafeArea circles each user is inside and reports new entries.
+
+    Only users currently inside at least one area are kept in memory, so state stays
+    proportional to the number of people in unsafe areas rather than to all users.
+    """
+
+    def __init__(self, index=None):
+        self._index = index
+        self._inside = {}
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        return self._index if self._index is not None else get_unsafe_area_index()
+
+    def inside(self, user_id):
+        return self._inside.get(user_id, frozenset())
+
+    def forget(self, user_id):
+        with self._lock:
+            self._inside.pop(user_id, None)
+
+    def _containment(self, pings):
+        # candidate (ping, area) pairs come from the grid, the distance test runs over all pairs at once
+        index = self.index
+        ping_idx, area_ids, area_lat, area_lng, area_radius = [], [], [], [], []
+        for i, (_, lat, lng) in enumerate(pings):
+            for area_id in index.candidates(lat, lng):
+                area = index.get(area_id)
+                if area is None:
+                    continue
+                ping_idx.append(i)
+                area_ids.append(area_id)
+                area_lat.append(area[0])
+                area_lng.append(area[1])
+                area_radius.append(area[2])
+
+        containing = [set() for _ in pings]
+        if not ping_idx:
+            return containing
+
+        ping_idx = np.asarray(ping_idx, dtype=np.intp)
+        ping_lat = np.fromiter((p[1] for p in pings), dtype=np.float64, count=len(pings))
+        ping_lng = np.fromiter((p[2] for p in pings), dtype=np.float64, count=len(pings))
+        distance = haversine_m_np(ping_lat[ping_idx], ping_lng[ping_idx], area_lat, area_lng)
+        for k in np.flatnonzero(distance <= np.asarray(area_radius)):
+            containing[ping_idx[k]].add(area_ids[k])
+        return containing
+
+    def evaluate(self, pings):
+        """Feed a batch of (user_id, lat, lng) pings in arrival order.
+
+        Returns one GeofenceEntry per user that entered at least one new area during
+        the batch. A user who stays inside the same circle is not reported again.
+        """
+        pings = list(pings)
+        containing = self._containment(pings)
+        entries = {}
+        with self._lock:
+            for (user_id, lat, lng), now in zip(pings, containing):
+                entered = now - self._inside.get(user_id, frozenset())
+                if now:
+                    self._inside[user_id] = frozenset(now)
+                else:
+                    self._inside.pop(user_id, None)
+                if entered:
+                    previous = entries.get(user_id)
+                    area_ids = entered | previous.area_ids if previous else entered
+                    entries[user_id] = GeofenceEntry(user_id, frozenset(area_ids), lat, lng)
+        return list(entries.values())
+
+
+def open_auto_sessions(entries):
+    """Open an AUTO SOSSession for every entry whose user enabled auto_sos_in_unsafe_area.
+
+    Users that already have an active session are skipped.
+    """
+    by_user = {entry.user_id: entry for entry in entries}
+    if not by_user:
+        return []
+    # the setting decides whether an SOS goes out, so it is read fresh rather than from the user record cache
+    opted_in = set(
+        UserSettings.objects.filter(user_id__in=by_user, auto_sos_in_unsafe_area=True)
+        .values_list('user_id', flat=True)
+    )
+    if not opted_in:
+        return []
+    return write(_open_sessions, {user_id: by_user[user_id] for user_id in opted_in})
+
+
+def _open_sessions(entries):
+    # on the writer, so the active-session check and the inserts see the same database
+    active = set(
+        SOSSession.objects.filter(user_id__in=entries, is_active=True)
+        .values_list('user_id', flat=True)
+    )
+    # one save() per session rather than bulk_create, so post_save receivers (scores, ...) see them
+    return [
+        SOSSession.objects.create(
+            user_id=user_id,
+            current_latitude=entry.latitude,
+            current_longitude=entry.longitude,
+            activation_method='AUTO',
+        )
+        for user_id, entry in entries.items() if user_id not in active
+    ]
+
+
+geofence_engine = GeofenceEngine()
+
+
+def process_pings(pings, engine=None):
+    entries = (engine or geofence_engine).evaluate(pings)
+    return entries, open_auto_sessions(entries)
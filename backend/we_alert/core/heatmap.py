@@ -0,0 +1,216 @@
+import itertools
+import math
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .geo import METERS_PER_DEGREE_LAT
+from .spatial import get_unsafe_area_index
+
+TILE_SIZE = 256
+# a zoom-10 tile is ~40 km across; lower zooms would rasterize every alert in a country per tile
+MIN_ZOOM = 10
+MAX_ZOOM = 18
+# incident points (SOS alerts) are drawn as kernels of this radius
+INCIDENT_RADIUS_M = 250.0
+# density at which a pixel reaches full red
+SATURATION = 3.0
+# Web Mercator tiles stop here
+MAX_LATITUDE = 85.0511287798
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of an XYZ Web Mercator tile, in degrees."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_range(z, south, west, north, east):
+    """(x0, x1, y0, y1), the inclusive range of tiles at zoom z that the bbox covers."""
+    n = 2 ** z
+
+    def column(lng):
+        return min(max(int((lng + 180.0) / 360.0 * n), 0), n - 1)
+
+    def row(lat):
+        lat = math.radians(min(max(lat, -MAX_LATITUDE), MAX_LATITUDE))
+        return min(max(int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n), 0), n - 1)
+
+    return column(west), column(east), row(north), row(south)
+
+
+def pixel_coordinates(z, x, y, size=TILE_SIZE):
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lngs = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lats, lngs
+
+
+def _bbox_circle(south, west, north, east):
+    # centre and half-diagonal of a bbox, to query the circle index with
+    lat, lng = (south + north) / 2, (west + east) / 2
+    dy = (north - south) / 2 * METERS_PER_DEGREE_LAT
+    dx = (east - west) / 2 * METERS_PER_DEGREE_LAT * math.cos(math.radians(lat))
+    return lat, lng, math.hypot(dx, dy)
+
+
+def rasterize(lats, lngs, circles, points, point_radius=INCIDENT_RADIUS_M):
+    """Density grid for pixel centres lats x lngs.
+
+    circles: (lat, lng, radius_m) with a linear falloff to 0 at the edge;
+    points: (lat, lng) incidents drawn as gaussian kernels of point_radius.
+    """
+    grid = np.zeros((len(lats), len(lngs)), dtype=np.float32)
+    cos_lat = np.cos(np.radians(lats))[:, None]
+
+    def distances(lat, lng):
+        dy = (lats[:, None] - lat) * METERS_PER_DEGREE_LAT
+        dx = (lngs[None, :] - lng) * METERS_PER_DEGREE_LAT * cos_lat
+        return np.hypot(dx, dy)
+
+    for lat, lng, radius in circles:
+        if radius > 0:
+            grid += np.clip(1.0 - distances(lat, lng) / radius, 0.0, None)
+    sigma2 = (point_radius / 2) ** 2
+    for lat, lng in points:
+        grid += np.exp(-distances(lat, lng) ** 2 / (2 * sigma2))
+    return grid
+
+
+def colorize(grid, saturation=SATURATION):
+    """Green -> yellow -> red ramp, transparent where the density is zero."""
+    value = np.clip(grid / saturation, 0.0, 1.0)
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = np.clip(value * 2, 0, 1) * 255
+    rgba[..., 1] = np.clip(2 - value * 2, 0, 1) * 200
+    rgba[..., 3] = np.where(grid > 0.01, 80 + value * 150, 0)
+    return rgba
+
+
+def encode_png(rgba):
+    height, width, _ = rgba.shape
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6))
+        + chunk(b'IEND', b'')
+    )
+
+
+def tile_inputs(z, x, y):
+    from .models import SOSAlert
+    south, west, north, east = tile_bounds(z, x, y)
+    lat, lng, half_diagonal = _bbox_circle(south, west, north, east)
+    index = get_unsafe_area_index()
+    circles = [index.get(area_id) for area_id in index.query(lat, lng, half_diagonal)]
+    pad_lat = INCIDENT_RADIUS_M * 2 / METERS_PER_DEGREE_LAT
+    pad_lng = pad_lat / max(math.cos(math.radians(lat)), 0.01)
+    points = SOSAlert.objects.filter(
+        latitude__range=(south - pad_lat, north + pad_lat),
+        longitude__range=(west - pad_lng, east + pad_lng),
+    ).values_list('latitude', 'longitude')
+    return [c for c in circles if c is not None], list(points)
+
+
+def render_tile(z, x, y):
+    lats, lngs = pixel_coordinates(z, x, y)
+    circles, points = tile_inputs(z, x, y)
+    return encode_png(colorize(rasterize(lats, lngs, circles, points)))
+
+
+class TileCache:
+    """Thread-safe LRU of rendered tiles keyed by (z, x, y)."""
+
+    def __init__(self, max_tiles=4096):
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def invalidate_bbox(self, south, west, north, east):
+        """Drop only the cached tiles overlapping the bbox; returns how many were dropped.
+
+        Looks up the keys of the tiles the bbox covers at each zoom, unless there are more of
+        those than cached tiles (a huge area), in which case the cached keys are checked.
+        """
+        ranges = {z: tile_range(z, south, west, north, east) for z in range(MIN_ZOOM, MAX_ZOOM + 1)}
+        covered = sum((x1 - x0 + 1) * (y1 - y0 + 1) for x0, x1, y0, y1 in ranges.values())
+        with self._lock:
+            if covered <= len(self._tiles):
+                stale = [
+                    key for z, (x0, x1, y0, y1) in ranges.items()
+                    for key in itertools.product((z,), range(x0, x1 + 1), range(y0, y1 + 1))
+                    if key in self._tiles
+                ]
+            else:
+                stale = [
+                    (z, x, y) for z, x, y in self._tiles
+                    if z in ranges and ranges[z][0] <= x <= ranges[z][1] and ranges[z][2] <= y <= ranges[z][3]
+                ]
+            for key in stale:
+                del self._tiles[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+
+tile_cache = TileCache()
+
+
+def get_tile(z, x, y):
+    key = (z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = render_tile(z, x, y)
+        tile_cache.put(key, tile)
+    return tile
+
+
+def invalidate_circle(lat, lng, radius, point_radius=INCIDENT_RADIUS_M):
+    # a change also shows up as the kernel fringe around it
+    reach = radius + point_radius
+    dlat = reach / METERS_PER_DEGREE_LAT
+    dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+    return tile_cache.invalidate_bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+
+def invalidate_points(points, point_radius=INCIDENT_RADIUS_M):
+    """Clear the tiles of many incidents with one bbox, e.g. a chunk of archived alerts."""
+    if not points:
+        return 0
+    lats, lngs = zip(*points)
+    dlat = point_radius / METERS_PER_DEGREE_LAT
+    dlng = dlat / max(math.cos(math.radians(max(abs(min(lats)), abs(max(lats))))), 0.01)
+    return tile_cache.invalidate_bbox(min(lats) - dlat, min(lngs) - dlng, max(lats) + dlat, max(lngs) + dlng)
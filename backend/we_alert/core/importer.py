@@ -0,0 +1,210 @@
+import csv
+import io
+import os
+import re
+import time
+import zipfile
+from collections import namedtuple
+
+from django.db import transaction
+
+from .models import CrimeStats
+from .rollups import apply_rows
+
+ImportResult = namedtuple('ImportResult', ['records', 'created', 'updated', 'skipped', 'elapsed'])
+
+STATE_ALIASES = {
+    'a & n islands': 'Andaman and Nicobar Islands',
+    'a&n islands': 'Andaman and Nicobar Islands',
+    'andaman & nicobar islands': 'Andaman and Nicobar Islands',
+    'd&n haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'd & n haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'd&n haveli and daman & diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'daman & diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'delhi ut': 'Delhi',
+    'nct of delhi': 'Delhi',
+    'delhi (ut)': 'Delhi',
+    'j&k': 'Jammu and Kashmir',
+    'j & k': 'Jammu and Kashmir',
+    'jammu & kashmir': 'Jammu and Kashmir',
+    'orissa': 'Odisha',
+    'pondicherry': 'Puducherry',
+    'uttaranchal': 'Uttarakhand',
+}
+# column headers (normalised) for long-format files
+STATE_COLUMNS = {'state/ut', 'state_ut', 'state', 'states/uts', 'state/ut/city'}
+CRIME_COLUMNS = {'crime head', 'crime_head', 'crime heads', 'crime'}
+YEAR_COLUMNS = {'year'}
+TOTAL_COLUMNS = {'total_cases', 'total cases', 'cases', 'total'}
+SKIPPED_STATE_PREFIXES = ('total', 'grand total')
+
+_spaces = re.compile(r'\s+')
+_footnote = re.compile(r'[\s*#@]+$|\s*\(\s*\d+\s*\)$')
+_year = re.compile(r'^(?:19|20)\d\d$')
+
+
+def _clean(value):
+    return _spaces.sub(' ', str(value or '')).strip()
+
+
+def normalize_state(value):
+    name = _footnote.sub('', _clean(value))
+    alias = STATE_ALIASES.get(name.lower())
+    if alias:
+        return alias
+    return ' '.join(word if word.lower() in ('and', 'of') else word[:1].upper() + word[1:] for word in name.lower().split(' ')).replace(' & ', ' and ')
+
+
+def normalize_crime_head(value):
+    name = _footnote.sub('', _clean(value))
+    return name[:1].upper() + name[1:]
+
+
+def _parse_int(value):
+    text = _clean(value).replace(',', '')
+    if not text or text in ('-', 'NA', 'N.A.'):
+        return None
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+
+def iter_table(fileobj, filename):
+    """Yield rows (lists of cells) from a CSV or XLSX file without loading it whole."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+            from openpyxl.utils.exceptions import InvalidFileException
+        except ImportError:
+            raise ValueError("Reading .xlsx files requires openpyxl (pip install -r requirements.txt)")
+        try:
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+            # KeyError: a zip that is missing the workbook parts
+            raise ValueError(f"Not a readable .xlsx file: {e}")
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+        return
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV: {e}")
+
+
+def iter_records(rows):
+    """Turn raw table rows into (state_ut, crime_head, year, total_cases) records.
+
+    Accepts long files (state, crime head, year, total columns) and NCRB-style wide
+    files with one column per year. Rows whose state is a "Total ..." line are dropped.
+    """
+    rows = iter(rows)
+    header = None
+    for row in rows:
+        if any(_clean(cell) for cell in row):
+            header = [_clean(cell).lower() for cell in row]
+            break
+    if header is None:
+        return
+
+    def find(names):
+        return next((i for i, name in enumerate(header) if name in names), None)
+
+    state_col, crime_col = find(STATE_COLUMNS), find(CRIME_COLUMNS)
+    if state_col is None or crime_col is None:
+        raise ValueError("File needs a State/UT column and a Crime Head column")
+    year_col, total_col = find(YEAR_COLUMNS), find(TOTAL_COLUMNS)
+    wide_years = [(i, int(name)) for i, name in enumerate(header) if _year.match(name)]
+    if year_col is None and not wide_years:
+        raise ValueError("File needs a Year column or one column per year")
+
+    for row in rows:
+        if len(row) <= max(state_col, crime_col):
+            yield None
+            continue
+        state = normalize_state(row[state_col])
+        crime = normalize_crime_head(row[crime_col])
+        if not state or not crime or state.lower().startswith(SKIPPED_STATE_PREFIXES):
+            yield None
+            continue
+        if year_col is not None:
+            year = _parse_int(row[year_col]) if year_col < len(row) else None
+            total = _parse_int(row[total_col]) if total_col is not None and total_col < len(row) else None
+            yield (state, crime, year, total) if year and total is not None else None
+        else:
+            for i, year in wide_years:
+                total = _parse_int(row[i]) if i < len(row) else None
+                yield (state, crime, year, total) if total is not None else None
+
+
+def upsert_batch(records):
+    """Insert or update one batch of records keyed by (state_ut, crime_head, year)."""
+    latest = {}
+    for state, crime, year, total in records:
+        latest[(state, crime, year)] = total
+    existing = {
+        (row.state_ut, row.crime_head, row.year): row
+        for row in CrimeStats.objects.filter(
+            state_ut__in={k[0] for k in latest},
+            crime_head__in={k[1] for k in latest},
+            year__in={k[2] for k in latest},
+        ).only('id', 'state_ut', 'crime_head', 'year', 'total_cases')
+    }
+    to_create, to_update, retracted, added = [], [], [], []
+    for key, total in latest.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(CrimeStats(state_ut=key[0], crime_head=key[1], year=key[2], total_cases=total))
+            added.append((*key, total))
+        elif row.total_cases != total:
+            retracted.append((*key, row.total_cases))
+            added.append((*key, total))
+            row.total_cases = total
+            to_update.append(row)
+
+    # bulk operations skip model signals, so the rollups are kept in step here
+    with transaction.atomic():
+        CrimeStats.objects.bulk_create(to_create)
+        CrimeStats.objects.bulk_update(to_update, ['total_cases'])
+        apply_rows(retracted, sign=-1)
+        apply_rows(added)
+    return len(to_create), len(to_update)
+
+
+def import_crime_stats(fileobj, filename, batch_size=2000, progress=None):
+    start = time.perf_counter()
+    records = created = updated = skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal created, updated
+        c, u = upsert_batch(batch)
+        created += c
+        updated += u
+        batch.clear()
+        if progress is not None:
+            progress(ImportResult(records, created, updated, skipped, time.perf_counter() - start))
+
+    for record in iter_records(iter_table(fileobj, filename)):
+        records += 1
+        if record is None:
+            skipped += 1
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return ImportResult(records, created, updated, skipped, time.perf_counter() - start)
+
+
+def import_crime_stats_file(path, **kwargs):
+    with open(path, 'rb') as fileobj:
+        return import_crime_stats(fileobj, os.path.basename(path), **kwargs)
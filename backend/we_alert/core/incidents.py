@@ -0,0 +1,197 @@
+# Articles (the crawler's articles.jsonl) -> locality and date -> gazetteer
+# geocode -> clusters -> UnsafeArea. Only write_unsafe_areas touches Django, so
+# the extraction workers stay light.
+import csv
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from .geo import haversine_m, meters_to_degrees
+
+MONTHS = 'jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec'
+_body_date = re.compile(rf'\b(\d{{1,2}})\s+({MONTHS})[a-z]*,?\s+(\d{{4}})\b|\b({MONTHS})[a-z]*\s+(\d{{1,2}}),?\s+(\d{{4}})\b', re.I)
+# a locality named only as the seat of a court is not where the incident happened
+_court_after = re.compile(r'^\s*(?:district\s+|sessions\s+|family\s+)?courts?\b', re.I)
+
+
+class Gazetteer:
+    def __init__(self, places):
+        # places: {canonical name: (lat, lng, [aliases])}
+        self.places = {name: (lat, lng) for name, (lat, lng, _) in places.items()}
+        self.lookup = {}
+        for name, (_, _, aliases) in places.items():
+            for alias in [name, *aliases]:
+                self.lookup[alias.lower()] = name
+        names = sorted(self.lookup, key=len, reverse=True)
+        self.pattern = re.compile(r'\b(' + '|'.join(re.escape(n) for n in names) + r')\b', re.I)
+
+    @classmethod
+    def from_csv(cls, path):
+        places = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                aliases = [a.strip() for a in (row.get('aliases') or '').split('|') if a.strip()]
+                places[row['name'].strip()] = (float(row['latitude']), float(row['longitude']), aliases)
+        return cls(places)
+
+    def mentions(self, text):
+        for match in self.pattern.finditer(text):
+            if _court_after.match(text[match.end():match.end() + 24]):
+                continue
+            yield self.lookup[match.group(1).lower()]
+
+
+def extract_date(article):
+    published = (article.get('published') or '')[:10]
+    try:
+        return datetime.strptime(published, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        pass
+    match = _body_date.search(article.get('body') or '')
+    if not match:
+        return None
+    day, month, year = (match[1], match[2], match[3]) if match[1] else (match[5], match[4], match[6])
+    try:
+        return datetime.strptime(f"{day} {month[:3]} {year}", '%d %b %Y').date().isoformat()
+    except ValueError:
+        return None
+
+
+def extract_incident(article, gazetteer):
+    """One incident per article: its most mentioned locality, ties broken by first mention."""
+    text = f"{article.get('title') or ''}\n{article.get('body') or ''}"
+    counts = Counter(gazetteer.mentions(text))
+    result = {'url': article['url'], 'date': extract_date(article), 'locality': None}
+    if counts:
+        locality = counts.most_common(1)[0][0]
+        lat, lng = gazetteer.places[locality]
+        result.update(locality=locality, latitude=lat, longitude=lng)
+    return result
+
+
+_worker_gazetteer = None
+
+
+def _init_worker(gazetteer_path):
+    global _worker_gazetteer
+    _worker_gazetteer = Gazetteer.from_csv(gazetteer_path)
+
+
+def _extract_in_worker(article):
+    return extract_incident(article, _worker_gazetteer)
+
+
+def read_articles(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    return {record['url']: record for record in read_articles(path)}
+
+
+def extract_incidents(articles, gazetteer_path, cache_path, workers=None, batch_size=1000, progress=None):
+    """Extract every article not already in the cache; returns all cached incident records.
+
+    Articles are consumed in batches so memory does not grow with the input size.
+    """
+    cache = load_cache(cache_path)
+    pending = (a for a in articles if a.get('url') and a['url'] not in cache)
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(gazetteer_path,)) as pool, \
+            open(cache_path, 'a', encoding='utf-8') as cache_file:
+        while True:
+            batch = list(islice(pending, batch_size))
+            if not batch:
+                break
+            chunksize = max(1, len(batch) // ((workers or os.cpu_count() or 1) * 4))
+            for record in pool.map(_extract_in_worker, batch, chunksize=chunksize):
+                cache[record['url']] = record
+                cache_file.write(json.dumps(record) + '\n')
+            cache_file.flush()
+            processed += len(batch)
+            if progress is not None:
+                progress(processed)
+    return list(cache.values())
+
+
+def cluster_incidents(incidents, eps_m=750.0, base_radius_m=300.0, min_incidents=1):
+    """Group geocoded incidents whose points are within eps_m of each other (single linkage).
+
+    Returns dicts with name, latitude, longitude, radius and incidents; the circle is
+    centred on the incident-weighted mean and covers every point plus base_radius_m.
+    """
+    # geocoding snaps incidents to gazetteer points, so cluster distinct points with weights
+    weights = Counter()
+    localities = defaultdict(Counter)
+    for incident in incidents:
+        if incident.get('locality'):
+            point = (incident['latitude'], incident['longitude'])
+            weights[point] += 1
+            localities[point][incident['locality']] += 1
+    points = list(weights)
+    if not points:
+        return []
+    parent = list(range(len(points)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    dlat, dlng = meters_to_degrees(eps_m, points[0][0])
+    grid = defaultdict(list)
+    for i, (lat, lng) in enumerate(points):
+        grid[(math.floor(lat / dlat), math.floor(lng / dlng))].append(i)
+    for (row, col), members in grid.items():
+        neighbours = [j for dr in (-1, 0, 1) for dc in (-1, 0, 1) for j in grid.get((row + dr, col + dc), ())]
+        for i in members:
+            for j in neighbours:
+                if j > i and haversine_m(*points[i], *points[j]) <= eps_m:
+                    parent[find(j)] = find(i)
+
+    clusters = defaultdict(list)
+    for i, point in enumerate(points):
+        clusters[find(i)].append(point)
+    areas = []
+    for members in clusters.values():
+        count = sum(weights[p] for p in members)
+        if count < min_incidents:
+            continue
+        lat = sum(p[0] * weights[p] for p in members) / count
+        lng = sum(p[1] * weights[p] for p in members) / count
+        spread = max(haversine_m(lat, lng, *p) for p in members)
+        names = sum((localities[p] for p in members), Counter())
+        areas.append({
+            'name': names.most_common(1)[0][0],
+            'latitude': lat,
+            'longitude': lng,
+            'radius': spread + base_radius_m,
+            'incidents': count,
+        })
+    return sorted(areas, key=lambda a: -a['incidents'])
+
+
+def write_unsafe_areas(areas):
+    """Create or update UnsafeArea rows by name; returns (created, updated)."""
+    from .models import UnsafeArea
+    created = updated = 0
+    for area in areas:
+        _, was_created = UnsafeArea.objects.update_or_create(
+            name=area['name'],
+            defaults={'latitude': area['latitude'], 'longitude': area['longitude'], 'radius': area['radius']},
+        )
+        created += was_created
+        updated += not was_created
+    return created, updated
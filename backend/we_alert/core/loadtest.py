@@ -0,0 +1,194 @@
+import json
+import os
+import random
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from django.db import connection
+from rest_framework.test import APIClient
+
+from authapp.models import CustomUser
+
+from .models import CrimeStats, EmergencyContact, UnsafeArea
+from .notifications import FakeTransport
+
+Sample = namedtuple('Sample', ['endpoint', 'seconds', 'ok'])
+EndpointStats = namedtuple('EndpointStats', ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput'])
+
+# the order one simulated client walks through
+FLOW = ('send_otp', 'verify_otp', 'sos_create', 'location_update', 'trail', 'end_session')
+
+
+class SMSInbox(FakeTransport):
+    """FakeTransport that also remembers the last message per number, so clients can read their OTP."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        super().__init__(latency, failure_rate, seed)
+        self.latest = {}
+
+    def send(self, to, body):
+        message_id = super().send(to, body)
+        self.latest[to] = body
+        return message_id
+
+    def otp_for(self, phone_number):
+        return self.latest.get(phone_number, '').rsplit(' ', 1)[-1]
+
+
+@contextmanager
+def scratch_database(**overrides):
+    """Migrates a throwaway SQLite file and makes it the default database for the block.
+
+    `overrides` replace keys of the database settings (OPTIONS, CONN_MAX_AGE, ...) meanwhile.
+    """
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    saved = {key: settings_dict.get(key) for key in overrides}
+    scratch = tempfile.TemporaryDirectory(prefix='we_alert_load_')
+    settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(scratch.name, 'load.sqlite3')
+    settings_dict.update(overrides)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict.update(saved)
+        scratch.cleanup()
+
+
+def seed_load_data(users=1000, contacts_per_user=3, areas=500, crime_rows=5000, seed=0):
+    """Bulk-creates users with contacts, unsafe areas around Delhi and crime rows; returns the phone numbers."""
+    rng = random.Random(seed)
+    people = CustomUser.objects.bulk_create([CustomUser(phone_number=f'+91{7000000000 + i}') for i in range(users)])
+    EmergencyContact.objects.bulk_create([
+        EmergencyContact(user=user, name=f'Contact {i}', phone_number=f'+91{6000000000 + user.pk * 10 + i}', relationship='family')
+        for user in people for i in range(contacts_per_user)
+    ])
+    UnsafeArea.objects.bulk_create([
+        UnsafeArea(
+            name=f'Area {i}', latitude=rng.uniform(28.4, 28.8), longitude=rng.uniform(76.9, 77.4), radius=rng.uniform(100, 800),
+        )
+        for i in range(areas)
+    ])
+    states = [f'State {i}' for i in range(36)]
+    heads = [f'Crime head {i}' for i in range(40)]
+    CrimeStats.objects.bulk_create([
+        CrimeStats(state_ut=rng.choice(states), crime_head=rng.choice(heads), year=rng.randint(2001, 2022), total_cases=rng.randint(0, 5000))
+        for _ in range(crime_rows)
+    ])
+    return [user.phone_number for user in people]
+
+
+class LoadClient:
+    """One simulated phone driving the app in-process through Django's test client.
+
+    Timings cover middleware, authentication, views and the database, not an HTTP
+    server or the network.
+    """
+
+    def __init__(self, inbox, samples, remote_addr='127.0.0.1', seed=None):
+        self.inbox = inbox
+        self.samples = samples
+        self.client = APIClient(REMOTE_ADDR=remote_addr)
+        self.random = random.Random(seed)
+
+    def call(self, endpoint, method, path, data=None, expect=200):
+        start = time.perf_counter()
+        response = getattr(self.client, method)(path, data, format='json')
+        self.samples.append(Sample(endpoint, time.perf_counter() - start, response.status_code == expect))
+        return response if response.status_code == expect else None
+
+    def run_flow(self, phone_number, updates=5, trail_points=20):
+        """Log in with an OTP, raise an SOS, move around and end it. Returns False if a step failed."""
+        self.client.credentials()
+        if not self.call('send_otp', 'post', '/api/auth/send-otp/', {'phone_number': phone_number}):
+            return False
+        code = self.inbox.otp_for(phone_number)
+        response = self.call('verify_otp', 'post', '/api/auth/verify-otp/', {'phone_number': phone_number, 'otp': code})
+        if not response:
+            return False
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']['access']}")
+
+        lat, lng = self.random.uniform(28.4, 28.8), self.random.uniform(76.9, 77.4)
+        response = self.call('sos_create', 'post', '/api/core/sos-sessions/', {
+            'current_latitude': lat, 'current_longitude': lng, 'activation_method': 'MANUAL',
+        }, expect=201)
+        if not response:
+            return False
+        session_url = f"/api/core/sos-sessions/{response.data['id']}/"
+        now = time.time()
+        for step in range(updates):
+            lat += self.random.uniform(-0.0005, 0.0005)
+            lng += self.random.uniform(-0.0005, 0.0005)
+            self.call('location_update', 'patch', session_url, {'current_latitude': lat, 'current_longitude': lng})
+            points = [
+                {'latitude': lat, 'longitude': lng, 'timestamp': now + step * trail_points + i}
+                for i in range(trail_points)
+            ]
+            self.call('trail', 'post', f"{session_url}trail/", {'points': points}, expect=201)
+        return self.call('end_session', 'post', f"{session_url}end_session/") is not None
+
+
+def run_load(phone_numbers, inbox, clients=16, iterations=5, updates=5, trail_points=20):
+    """Runs `clients` threads, each doing `iterations` flows with its own numbers; returns (samples, seconds)."""
+    samples = []  # list.append is atomic, so the clients share it
+
+    def worker(index):
+        client = LoadClient(inbox, samples, remote_addr=f'10.0.{index // 250}.{index % 250 + 1}', seed=index)
+        try:
+            for i in range(iterations):
+                phone_number = phone_numbers[(index * iterations + i) % len(phone_numbers)]
+                client.run_flow(phone_number, updates, trail_points)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(clients)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """{endpoint: EndpointStats}, in FLOW order."""
+    stats = {}
+    for endpoint in FLOW:
+        seconds = np.array([s.seconds for s in samples if s.endpoint == endpoint])
+        if not len(seconds):
+            continue
+        p50, p95, p99 = np.percentile(seconds * 1000, [50, 95, 99])
+        errors = sum(1 for s in samples if s.endpoint == endpoint and not s.ok)
+        stats[endpoint] = EndpointStats(len(seconds), errors, float(p50), float(p95), float(p99), len(seconds) / elapsed)
+    return stats
+
+
+def save_baseline(path, stats, options=None):
+    with open(path, 'w') as f:
+        json.dump({'options': options or {}, 'endpoints': {name: s._asdict() for name, s in stats.items()}}, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {name: EndpointStats(**values) for name, values in data['endpoints'].items()}
+
+
+def regressions(stats, baseline, tolerance=0.25):
+    """Endpoints whose p95 or p99 grew, or throughput fell, by more than `tolerance` against the baseline."""
+    problems = []
+    for name, old in baseline.items():
+        new = stats.get(name)
+        if new is None:
+            problems.append(f"{name}: no requests")
+            continue
+        for field in ('p95_ms', 'p99_ms'):
+            if getattr(new, field) > getattr(old, field) * (1 + tolerance):
+                problems.append(f"{name}: {field} {getattr(old, field):.1f} -> {getattr(new, field):.1f}")
+        if new.throughput < old.throughput * (1 - tolerance):
+            problems.append(f"{name}: throughput {old.throughput:.1f}/s -> {new.throughput:.1f}/s")
+        if new.errors > old.errors:
+            problems.append(f"{name}: errors {old.errors} -> {new.errors}")
+    return problems
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_sos_alerts
+
+
+class Command(BaseCommand):
+    help = "Move resolved or old SOSAlert rows into PastSOSAlert in chunked transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=30, help="archive unresolved alerts older than this")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.05, help="pause between chunks, in seconds")
+        parser.add_argument('--max-rows', type=int, default=None)
+        parser.add_argument('--every', type=float, default=None, help="keep running, archiving every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            moved, elapsed = archive_sos_alerts(
+                older_than=timedelta(days=options['days']),
+                chunk_size=options['chunk_size'],
+                pause=options['sleep'],
+                max_rows=options['max_rows'],
+                progress=self.report if options['verbosity'] > 1 else None,
+            )
+            rate = moved / elapsed if elapsed else 0.0
+            self.stdout.write(f"Archived {moved} alerts in {elapsed:.2f}s ({rate:.0f} rows/s)")
+            if options['every'] is None:
+                break
+            time.sleep(options['every'])
+
+    def report(self, moved, elapsed):
+        self.stdout.write(f"  {moved} rows, {moved / elapsed:.0f} rows/s")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import SOSSession
+from core.query_plans import hot_queries, plan_problems, seed_hot_tables, time_query
+
+
+class Command(BaseCommand):
+    help = "Seed the hot tables inside a rolled-back transaction, then print the plan and timing of each hot query"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--sessions-per-user', type=int, default=20)
+        parser.add_argument('--otps-per-user', type=int, default=10)
+        parser.add_argument('--contacts-per-user', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        failed = False
+        with transaction.atomic():
+            users = seed_hot_tables(
+                options['users'], options['sessions_per_user'], options['otps_per_user'], options['contacts_per_user'],
+            )
+            user = users[len(users) // 2]
+            session_id = SOSSession.objects.filter(user=user).values_list('id', flat=True).first()
+            queries = hot_queries(user, [u.pk for u in users[:20]], session_id)
+            for name, queryset in queries.items():
+                problems, plan = plan_problems(queryset)
+                failed |= bool(problems)
+                mean = time_query(queryset, options['repeat'])
+                status = self.style.ERROR(', '.join(problems)) if problems else self.style.SUCCESS('ok')
+                self.stdout.write(f"{name:32} {mean * 1e6:8.1f}us  {status}")
+                self.stdout.write(f"    {plan}")
+            transaction.set_rollback(True)
+        if failed:
+            raise SystemExit(1)
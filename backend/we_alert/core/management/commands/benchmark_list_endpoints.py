@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from authapp.models import CustomUser
+from core.models import CrimeStats, SOSAlert, UnsafeArea
+from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from core.serializers import CrimeStatsSerializer, SOSAlertSerializer, UnsafeAreaSerializer, ValuesReader
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed list tables inside a rolled-back transaction, then compare rows/s of serializer + JSONRenderer "
+        "against the values() path with the fast JSON and MessagePack renderers, checking the JSON is identical"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no'}, msgpack: {'yes' if msgpack else 'no (not measured)'}")
+        rng = random.Random(0)
+        count = options['rows']
+        mismatched = False
+        with transaction.atomic():
+            user = CustomUser.objects.create(phone_number='+919999999999')
+            UnsafeArea.objects.bulk_create([
+                UnsafeArea(name=f'Area {i} – near the market', latitude=rng.uniform(8, 35), longitude=rng.uniform(68, 97), radius=rng.uniform(50, 2000))
+                for i in range(count)
+            ])
+            CrimeStats.objects.bulk_create([
+                CrimeStats(state_ut=f'State {i % 36}', crime_head=f'Head {i % 40}', year=2001 + i % 22, total_cases=rng.randint(0, 90000))
+                for i in range(count)
+            ])
+            SOSAlert.objects.bulk_create([
+                SOSAlert(user=user, latitude=rng.uniform(8, 35), longitude=rng.uniform(68, 97), is_resolved=i % 3 == 0)
+                for i in range(count)
+            ])
+            cases = (
+                ('unsafe-areas', UnsafeArea.objects.order_by('-id'), UnsafeAreaSerializer),
+                ('crime-stats', CrimeStats.objects.order_by('-year', '-id'), CrimeStatsSerializer),
+                ('sos-alerts', SOSAlert.objects.filter(user=user).order_by('-timestamp', '-id'), SOSAlertSerializer),
+            )
+            self.stdout.write(f"{'endpoint':14} {'serializer':>12} {'values+json':>12} {'values+msgpack':>15} {'speedup':>8}  output")
+            for name, queryset, serializer_class in cases:
+                reader = ValuesReader.for_serializer(serializer_class())
+                expected = JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+                actual = FastJSONRenderer().render(reader.rows(reader.values(queryset)))
+                mismatched |= expected != actual
+
+                slow = self.rate(lambda: JSONRenderer().render(serializer_class(list(queryset), many=True).data), count, options['repeat'])
+                fast = self.rate(lambda: FastJSONRenderer().render(reader.rows(reader.values(queryset))), count, options['repeat'])
+                packed = self.rate(lambda: MessagePackRenderer().render(reader.rows(reader.values(queryset))), count, options['repeat']) if msgpack else None
+                status = self.style.SUCCESS('identical') if expected == actual else self.style.ERROR('DIFFERENT')
+                self.stdout.write(f"{name:14} {slow:10.0f}/s {fast:10.0f}/s {f'{packed:13.0f}/s' if packed is not None else '-':>15} {fast / slow:7.1f}x  {status}")
+            transaction.set_rollback(True)
+        if mismatched:
+            raise SystemExit(1)
+
+    @staticmethod
+    def rate(render, rows, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - start)
+        return rows / best
@@ -0,0 +1,66 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.routing import RoadGraph, SafeRouter
+
+
+def grid_graph(size, lat0=28.55, lng0=77.15, step=0.0009):
+    """size x size street grid (~100 m blocks) with slightly jittered nodes."""
+    rng = np.random.default_rng(0)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lats = lat0 + rows * step + rng.uniform(-step / 5, step / 5, size * size)
+    lngs = lng0 + cols * step + rng.uniform(-step / 5, step / 5, size * size)
+    ids = np.arange(size * size).reshape(size, size)
+    a = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    b = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    return RoadGraph.from_edges(lats, lngs, np.concatenate([a, b]), np.concatenate([b, a]))
+
+
+class Command(BaseCommand):
+    help = "Benchmark safe-route queries on a synthetic street grid or a compiled graph (no database access)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graph', help="compiled .npz graph; a synthetic grid is used otherwise")
+        parser.add_argument('--grid-size', type=int, default=300, help="nodes per side of the synthetic grid")
+        parser.add_argument('--areas', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--max-distance', type=float, default=5000.0, help="meters between endpoints")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        graph = RoadGraph.load(options['graph']) if options['graph'] else grid_graph(options['grid_size'])
+        router = SafeRouter(graph)
+        lat_min, lat_max = float(graph.lats.min()), float(graph.lats.max())
+        lng_min, lng_max = float(graph.lngs.min()), float(graph.lngs.max())
+        circles = [
+            (rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max), rng.uniform(100, 600), 1.0)
+            for _ in range(options['areas'])
+        ]
+        router.set_hazards(circles)
+        self.stdout.write(
+            f"{graph.node_count} nodes, {graph.edge_count} edges, {len(circles)} areas "
+            f"ready in {time.perf_counter() - start:.2f}s"
+        )
+
+        timings, lengths = [], []
+        while len(timings) < options['queries']:
+            source = rng.randrange(graph.node_count)
+            near = graph.nodes_near(graph.lats[source], graph.lngs[source], options['max_distance'])
+            target = int(near[rng.randrange(len(near))])
+            start = time.perf_counter()
+            route = router.route(source, target)
+            timings.append(time.perf_counter() - start)
+            if route:
+                lengths.append(route.length)
+
+        timings.sort()
+        pct = lambda p: timings[min(len(timings) - 1, int(p * len(timings)))] * 1e3
+        self.stdout.write(
+            f"{len(timings)} routes (mean {sum(lengths) / max(len(lengths), 1):.0f} m): "
+            f"mean {sum(timings) / len(timings) * 1e3:.1f}ms p50 {pct(0.50):.1f}ms p95 {pct(0.95):.1f}ms p99 {pct(0.99):.1f}ms"
+        )
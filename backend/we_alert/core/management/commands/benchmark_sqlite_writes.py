@@ -0,0 +1,109 @@
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test.utils import override_settings
+
+from authapp.models import CustomUser
+from core.loadtest import scratch_database
+from core.models import SOSSession
+from core.trails import append_points
+from core.writer import get_writer, reset_writer, write
+
+# what the database layer looked like before: rollback journal, deferred transactions,
+# a connection per request and every thread writing for itself
+MODES = {
+    'default': ({'OPTIONS': {}, 'CONN_MAX_AGE': 0}, False),
+    'wal': ({'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}), 'CONN_MAX_AGE': 600}, False),
+    'wal+writer': ({'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}), 'CONN_MAX_AGE': 600}, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare SQLite setups under parallel SOS write load (session create, location updates, trail batches) "
+        "with concurrent reads, each on a fresh scratch database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--sessions', type=int, default=10, help="sessions each thread opens")
+        parser.add_argument('--updates', type=int, default=5, help="location updates and trail batches per session")
+        parser.add_argument('--trail-points', type=int, default=20)
+        parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated subset of {', '.join(MODES)}")
+
+    def handle(self, *args, **options):
+        for mode in options['modes'].split(','):
+            overrides, batched = MODES[mode]
+            with scratch_database(**overrides), override_settings(DB_WRITER={'ENABLED': batched}):
+                users = CustomUser.objects.bulk_create(
+                    [CustomUser(phone_number=f'+91{7000000000 + i}') for i in range(options['threads'])]
+                )
+                connection.close()
+                try:
+                    timings, errors, elapsed = self.run_mode(users, options)
+                    batches = get_writer().batches if batched else None
+                finally:
+                    reset_writer()
+            self.report(mode, timings, errors, elapsed, batches)
+
+    def run_mode(self, users, options):
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+
+        def request(kind, fn, *args, **kwargs):
+            # each operation stands for one request: Django closes or recycles the connection around it
+            close_old_connections()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError:
+                errors[kind] += 1
+            finally:
+                timings[kind].append(time.perf_counter() - start)
+                close_old_connections()
+
+        def client(user):
+            rng = random.Random(user.pk)
+            try:
+                for _ in range(options['sessions']):
+                    lat, lng = rng.uniform(28.4, 28.8), rng.uniform(76.9, 77.4)
+                    session = request(
+                        'sos_create', write, SOSSession.objects.create,
+                        user=user, current_latitude=lat, current_longitude=lng, activation_method='MANUAL',
+                    )
+                    if session is None:
+                        continue
+                    for step in range(options['updates']):
+                        lat += rng.uniform(-0.0005, 0.0005)
+                        request(
+                            'location_update', write, SOSSession.objects.filter(pk=session.pk).update,
+                            current_latitude=lat, current_longitude=lng,
+                        )
+                        points = [(time.time() * 1000 + i, lat, lng) for i in range(options['trail_points'])]
+                        request('trail', write, append_points, session.pk, points)
+                        request('read', lambda: list(SOSSession.objects.filter(user=user).order_by('-start_time', '-id')[:20]))
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            list(pool.map(client, users))
+        return timings, errors, time.perf_counter() - start
+
+    def report(self, mode, timings, errors, elapsed, batches):
+        total = sum(len(t) for t in timings.values())
+        writes = total - len(timings['read'])
+        line = f"{mode}: {total} operations in {elapsed:.2f}s ({writes / elapsed:.0f} writes/s)"
+        if batches:
+            line += f", {writes / batches:.1f} writes per transaction"
+        self.stdout.write(self.style.MIGRATE_HEADING(line))
+        self.stdout.write(f"    {'operation':16} {'count':>6} {'locked':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind in ('sos_create', 'location_update', 'trail', 'read'):
+            p50, p95, p99 = np.percentile(np.array(timings[kind]) * 1000, [50, 95, 99])
+            self.stdout.write(f"    {kind:16} {len(timings[kind]):6d} {errors[kind]:6d} {p50:8.1f} {p95:8.1f} {p99:8.1f}")
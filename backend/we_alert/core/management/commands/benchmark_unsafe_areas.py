@@ -0,0 +1,46 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.spatial import UnsafeAreaIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark the in-process UnsafeArea grid index against synthetic areas (no database access)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--areas', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=10_000)
+        parser.add_argument('--query-radius', type=float, default=0.0, help="meters")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # mainland India bounding box
+        lat_min, lat_max, lng_min, lng_max = 8.0, 35.0, 68.0, 97.0
+
+        rows = (
+            (i, rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max), rng.uniform(50, 500))
+            for i in range(options['areas'])
+        )
+        start = time.perf_counter()
+        index = UnsafeAreaIndex.from_rows(rows)
+        build_s = time.perf_counter() - start
+        self.stdout.write(f"Built index of {len(index)} areas in {build_s:.2f}s")
+
+        points = [(rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max)) for _ in range(options['queries'])]
+        radius = options['query_radius']
+        timings = []
+        hits = 0
+        for lat, lng in points:
+            start = time.perf_counter()
+            hits += len(index.query(lat, lng, radius))
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        pct = lambda p: timings[min(len(timings) - 1, int(p * len(timings)))] * 1e6
+        self.stdout.write(
+            f"{len(points)} queries: mean {sum(timings) / len(timings) * 1e6:.1f}us "
+            f"p50 {pct(0.50):.1f}us p99 {pct(0.99):.1f}us, {hits / len(points):.1f} hits/query"
+        )
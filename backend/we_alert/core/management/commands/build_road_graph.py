@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.routing import RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Compile an OSM XML extract into the CSR road graph (.npz) used by the safe-route endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('osm_file')
+        parser.add_argument('output', help="path of the .npz to write; point ROUTING_GRAPH_PATH at it")
+        parser.add_argument('--oneway', action='store_true', help="respect oneway tags (off for walking)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        graph = RoadGraph.from_osm(options['osm_file'], oneway=options['oneway'])
+        graph.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{graph.node_count} nodes, {graph.edge_count} edges in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,52 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.incidents import cluster_incidents, extract_incidents, read_articles, write_unsafe_areas
+
+FIXTURES = Path(__file__).resolve().parent.parent.parent / 'fixtures'
+
+
+class Command(BaseCommand):
+    help = "Extract incident localities from crawled articles and cluster them into UnsafeArea circles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('articles', help="articles.jsonl written by unsafe_area_detect/mine.py")
+        parser.add_argument('--gazetteer', default=str(FIXTURES / 'delhi_gazetteer.csv'))
+        parser.add_argument('--cache', default=None, help="per-URL extraction cache (default: next to the articles file)")
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--eps', type=float, default=750.0, help="clustering distance, meters")
+        parser.add_argument('--base-radius', type=float, default=300.0, help="meters added around each cluster")
+        parser.add_argument('--min-incidents', type=int, default=2)
+        parser.add_argument('--dry-run', action='store_true', help="print the areas without saving them")
+
+    def handle(self, *args, **options):
+        articles_path = Path(options['articles'])
+        if not articles_path.exists():
+            raise CommandError(f"{articles_path} does not exist")
+        cache_path = options['cache'] or str(articles_path.with_name('incidents_cache.jsonl'))
+
+        start = time.perf_counter()
+        incidents = extract_incidents(
+            read_articles(articles_path),
+            options['gazetteer'],
+            cache_path,
+            workers=options['workers'],
+            progress=lambda n: self.stdout.write(f"  {n} new articles extracted"),
+        )
+        located = sum(1 for i in incidents if i.get('locality'))
+        self.stdout.write(f"{len(incidents)} articles, {located} geocoded, in {time.perf_counter() - start:.2f}s")
+
+        areas = cluster_incidents(
+            incidents,
+            eps_m=options['eps'],
+            base_radius_m=options['base_radius'],
+            min_incidents=options['min_incidents'],
+        )
+        for area in areas:
+            self.stdout.write(f"  {area['name']}: {area['incidents']} incidents, radius {area['radius']:.0f}m")
+        if options['dry_run']:
+            return
+        created, updated = write_unsafe_areas(areas)
+        self.stdout.write(self.style.SUCCESS(f"{created} unsafe areas created, {updated} updated"))
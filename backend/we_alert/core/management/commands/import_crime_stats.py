@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import import_crime_stats_file
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/XLSX NCRB-style crime table into CrimeStats, upserting in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            result = import_crime_stats_file(options['path'], batch_size=options['batch_size'], progress=self.report)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        rate = result.records / result.elapsed if result.elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.records} records ({result.created} created, {result.updated} updated, "
+            f"{result.skipped} skipped) in {result.elapsed:.2f}s, {rate:.0f} rows/s"
+        ))
+
+    def report(self, progress):
+        rate = progress.records / progress.elapsed if progress.elapsed else 0.0
+        self.stdout.write(f"  {progress.records} records read, {rate:.0f} rows/s")
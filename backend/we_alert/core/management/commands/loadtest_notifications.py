@@ -0,0 +1,49 @@
+import time
+from collections import Counter
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import FakeTransport, NotificationDispatcher
+
+
+class Command(BaseCommand):
+    help = "Load-test the SOS notification fan-out against the offline fake transport"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200)
+        parser.add_argument('--contacts', type=int, default=5, help="contacts per session")
+        parser.add_argument('--latency', type=float, default=0.2, help="seconds per simulated send")
+        parser.add_argument('--failure-rate', type=float, default=0.05)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--attempts', type=int, default=3)
+        parser.add_argument('--backoff', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        transport = FakeTransport(latency=options['latency'], failure_rate=options['failure_rate'], seed=1)
+        dispatcher = NotificationDispatcher(
+            transport,
+            max_workers=options['workers'],
+            max_attempts=options['attempts'],
+            backoff_seconds=options['backoff'],
+        )
+        start = time.perf_counter()
+        futures = []
+        for s in range(options['sessions']):
+            recipients = [f"+91{s:05d}{c:05d}" for c in range(options['contacts'])]
+            futures.extend(dispatcher.fan_out(f"SOS test {s}", recipients))
+        enqueue_s = time.perf_counter() - start
+        wait(futures)
+        elapsed = time.perf_counter() - start
+        dispatcher.shutdown()
+
+        results = [f.result() for f in futures]
+        statuses = Counter(r.status for r in results)
+        retries = sum(r.attempts - 1 for r in results)
+        sequential_s = len(results) * options['latency']
+        self.stdout.write(
+            f"{len(results)} messages in {elapsed:.2f}s ({len(results) / elapsed:.0f} msg/s), "
+            f"enqueue took {enqueue_s * 1000:.1f}ms"
+        )
+        self.stdout.write(f"status: {dict(statuses)}, retries: {retries}")
+        self.stdout.write(f"sequential sends would take ~{sequential_s:.1f}s")
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.loadtest import (
+    SMSInbox, load_baseline, regressions, run_load, save_baseline, scratch_database, seed_load_data, summarize,
+)
+from core.notifications import NotificationDispatcher, set_dispatcher
+from core.throttling import reset_limiters
+from core.writer import reset_writer
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive concurrent simulated clients through OTP login, SOS session, location updates and end_session "
+        "against a throwaway seeded database, with SMS going to a fake provider"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--contacts', type=int, default=3, help="emergency contacts per user")
+        parser.add_argument('--areas', type=int, default=1000)
+        parser.add_argument('--crime-rows', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=16, help="concurrent simulated clients")
+        parser.add_argument('--iterations', type=int, default=5, help="flows per client (at most 20 with the default OTP IP limit)")
+        parser.add_argument('--updates', type=int, default=5, help="location updates and trail batches per session")
+        parser.add_argument('--trail-points', type=int, default=20)
+        parser.add_argument('--sms-latency', type=float, default=0.05, help="seconds per fake SMS send")
+        parser.add_argument('--save-baseline', metavar='PATH', help="write the results as a baseline")
+        parser.add_argument('--baseline', metavar='PATH', help="compare against a saved baseline; exit 1 on regression")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown against the baseline")
+
+    def handle(self, *args, **options):
+        inbox = SMSInbox(latency=options['sms_latency'])
+        dispatcher = NotificationDispatcher(inbox, max_workers=16, backoff_seconds=0.05)
+        set_dispatcher(dispatcher)
+        reset_limiters()
+        try:
+            with scratch_database():
+                phone_numbers = seed_load_data(options['users'], options['contacts'], options['areas'], options['crime_rows'])
+                self.stdout.write(
+                    f"seeded {options['users']} users, {options['users'] * options['contacts']} contacts, "
+                    f"{options['areas']} areas, {options['crime_rows']} crime rows"
+                )
+                try:
+                    # the test client calls itself 'testserver'
+                    with override_settings(ALLOWED_HOSTS=['testserver']):
+                        samples, elapsed = run_load(
+                            phone_numbers, inbox, options['clients'], options['iterations'], options['updates'],
+                            options['trail_points'],
+                        )
+                finally:
+                    # both write to the scratch database, so finish before it goes
+                    dispatcher.shutdown()
+                    reset_writer()
+        finally:
+            set_dispatcher(None)
+            reset_limiters()
+
+        stats = summarize(samples, elapsed)
+        self.stdout.write(
+            f"{options['clients']} clients x {options['iterations']} flows, {len(samples)} requests in {elapsed:.2f}s, "
+            f"{len(inbox.sent)} SMS sent"
+        )
+        self.stdout.write(f"{'endpoint':16} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for name, s in stats.items():
+            self.stdout.write(
+                f"{name:16} {s.requests:8d} {s.errors:6d} {s.p50_ms:8.1f} {s.p95_ms:8.1f} {s.p99_ms:8.1f} {s.throughput:8.1f}"
+            )
+
+        if options['save_baseline']:
+            keys = ('users', 'contacts', 'areas', 'crime_rows', 'clients', 'iterations', 'updates', 'trail_points', 'sms_latency')
+            save_baseline(options['save_baseline'], stats, {key: options[key] for key in keys})
+            self.stdout.write(f"baseline written to {options['save_baseline']}")
+        if options['baseline']:
+            problems = regressions(stats, load_baseline(options['baseline']), options['tolerance'])
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            if problems:
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("no regressions against the baseline"))
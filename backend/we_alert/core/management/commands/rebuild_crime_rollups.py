@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute CrimeStatsRollup from the raw CrimeStats rows"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_rollups()
+        self.stdout.write(f"Rebuilt {count} rollup rows in {time.perf_counter() - start:.2f}s")
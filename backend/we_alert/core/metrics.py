@@ -0,0 +1,303 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+DEFAULTS = {
+    'ENABLED': True,
+    # set to sample the stacks of every request and keep the samples of those slower than this
+    'PROFILE_SLOW_MS': None,
+    'PROFILE_INTERVAL_MS': 5,
+    'PROFILE_KEEP': 50,
+}
+# histogram bucket upper bounds: milliseconds doubling from 50us to ~100s, and query counts
+TIME_BOUNDS_MS = tuple(0.05 * 2 ** i for i in range(22))
+COUNT_BOUNDS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64, 128, 256, 512, 1024)
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are the upper bound of the bucket they fall in, capped at the max seen."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=TIME_BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            # most requests make no external call and many render nothing
+            self.counts[0] += 1
+            return
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class RouteStats:
+    __slots__ = ('wall_ms', 'db_ms', 'queries', 'external_ms', 'serialize_ms', 'writer_ms', 'errors')
+
+    def __init__(self):
+        self.wall_ms = Histogram()
+        self.db_ms = Histogram()
+        self.queries = Histogram(COUNT_BOUNDS)
+        self.external_ms = Histogram()
+        self.serialize_ms = Histogram()
+        self.writer_ms = Histogram()
+        self.errors = 0
+
+    def snapshot(self):
+        stats = {name: getattr(self, name).snapshot() for name in self.__slots__[:-1]}
+        stats['errors'] = self.errors
+        return stats
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, status_code, wall, timings):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.wall_ms.add(wall * 1000)
+            stats.db_ms.add(timings.db * 1000)
+            stats.queries.add(timings.queries)
+            stats.external_ms.add(timings.external * 1000)
+            stats.serialize_ms.add(timings.serialize * 1000)
+            stats.writer_ms.add(timings.writer * 1000)
+            if status_code >= 500:
+                stats.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.snapshot() for route, stats in sorted(self._routes.items())}
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+class RequestTimings:
+    """Seconds spent in the database, external calls and serialization during one request.
+
+    writer is the time spent waiting on core.writer, queueing and commit included;
+    the queries of those jobs also count in db.
+    """
+
+    __slots__ = ('db', 'queries', 'external', 'serialize', 'writer', 'serializing')
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.external = 0.0
+        self.serialize = 0.0
+        self.writer = 0.0
+        self.serializing = False
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    # installed once per connection (core.signals) rather than per request, which is far cheaper
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(connection):
+    if metrics_settings()['ENABLED'] and time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def current_timings():
+    """The RequestTimings of the request being served, or None outside one."""
+    return _current.get()
+
+
+@contextmanager
+def external_call():
+    """Counts the time spent in the block (SMS, Redis, ...) against the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.external += time.perf_counter() - start
+
+
+def _fold(frame, limit=64):
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of threads serving requests every `interval` seconds.
+
+    The samples of a request are kept (as folded stacks, root first) only if it
+    turns out slow; everything else is dropped when the request ends.
+    """
+
+    def __init__(self, interval=0.005, keep=50):
+        self.interval = interval
+        self.slow = deque(maxlen=keep)
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def begin(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                    self._thread.start()
+        self._active[threading.get_ident()] = Counter()
+
+    def end(self):
+        return self._active.pop(threading.get_ident(), None)
+
+    def keep(self, route, wall_ms, samples):
+        self.slow.append({
+            'route': route,
+            'wall_ms': wall_ms,
+            'at': time.time(),
+            'samples': sum(samples.values()),
+            'stacks': [{'stack': stack, 'count': count} for stack, count in samples.most_common(10)],
+        })
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, samples in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples[_fold(frame)] += 1
+
+
+_registry = MetricsRegistry()
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_registry():
+    return _registry
+
+
+def get_profiler():
+    """The slow-request profiler, or None unless PROFILE_SLOW_MS is set."""
+    global _profiler
+    conf = metrics_settings()
+    if conf['PROFILE_SLOW_MS'] is None:
+        return None
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SlowRequestProfiler(conf['PROFILE_INTERVAL_MS'] / 1000, conf['PROFILE_KEEP'])
+    return _profiler
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f"{request.method} <unmatched>"
+    return f"{request.method} {match.view_name or match.route}"
+
+
+class InstrumentationMiddleware:
+    """Records wall, database, external-call and serialization time per route into get_registry().
+
+    Serialization covers serializer to_representation (see DynamicFieldsMixin) and
+    response rendering. Goes first in MIDDLEWARE so the other middleware is timed too.
+    """
+
+    def __init__(self, get_response):
+        conf = metrics_settings()
+        if not conf['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.registry = get_registry()
+        self.profiler = get_profiler()
+        self.slow_ms = conf['PROFILE_SLOW_MS']
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        if self.profiler is not None:
+            self.profiler.begin()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            wall = time.perf_counter() - start
+            _current.reset(token)
+            samples = self.profiler.end() if self.profiler is not None else None
+        route = route_name(request)
+        self.registry.record(route, response.status_code, wall, timings)
+        if samples is not None and wall * 1000 >= self.slow_ms:
+            self.profiler.keep(route, wall * 1000, samples)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns; the callback runs once they are
+        timings = _current.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.serialize += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_contactnotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrailChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_ms', models.BigIntegerField()),
+                ('end_ms', models.BigIntegerField()),
+                ('point_count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trail_chunks', to='core.sossession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['session', 'start_ms'], name='core_locati_session_fb2115_idx')],
+            },
+        ),
+    ]
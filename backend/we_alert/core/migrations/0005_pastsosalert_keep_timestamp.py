@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 16:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_locationtrailchunk'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pastsosalert',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_pastsosalert_keep_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrimeStatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_ut', models.CharField(blank=True, default='', max_length=255)),
+                ('crime_head', models.CharField(blank=True, default='', max_length=255)),
+                ('year', models.IntegerField(default=0)),
+                ('total_cases', models.BigIntegerField(default=0)),
+                ('row_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['crime_head', 'year'], name='core_crimes_crime_h_718af9_idx'), models.Index(fields=['year', 'state_ut'], name='core_crimes_year_a0acd0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('state_ut', 'crime_head', 'year'), name='unique_crime_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_crimestatsrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('AREA', 'Unsafe area'), ('CONTACT', 'Emergency contact')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='core_syncch_kind_42bdb0_idx'), models.Index(fields=['kind', 'user_id', 'id'], name='core_syncch_kind_bfe582_idx')],
+            },
+        ),
+    ]
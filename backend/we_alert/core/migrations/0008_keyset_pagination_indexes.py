@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 16:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_syncchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crimestats',
+            index=models.Index(fields=['year', 'id'], name='core_crimes_year_c98ad9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pastsosalert',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='core_pastso_user_id_7f019d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sosalert',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='core_sosale_user_id_1d5bc9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sossession',
+            index=models.Index(fields=['user', 'start_time', 'id'], name='core_sosses_user_id_9f69f8_idx'),
+        ),
+    ]
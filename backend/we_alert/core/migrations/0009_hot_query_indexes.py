@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 16:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emergencycontact',
+            index=models.Index(fields=['user', 'phone_number'], name='core_emerge_user_id_371996_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sossession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='sossession_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sossession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_time'], name='sossession_active_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersettings',
+            name='available_as_responder',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 17:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_summed_dimensions(apps, schema_editor):
+    # before this field, '' or 0 in a dimension was how a rollup said it summed over it
+    CrimeStatsRollup = apps.get_model('core', 'CrimeStatsRollup')
+    for bit, (dim, placeholder) in enumerate((('state_ut', ''), ('crime_head', ''), ('year', 0))):
+        CrimeStatsRollup.objects.filter(**{dim: placeholder}).update(rolled_up=F('rolled_up') + (1 << bit))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_usersettings_available_as_responder'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='crimestatsrollup',
+            name='unique_crime_rollup',
+        ),
+        migrations.AddField(
+            model_name='crimestatsrollup',
+            name='rolled_up',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_summed_dimensions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='crimestatsrollup',
+            constraint=models.UniqueConstraint(fields=('state_ut', 'crime_head', 'year', 'rolled_up'), name='unique_crime_rollup_key'),
+        ),
+    ]
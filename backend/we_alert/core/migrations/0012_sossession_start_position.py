@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_crimestatsrollup_rolled_up'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sossession',
+            name='start_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sossession',
+            name='start_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -10,16 +10,24 @@ class SOSAlert(models.Model):
     longitude=models.FloatField()
     is_resolved=models.BooleanField(default=False)
 
+    class Meta:
+        # keyset pagination of a user's alerts, newest first
+        indexes = [models.Index(fields=['user', 'timestamp', 'id'])]
+
     def __str__(self):
         return f" SOSAlert by {self.user.phone_number} at {self.timestamp}"
 
 class PastSOSAlert(models.Model):
     user=models.ForeignKey(CustomUser,on_delete=models.CASCADE)
-    timestamp=models.DateTimeField(auto_now_add=True)
+    # keeps the original SOSAlert timestamp when rows are archived
+    timestamp=models.DateTimeField(default=timezone.now)
     latitude=models.FloatField()
     longitude=models.FloatField()
     is_resolved=models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'timestamp', 'id'])]
+
     def __str__(self):
         return f" PastSOSAlert by {self.user.phone_number} at {self.timestamp}"
 
@@ -39,16 +47,47 @@ class CrimeStats(models.Model):
     year=models.IntegerField()
     total_cases=models.IntegerField()
 
+    class Meta:
+        indexes = [models.Index(fields=['year', 'id'])]
+
     def __str__(self):
         return f"{self.state_ut} - {self.crime_head} - {self.year}" 
 
 
+class CrimeStatsRollup(models.Model):
+    # precomputed sums maintained by core.rollups
+    state_ut = models.CharField(max_length=255, blank=True, default='')
+    crime_head = models.CharField(max_length=255, blank=True, default='')
+    year = models.IntegerField(default=0)
+    # bitmask of the dimensions summed over (1 state_ut, 2 crime_head, 4 year); those hold '' or 0
+    rolled_up = models.PositiveSmallIntegerField(default=0)
+    total_cases = models.BigIntegerField(default=0)
+    row_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['state_ut', 'crime_head', 'year', 'rolled_up'], name='unique_crime_rollup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['crime_head', 'year']),
+            models.Index(fields=['year', 'state_ut']),
+        ]
+
+    def __str__(self):
+        state_ut, crime_head, year = ('All' if self.rolled_up & 1 << i else value for i, value in enumerate((self.state_ut, self.crime_head, self.year)))
+        return f"{state_ut} - {crime_head} - {year}: {self.total_cases}"
+
+
 class EmergencyContact(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='emergency_contacts')
     name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=15)
     relationship = models.CharField(max_length=100)
-    
+
+    class Meta:
+        # "is this phone number one of the owner's contacts" (live location subscribers)
+        indexes = [models.Index(fields=['user', 'phone_number'])]
+
     def __str__(self):
         return f"{self.name} ({self.relationship}) - {self.phone_number}"
 
@@ -58,6 +97,9 @@ class UserSettings(models.Model):
     voice_detection_enabled = models.BooleanField(default=True)
     gesture_detection_enabled = models.BooleanField(default=True)
     auto_sos_in_unsafe_area = models.BooleanField(default=False)
+    # shares live pings with the nearby-responder index and gets texted about SOS sessions close by;
+    # set by staff (admin) once the user is verified, read-only through the API otherwise
+    available_as_responder = models.BooleanField(default=False)
     
     def __str__(self):
         return f"Settings for {self.user.phone_number}"
@@ -68,6 +110,9 @@ class SOSSession(models.Model):
     end_time = models.DateTimeField(null=True, blank=True)
     current_latitude = models.FloatField()
     current_longitude = models.FloatField()
+    # where the session was opened; current_* moves with every location update
+    start_latitude = models.FloatField(null=True, blank=True)
+    start_longitude = models.FloatField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     activation_method = models.CharField(max_length=50, choices=[
         ('VOICE', 'Voice Detection'),
@@ -75,12 +120,84 @@ class SOSSession(models.Model):
         ('MANUAL', 'Manual Activation'),
         ('AUTO', 'Automatic - Unsafe Area')
     ])
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_time', 'id']),
+            # only a handful of sessions are ever active, so these stay tiny
+            models.Index(fields=['user'], condition=models.Q(is_active=True), name='sossession_active_user_idx'),
+            models.Index(fields=['start_time'], condition=models.Q(is_active=True), name='sossession_active_time_idx'),
+        ]
+
     def __str__(self):
         return f"SOS Session by {self.user.phone_number} at {self.start_time}"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.start_latitude is None:
+            self.start_latitude, self.start_longitude = self.current_latitude, self.current_longitude
+        super().save(*args, **kwargs)
     
     def end_session(self):
         self.end_time = timezone.now()
         self.is_active = False
         self.save()
-     
+
+
+class ContactNotification(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+    session = models.ForeignKey(SOSSession, on_delete=models.CASCADE, related_name='notifications')
+    contact = models.ForeignKey(EmergencyContact, on_delete=models.SET_NULL, null=True, blank=True)
+    phone_number = models.CharField(max_length=15)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    provider_message_id = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.status} notification to {self.phone_number} for session {self.session_id}"
+
+
+class LocationTrailChunk(models.Model):
+    # points are delta-encoded by core.trails; one row holds up to a few minutes of trail
+    session = models.ForeignKey(SOSSession, on_delete=models.CASCADE, related_name='trail_chunks')
+    start_ms = models.BigIntegerField()
+    end_ms = models.BigIntegerField()
+    point_count = models.IntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['session', 'start_ms'])]
+
+    def __str__(self):
+        return f"{self.point_count} trail points for session {self.session_id}"
+
+
+
+class SyncChange(models.Model):
+    # change log for offline delta sync (core.offline): one row per object, replaced on every
+    # save or delete, so the auto id doubles as the sync version and the table stays small
+    KIND_CHOICES = [
+        ('AREA', 'Unsafe area'),
+        ('CONTACT', 'Emergency contact'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # owner of a contact, null for unsafe areas; not a foreign key so it survives the user's deletion cascade
+    user_id = models.BigIntegerField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'object_id']),
+            models.Index(fields=['kind', 'user_id', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {'deleted' if self.deleted else 'changed'} at version {self.id}"
@@ -0,0 +1,202 @@
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from authapp.models import CustomUser
+
+from .metrics import external_call
+from .models import ContactNotification, SOSSession
+from .usercache import get_emergency_contacts
+from .writer import write
+
+logger = logging.getLogger(__name__)
+
+DeliveryResult = namedtuple('DeliveryResult', ['to', 'status', 'attempts', 'message_id', 'error'])
+
+DEFAULTS = {
+    'TRANSPORT': 'core.notifications.TwilioTransport',
+    'MAX_WORKERS': 8,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 0.5,
+}
+
+
+class TwilioTransport:
+    """Sends SMS through one shared Twilio client whose HTTP session keeps connections alive."""
+
+    def __init__(self):
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+        self.client = Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=TwilioHttpClient(pool_connections=True, timeout=10),
+        )
+
+    def send(self, to, body):
+        message = self.client.messages.create(body=body, from_=settings.TWILIO_NUMBER, to=to)
+        return message.sid
+
+
+class FakeTransport:
+    """Offline transport for tests and load runs: sleeps `latency` seconds and fails at `failure_rate`."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise ConnectionError(f"Simulated delivery failure to {to}")
+            self.sent.append((to, body))
+            return f"FAKE{len(self.sent):08d}"
+
+
+class NotificationDispatcher:
+    def __init__(self, transport, max_workers=8, max_attempts=3, backoff_seconds=0.5):
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sos-notify')
+
+    def send(self, to, body):
+        """Deliver one message, retrying with exponential backoff and jitter."""
+        error = ''
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return DeliveryResult(to, 'SENT', attempt, self.transport.send(to, body), '')
+            except Exception as e:
+                error = str(e)
+                logger.warning("Attempt %d to notify %s failed: %s", attempt, to, error)
+                if attempt < self.max_attempts:
+                    time.sleep(self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        return DeliveryResult(to, 'FAILED', self.max_attempts, '', error)
+
+    def fan_out(self, body, recipients, on_result=None):
+        """Send `body` to every recipient concurrently; returns one future per recipient."""
+        def task(to):
+            result = self.send(to, body)
+            if on_result is not None:
+                on_result(result)
+            return result
+        return [self._executor.submit(task, to) for to in recipients]
+
+    def notify_contacts(self, session_id):
+        close_old_connections()
+        try:
+            session = SOSSession.objects.select_related('user').get(pk=session_id)
+        except SOSSession.DoesNotExist:
+            return []
+        contacts = get_emergency_contacts(session.user_id)
+        if not contacts:
+            return []
+        notifications = ContactNotification.objects.bulk_create([
+            ContactNotification(session=session, contact=contact, phone_number=contact.phone_number)
+            for contact in contacts
+        ])
+        body = sos_message(session)
+        return [self._executor.submit(self._deliver, n.pk, n.phone_number, body) for n in notifications]
+
+    def _deliver(self, notification_id, to, body):
+        result = self.send(to, body)
+        close_old_connections()
+        write(
+            ContactNotification.objects.filter(pk=notification_id).update,
+            status=result.status,
+            attempts=result.attempts,
+            provider_message_id=result.message_id,
+            error=result.error,
+            updated_at=timezone.now(),
+        )
+        return result
+
+    def notify_responders(self, session_id, responders):
+        """Text opted-in users near the session (responders is [(user id, meters)]); nothing is stored."""
+        close_old_connections()
+        try:
+            session = SOSSession.objects.get(pk=session_id)
+        except SOSSession.DoesNotExist:
+            return []
+        phone_numbers = dict(CustomUser.objects.filter(pk__in=[user_id for user_id, _ in responders]).values_list('pk', 'phone_number'))
+        return [
+            self._executor.submit(self.send, phone_numbers[user_id], responder_message(session, meters))
+            for user_id, meters in responders if user_id in phone_numbers
+        ]
+
+    def dispatch_sos(self, session_id):
+        """Queue the contact fan-out for a session and return immediately."""
+        return self._executor.submit(self.notify_contacts, session_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def sos_message(session):
+    return (
+        f"EMERGENCY ALERT: {session.user.phone_number} has triggered an SOS alert. "
+        f"They are located at coordinates: {session.current_latitude}, {session.current_longitude}. "
+        f"Please check on them immediately."
+    )
+
+
+def responder_message(session, meters):
+    return (
+        # no coordinates: responders are only known to be nearby, not to the victim
+        f"SOS NEARBY: someone about {round(meters, -1):.0f} m from you has triggered an SOS alert. "
+        f"If you can help safely, please call the police and stay alert."
+    )
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                conf = {**DEFAULTS, **getattr(settings, 'SOS_NOTIFICATIONS', {})}
+                _dispatcher = NotificationDispatcher(
+                    import_string(conf['TRANSPORT'])(),
+                    max_workers=conf['MAX_WORKERS'],
+                    max_attempts=conf['MAX_ATTEMPTS'],
+                    backoff_seconds=conf['BACKOFF_SECONDS'],
+                )
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher):
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
+
+
+def send_sms(to, body):
+    """Send one message now through the configured transport (no retries); returns the message id."""
+    with external_call():
+        return get_dispatcher().transport.send(to, body)
+
+
+def notify_sos_session(session):
+    # the worker reads the session back, so wait until it is committed
+    transaction.on_commit(lambda: get_dispatcher().dispatch_sos(session.pk))
+
+
+def notify_nearby_responders(session, responders):
+    if responders:
+        transaction.on_commit(lambda: get_dispatcher().notify_responders(session.pk, responders))
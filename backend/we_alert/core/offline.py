@@ -0,0 +1,145 @@
+import struct
+import zlib
+
+import numpy as np
+from django.db.models import Max
+
+from .models import EmergencyContact, SyncChange, UnsafeArea
+from .spatial import get_unsafe_area_index
+
+MAGIC = b'WASB'
+FORMAT_VERSION = 1
+CONTENT_TYPE = 'application/vnd.we-alert.bundle'
+# magic, format, flags, sync version, area / contact / deleted area / deleted contact counts
+HEADER = struct.Struct('<4sHHQIIII')
+FLAG_DELTA = 1
+AREA_DTYPE = np.dtype([('id', '<u4'), ('latitude', '<f4'), ('longitude', '<f4'), ('radius', '<f4')])
+
+
+def _pack_strings(values):
+    parts = []
+    for value in values:
+        data = value.encode('utf-8')[:0xffff]
+        parts.append(struct.pack('<H', len(data)) + data)
+    return b''.join(parts)
+
+
+def _unpack_strings(body, offset, count):
+    values = []
+    for _ in range(count):
+        (length,) = struct.unpack_from('<H', body, offset)
+        offset += 2
+        values.append(body[offset:offset + length].decode('utf-8'))
+        offset += length
+    return values, offset
+
+
+def encode_bundle(version, areas, contacts, deleted_areas=(), deleted_contacts=(), delta=False):
+    """Pack areas and contacts into the offline bundle format.
+
+    The header is followed by one zlib stream holding, in order: the area records
+    (uint32 id, float32 lat, lng, radius), area names, contact ids (uint32), contact
+    names, phone numbers and relationships (uint16 length + UTF-8 each), then the
+    deleted area and contact ids (uint32).
+    areas: (id, name, lat, lng, radius); contacts: (id, name, phone_number, relationship).
+    """
+    records = np.array([(a[0], a[2], a[3], a[4]) for a in areas], dtype=AREA_DTYPE)
+    body = b''.join([
+        records.tobytes(),
+        _pack_strings(a[1] for a in areas),
+        np.array([c[0] for c in contacts], dtype='<u4').tobytes(),
+        _pack_strings(c[1] for c in contacts),
+        _pack_strings(c[2] for c in contacts),
+        _pack_strings(c[3] for c in contacts),
+        np.array(list(deleted_areas), dtype='<u4').tobytes(),
+        np.array(list(deleted_contacts), dtype='<u4').tobytes(),
+    ])
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, FLAG_DELTA if delta else 0, version,
+        len(areas), len(contacts), len(deleted_areas), len(deleted_contacts),
+    )
+    return header + zlib.compress(body, 9)
+
+
+def decode_bundle(data):
+    """Inverse of encode_bundle, for tests and Python clients."""
+    magic, fmt, flags, version, n_areas, n_contacts, n_del_areas, n_del_contacts = HEADER.unpack_from(data)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        raise ValueError("Not a version 1 offline bundle")
+    body = zlib.decompress(data[HEADER.size:])
+    records = np.frombuffer(body, dtype=AREA_DTYPE, count=n_areas)
+    offset = records.nbytes
+    names, offset = _unpack_strings(body, offset, n_areas)
+    contact_ids = np.frombuffer(body, dtype='<u4', count=n_contacts, offset=offset)
+    offset += contact_ids.nbytes
+    contact_names, offset = _unpack_strings(body, offset, n_contacts)
+    phones, offset = _unpack_strings(body, offset, n_contacts)
+    relationships, offset = _unpack_strings(body, offset, n_contacts)
+    deleted_areas = np.frombuffer(body, dtype='<u4', count=n_del_areas, offset=offset)
+    offset += deleted_areas.nbytes
+    deleted_contacts = np.frombuffer(body, dtype='<u4', count=n_del_contacts, offset=offset)
+    return {
+        'version': version,
+        'delta': bool(flags & FLAG_DELTA),
+        'areas': [
+            (int(r['id']), name, float(r['latitude']), float(r['longitude']), float(r['radius']))
+            for r, name in zip(records, names)
+        ],
+        'contacts': list(zip(contact_ids.tolist(), contact_names, phones, relationships)),
+        'deleted_areas': deleted_areas.tolist(),
+        'deleted_contacts': deleted_contacts.tolist(),
+    }
+
+
+def record_change(kind, object_id, user_id=None, deleted=False):
+    # keep one row per object: the latest change wins a fresh, higher id
+    SyncChange.objects.filter(kind=kind, object_id=object_id).delete()
+    SyncChange.objects.create(kind=kind, object_id=object_id, user_id=user_id, deleted=deleted)
+
+
+def current_version():
+    return SyncChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def _area_rows(queryset):
+    return list(queryset.values_list('id', 'name', 'latitude', 'longitude', 'radius'))
+
+
+def _contact_rows(queryset):
+    return list(queryset.values_list('id', 'name', 'phone_number', 'relationship'))
+
+
+def build_bundle(user, region=None, since=None):
+    """Full bundle, or only what changed after sync version `since`.
+
+    region: (lat, lng, radius_m) restricting the areas; contacts are always the user's own.
+    A delta for a region lists areas that changed and now lie outside it as deleted;
+    it only covers the region asked for, so it must be the region of the previous bundle.
+    Returns (version, bundle bytes).
+    """
+    # read the version first: a change landing while the bundle is built is resent next time
+    version = current_version()
+    areas = UnsafeArea.objects.all()
+    if region is not None:
+        area_ids = get_unsafe_area_index().query(*region)
+        areas = areas.filter(id__in=area_ids) if area_ids else areas.none()
+    contacts = EmergencyContact.objects.filter(user=user)
+    if since is None:
+        return version, encode_bundle(version, _area_rows(areas.order_by('id')), _contact_rows(contacts.order_by('id')))
+
+    changes = SyncChange.objects.filter(id__gt=since, id__lte=version)
+    area_changes = dict(changes.filter(kind='AREA').values_list('object_id', 'deleted'))
+    contact_changes = dict(changes.filter(kind='CONTACT', user_id=user.id).values_list('object_id', 'deleted'))
+    changed_areas = [i for i, deleted in area_changes.items() if not deleted]
+    changed_contacts = [i for i, deleted in contact_changes.items() if not deleted]
+    area_rows = _area_rows(areas.filter(id__in=changed_areas).order_by('id')) if changed_areas else []
+    # a changed area missing from the rows has left the region: to this client it is gone
+    sent = {row[0] for row in area_rows}
+    return version, encode_bundle(
+        version,
+        area_rows,
+        _contact_rows(contacts.filter(id__in=changed_contacts).order_by('id')) if changed_contacts else [],
+        deleted_areas=sorted(i for i, deleted in area_changes.items() if deleted or i not in sent),
+        deleted_contacts=sorted(i for i, deleted in contact_changes.items() if deleted),
+        delta=True,
+    )
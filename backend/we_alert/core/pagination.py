@@ -0,0 +1,98 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor pagination on the view's `ordering` (default newest id first).
+
+    The cursor holds the ordering values of the last row served, so each page is a
+    range scan on an index over those columns rather than an OFFSET. Every ordering
+    field must sort the same way, and the last one must be unique (normally id).
+    """
+
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_ordering = ('-id',)
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'ordering', None) or self.default_ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, fields, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(view)
+        descending = ordering[0].startswith('-')
+        fields = [name.lstrip('-') for name in ordering]
+        self.request = request
+        self.fields = fields
+        self.page_size_value = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, fields, queryset.model)
+            lookup = 'lt' if descending else 'gt'
+            # (a, b) < (x, y)  <=>  a < x  or  (a = x and b < y)
+            after = Q()
+            for i, field in enumerate(fields):
+                after |= Q(**{f: v for f, v in zip(fields[:i], values[:i])}, **{f'{field}__{lookup}': values[i]})
+            queryset = queryset.filter(after)
+
+        rows = list(queryset.order_by(*ordering)[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.last_values = None
+        if rows:
+            last = rows[-1]
+            # rows are model instances, or dicts from the values() fast path
+            values = [last[field] for field in fields] if isinstance(last, dict) else [getattr(last, field) for field in fields]
+            self.last_values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_values))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
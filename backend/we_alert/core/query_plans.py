@@ -0,0 +1,61 @@
+# The hot lookups behind the SOS, geofence, streaming and OTP paths, plus helpers to
+# check their query plans. Used by the plan regression tests and benchmark_hot_queries.
+import re
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from authapp.models import OTP, CustomUser
+
+from .models import EmergencyContact, SOSSession
+
+# SQLite plans: "SEARCH t USING INDEX ..." is a lookup; "SCAN t", with or without an
+# index, walks the whole table
+_full_scan = re.compile(r'\bSCAN (\w+)')
+_temp_sort = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def hot_queries(user, other_user_ids=(), session_id=0):
+    """name -> unevaluated queryset, as issued by the views and services."""
+    user_ids = [user.pk, *other_user_ids]
+    return {
+        'sessions_by_user_newest_first': SOSSession.objects.filter(user=user).order_by('-start_time', '-id'),
+        'active_sessions_for_users': SOSSession.objects.filter(user_id__in=user_ids, is_active=True).values_list('user_id', flat=True),
+        'active_session_by_id': SOSSession.objects.filter(pk=session_id, is_active=True).values_list('user_id', flat=True),
+        'latest_otp_for_user': OTP.objects.filter(user=user).order_by('-created_at')[:1],
+        'contacts_by_user': EmergencyContact.objects.filter(user_id=user.pk),
+        'contact_by_user_and_phone': EmergencyContact.objects.filter(user_id=user.pk, phone_number=user.phone_number),
+    }
+
+
+def seed_hot_tables(users=50, sessions_per_user=10, otps_per_user=5, contacts_per_user=3):
+    people = CustomUser.objects.bulk_create([CustomUser(phone_number=f'+91{9000000000 + i}') for i in range(users)])
+    expires = timezone.now() + timedelta(minutes=4)
+    SOSSession.objects.bulk_create([
+        SOSSession(user=user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL', is_active=i == 0)
+        for user in people for i in range(sessions_per_user)
+    ])
+    OTP.objects.bulk_create([OTP(user=user, otp='123456', expires_at=expires) for user in people for _ in range(otps_per_user)])
+    EmergencyContact.objects.bulk_create([
+        EmergencyContact(user=user, name=f'Contact {i}', phone_number=f'+91{8000000000 + i}', relationship='friend')
+        for user in people for i in range(contacts_per_user)
+    ])
+    return people
+
+
+def plan_problems(queryset):
+    """Full scans or sorts in the plan of `queryset`; empty when it is index-backed."""
+    plan = queryset.explain()
+    problems = [f"full scan of {table}" for table in _full_scan.findall(plan)]
+    if _temp_sort.search(plan):
+        problems.append("sort without an index")
+    return problems, plan
+
+
+def time_query(queryset, repeat=200):
+    """Mean seconds to evaluate `queryset` (a fresh clone each time, so nothing is cached)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        list(queryset.all())
+    return (time.perf_counter() - start) / repeat
@@ -0,0 +1,55 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional (listed in requirements.txt); the stock encoder is used otherwise
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # listed in requirements.txt; settings only registers MessagePackRenderer when installed
+    msgpack = None
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed, producing the same bytes.
+
+    Dates, decimals and other non-JSON types still go through DRF's encoder. The one
+    difference is the exponent spelling of floats below 1e-4 or from 1e16 up (1e-05
+    becomes 0.00001), which parse to the same value. Indented (browsable/pretty) output
+    falls back to the stock renderer. orjson writes NaN and infinity as null where DRF
+    refuses them; the list endpoints check their float columns in ValuesReader instead.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # like DRF, escape the two characters that are valid JSON but not valid JavaScript
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """application/msgpack (or ?format=msgpack): the same data as the JSON response, in MessagePack.
+
+    Datetimes and other non-native values become the strings JSON would carry. Needs msgpack.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, datetime=False)
@@ -0,0 +1,178 @@
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .geo import METERS_PER_DEGREE_LAT, haversine_m, meters_to_degrees
+
+DEFAULTS = {
+    # ~1.1 km cells
+    'CELL_SIZE': 0.01,
+    # a position older than this is no longer where the responder is
+    'TTL_SECONDS': 120,
+    'RADIUS_M': 2000,
+    'MAX_RESPONDERS': 5,
+}
+
+
+def live_location_settings():
+    return {**DEFAULTS, **getattr(settings, 'LIVE_LOCATIONS', {})}
+
+
+class LiveLocationIndex:
+    """In-process grid of the latest position of each opted-in user, for "who is near this SOS".
+
+    update() is O(1): a user moves between two cell sets at most. Positions expire
+    `ttl` seconds after their last update; expiry walks a queue of updates in time
+    order, so it costs O(1) per update amortized rather than a scan of all users.
+    """
+
+    def __init__(self, cell_size=DEFAULTS['CELL_SIZE'], ttl=DEFAULTS['TTL_SECONDS'], clock=time.monotonic):
+        self.cell_size = cell_size
+        self.ttl = ttl
+        self.clock = clock
+        self._cells = {}
+        self._positions = {}  # user id -> (lat, lng, updated at, cell)
+        self._updates = deque()  # (updated at, user id), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._expire(self.clock())
+            return len(self._positions)
+
+    def _cell(self, lat, lng):
+        size = self.cell_size
+        return math.floor(lat / size), math.floor(lng / size)
+
+    def update(self, user_id, lat, lng):
+        # NaN fails these comparisons too; math.floor would raise on it inside the lock
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("coordinates out of range")
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            cell = self._cell(lat, lng)
+            previous = self._positions.get(user_id)
+            if previous is None or previous[3] != cell:
+                if previous is not None:
+                    self._leave(user_id, previous[3])
+                self._cells.setdefault(cell, set()).add(user_id)
+            self._positions[user_id] = (lat, lng, now, cell)
+            self._updates.append((now, user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            previous = self._positions.pop(user_id, None)
+            if previous is not None:
+                self._leave(user_id, previous[3])
+
+    def get(self, user_id):
+        """(lat, lng) of the user's live position, or None."""
+        with self._lock:
+            self._expire(self.clock())
+            position = self._positions.get(user_id)
+            return None if position is None else position[:2]
+
+    def _leave(self, user_id, cell):
+        bucket = self._cells[cell]
+        bucket.discard(user_id)
+        if not bucket:
+            del self._cells[cell]
+
+    def _expire(self, now):
+        updates = self._updates
+        while updates and now - updates[0][0] > self.ttl:
+            updated_at, user_id = updates.popleft()
+            position = self._positions.get(user_id)
+            # a later update queued its own entry; only the newest one expires the user
+            if position is not None and position[2] == updated_at:
+                del self._positions[user_id]
+                self._leave(user_id, position[3])
+
+    def _distances(self, lat, lng, cells, exclude):
+        positions = self._positions
+        for cell in cells:
+            for user_id in self._cells.get(cell, ()):
+                if user_id not in exclude:
+                    position = positions[user_id]
+                    yield haversine_m(lat, lng, position[0], position[1]), user_id
+
+    def within(self, lat, lng, radius, exclude=()):
+        """[(user id, meters)] of live positions within `radius` meters, nearest first."""
+        dlat, dlng = meters_to_degrees(radius, lat)
+        row_lo, col_lo = self._cell(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._cell(lat + dlat, lng + dlng)
+        cells = [(row, col) for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)]
+        with self._lock:
+            self._expire(self.clock())
+            found = [(d, user_id) for d, user_id in self._distances(lat, lng, cells, exclude) if d <= radius]
+        return [(user_id, d) for d, user_id in sorted(found)]
+
+    def nearest(self, lat, lng, k, max_radius, exclude=()):
+        """The k nearest live positions within `max_radius` meters as [(user id, meters)], nearest first.
+
+        Searches rings of cells outwards from the point's cell and stops once no
+        unvisited cell can be closer than the k-th match, so a dense city is not
+        scanned out to max_radius.
+        """
+        if k <= 0:
+            return []
+        row0, col0 = self._cell(lat, lng)
+        # meters per cell at the most poleward latitude within reach, so ring bounds stay lower bounds
+        reach_lat = min(abs(lat) + max_radius / METERS_PER_DEGREE_LAT, 89.0)
+        cell_m = self.cell_size * METERS_PER_DEGREE_LAT * math.cos(math.radians(reach_lat))
+        best = []  # max-heap of (-meters, user id), at most k
+        with self._lock:
+            self._expire(self.clock())
+            ring = 0
+            while True:
+                if ring == 0:
+                    cells = [(row0, col0)]
+                else:
+                    top, bottom = row0 - ring, row0 + ring
+                    cells = [(top, col) for col in range(col0 - ring, col0 + ring + 1)]
+                    cells += [(bottom, col) for col in range(col0 - ring, col0 + ring + 1)]
+                    cells += [(row, col) for row in range(top + 1, bottom) for col in (col0 - ring, col0 + ring)]
+                for d, user_id in self._distances(lat, lng, cells, exclude):
+                    if d > max_radius:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, user_id))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, user_id))
+                # every cell outside this ring is at least `ring` whole cells from the point
+                bound = ring * cell_m
+                if bound > max_radius or (len(best) == k and bound >= -best[0][0]) or not self._cells:
+                    break
+                ring += 1
+        return [(user_id, -d) for d, user_id in sorted(best, reverse=True)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_live_locations():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                conf = live_location_settings()
+                _index = LiveLocationIndex(conf['CELL_SIZE'], conf['TTL_SECONDS'])
+    return _index
+
+
+def reset_live_locations():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def nearby_responders(lat, lng, exclude=()):
+    """[(user id, meters)] of the closest responders to an SOS at (lat, lng), per LIVE_LOCATIONS."""
+    conf = live_location_settings()
+    return get_live_locations().nearest(lat, lng, conf['MAX_RESPONDERS'], conf['RADIUS_M'], exclude=exclude)
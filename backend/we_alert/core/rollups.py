@@ -0,0 +1,90 @@
+from collections import defaultdict
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import CrimeStats, CrimeStatsRollup
+
+DIMENSIONS = ('state_ut', 'crime_head', 'year')
+# what a rollup stores in a dimension it sums over; rolled_up, not this value, says which
+# dimensions those are, so raw rows with an empty state or year 0 stay distinct
+PLACEHOLDER = {'state_ut': '', 'crime_head': '', 'year': 0}
+
+
+def rolled_up_mask(dims):
+    return sum(1 << DIMENSIONS.index(dim) for dim in dims)
+
+
+def rollup_keys(state_ut, crime_head, year):
+    """All 8 (state_ut, crime_head, year, rolled_up) rollup keys a single CrimeStats row contributes to."""
+    values = (state_ut, crime_head, year)
+    for mask in range(1 << len(DIMENSIONS)):
+        yield tuple(
+            PLACEHOLDER[dim] if mask & (1 << i) else values[i] for i, dim in enumerate(DIMENSIONS)
+        ) + (mask,)
+
+
+def apply_rows(rows, sign=1):
+    """Add (sign=1) or remove (sign=-1) raw rows from the rollups.
+
+    rows: iterable of (state_ut, crime_head, year, total_cases). Deltas are summed
+    per key first, so a batch costs one UPDATE per touched key.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for state_ut, crime_head, year, total_cases in rows:
+        for key in rollup_keys(state_ut, crime_head, year):
+            deltas[key][0] += sign * total_cases
+            deltas[key][1] += sign
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        missing = []
+        for (state_ut, crime_head, year, rolled_up), (cases, count) in deltas.items():
+            # relative F() updates, so concurrent imports and saves cannot lose each other's counts
+            updated = CrimeStatsRollup.objects.filter(
+                state_ut=state_ut, crime_head=crime_head, year=year, rolled_up=rolled_up,
+            ).update(total_cases=F('total_cases') + cases, row_count=F('row_count') + count)
+            if not updated and count > 0:
+                missing.append(CrimeStatsRollup(
+                    state_ut=state_ut, crime_head=crime_head, year=year, rolled_up=rolled_up,
+                    total_cases=cases, row_count=count,
+                ))
+        CrimeStatsRollup.objects.bulk_create(missing, batch_size=1000)
+        if sign < 0:
+            CrimeStatsRollup.objects.filter(row_count__lte=0).delete()
+    return len(deltas)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from CrimeStats with one GROUP BY per dimension subset."""
+    rollups = []
+    for size in range(len(DIMENSIONS) + 1):
+        for grouped in combinations(DIMENSIONS, size):
+            if grouped:
+                totals = CrimeStats.objects.values(*grouped).annotate(total=Sum('total_cases'), n=Count('id')).order_by()
+            else:
+                # values() without fields would group by every column
+                totals = [CrimeStats.objects.aggregate(total=Sum('total_cases'), n=Count('id'))]
+            for row in totals:
+                if not row['n']:
+                    continue
+                key = {dim: row.get(dim, PLACEHOLDER[dim]) for dim in DIMENSIONS}
+                rolled_up = rolled_up_mask(dim for dim in DIMENSIONS if dim not in grouped)
+                rollups.append(CrimeStatsRollup(**key, rolled_up=rolled_up, total_cases=row['total'], row_count=row['n']))
+    with transaction.atomic():
+        CrimeStatsRollup.objects.all().delete()
+        CrimeStatsRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def query_rollups(filters, group_by=()):
+    """Rollup rows matching `filters`, broken down by the dimensions in `group_by`.
+
+    Dimensions that are neither filtered nor grouped are read from their summed rows,
+    so the answer is an index lookup and never touches CrimeStats.
+    """
+    summed = [dim for dim in DIMENSIONS if dim not in filters and dim not in group_by]
+    queryset = CrimeStatsRollup.objects.filter(**filters, rolled_up=rolled_up_mask(summed))
+    return queryset.order_by(*group_by)
@@ -0,0 +1,340 @@
+import heapq
+import logging
+import math
+import queue
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+import numpy as np
+
+from .geo import METERS_PER_DEGREE_LAT, haversine_m_np
+
+logger = logging.getLogger(__name__)
+
+# OSM highway values a pedestrian can use
+WALKABLE = {
+    'primary', 'primary_link', 'secondary', 'secondary_link', 'tertiary', 'tertiary_link',
+    'unclassified', 'residential', 'living_street', 'service', 'pedestrian', 'footway',
+    'path', 'steps', 'trunk', 'trunk_link', 'road', 'track', 'cycleway',
+}
+DEFAULT_SAFETY_WEIGHT = 4.0
+# each SOS alert counts as a small unsafe circle of this radius and weight
+ALERT_RADIUS_M = 200.0
+ALERT_WEIGHT = 0.5
+
+
+class RoadGraph:
+    """Directed road graph in CSR form.
+
+    Edges leaving node u are indices[indptr[u]:indptr[u + 1]], with their lengths in
+    meters at the same positions of `lengths`.
+    """
+
+    def __init__(self, lats, lngs, indptr, indices, lengths):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self._node_order = np.argsort(self.lats, kind='stable')
+        self._sorted_lats = self.lats[self._node_order]
+
+    @property
+    def node_count(self):
+        return len(self.lats)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, lats, lngs, sources, targets):
+        lats, lngs = np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64)
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        sources, targets = sources[order], targets[order]
+        indptr = np.zeros(len(lats) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(lats)), out=indptr[1:])
+        lengths = haversine_m_np(lats[sources], lngs[sources], lats[targets], lngs[targets])
+        return cls(lats, lngs, indptr, targets, lengths)
+
+    @classmethod
+    def from_osm(cls, path, oneway=False):
+        """Parse an OSM XML extract, keeping walkable highways and the nodes they use.
+
+        oneway=False treats every way as two-way, which is right for walking.
+        """
+        coords = {}
+        ways = []
+        for _, elem in ET.iterparse(path, events=('end',)):
+            if elem.tag == 'node':
+                coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+                elem.clear()
+            elif elem.tag == 'way':
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                if tags.get('highway') in WALKABLE:
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    ways.append((refs, oneway and tags.get('oneway') in ('yes', '1', 'true')))
+                elem.clear()
+
+        node_ids = {}
+        sources, targets = [], []
+        for refs, one_way in ways:
+            refs = [ref for ref in refs if ref in coords]
+            for a, b in zip(refs, refs[1:]):
+                ia = node_ids.setdefault(a, len(node_ids))
+                ib = node_ids.setdefault(b, len(node_ids))
+                sources.append(ia)
+                targets.append(ib)
+                if not one_way:
+                    sources.append(ib)
+                    targets.append(ia)
+        lats = np.empty(len(node_ids))
+        lngs = np.empty(len(node_ids))
+        for osm_id, i in node_ids.items():
+            lats[i], lngs[i] = coords[osm_id]
+        return cls.from_edges(lats, lngs, sources, targets)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['lats'], data['lngs'], data['indptr'], data['indices'], data['lengths'])
+
+    def save(self, path):
+        np.savez_compressed(
+            path, lats=self.lats, lngs=self.lngs, indptr=self.indptr, indices=self.indices, lengths=self.lengths,
+        )
+
+    def edge_sources(self):
+        return np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+    def nodes_near(self, lat, lng, radius_m):
+        """Indices of nodes within radius_m of (lat, lng)."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        lo, hi = np.searchsorted(self._sorted_lats, [lat - dlat, lat + dlat])
+        candidates = self._node_order[lo:hi]
+        distance = haversine_m_np(lat, lng, self.lats[candidates], self.lngs[candidates])
+        return candidates[distance <= radius_m]
+
+    def nearest_node(self, lat, lng, max_radius_m=2000.0):
+        radius = 100.0
+        while radius <= max_radius_m:
+            nodes = self.nodes_near(lat, lng, radius)
+            if len(nodes):
+                distance = haversine_m_np(lat, lng, self.lats[nodes], self.lngs[nodes])
+                return int(nodes[np.argmin(distance)])
+            radius *= 2
+        return None
+
+
+def edge_penalties(graph, circles):
+    """Per-edge unsafety: sum over circles of (1 - d/r) at the edge midpoint, clipped at 0.
+
+    circles: iterable of (lat, lng, radius_m, weight).
+    """
+    sources = graph.edge_sources()
+    mid_lat = (graph.lats[sources] + graph.lats[graph.indices]) / 2
+    mid_lng = (graph.lngs[sources] + graph.lngs[graph.indices]) / 2
+    order = np.argsort(mid_lat, kind='stable')
+    sorted_lat = mid_lat[order]
+    penalty = np.zeros(graph.edge_count)
+    for lat, lng, radius, weight in circles:
+        if radius <= 0:
+            continue
+        dlat = radius / METERS_PER_DEGREE_LAT
+        lo, hi = np.searchsorted(sorted_lat, [lat - dlat, lat + dlat])
+        if lo == hi:
+            continue
+        edges = order[lo:hi]
+        distance = haversine_m_np(lat, lng, mid_lat[edges], mid_lng[edges])
+        inside = distance < radius
+        penalty[edges[inside]] += weight * (1.0 - distance[inside] / radius)
+    return penalty
+
+
+Route = namedtuple('Route', ['nodes', 'edges', 'length', 'cost', 'unsafe_length'])
+# per-edge unsafety and the matching edge costs, replaced together so a search never mixes two versions
+Hazards = namedtuple('Hazards', ['penalty', 'weights'])
+
+
+class SafeRouter:
+    def __init__(self, graph, safety_weight=DEFAULT_SAFETY_WEIGHT):
+        self.graph = graph
+        self.safety_weight = safety_weight
+        self._indptr = graph.indptr.tolist()
+        self._indices = graph.indices.tolist()
+        self._lengths = graph.lengths.tolist()
+        self._lats = graph.lats.tolist()
+        self._lngs = graph.lngs.tolist()
+        # an equirectangular distance using the smallest cos(lat) in the graph never
+        # overestimates, so it is an admissible A* heuristic
+        max_abs_lat = float(np.abs(graph.lats).max()) if graph.node_count else 0.0
+        self._m_per_deg_lng = METERS_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat)) * 0.999
+        self._m_per_deg_lat = METERS_PER_DEGREE_LAT * 0.999
+        self._hazards = Hazards(np.zeros(graph.edge_count), self._lengths)
+
+    @property
+    def penalty(self):
+        return self._hazards.penalty
+
+    def _weigh(self, penalty):
+        return Hazards(penalty, (self.graph.lengths * (1.0 + self.safety_weight * penalty)).tolist())
+
+    def set_hazards(self, circles):
+        self._hazards = self._weigh(edge_penalties(self.graph, circles))
+
+    def update_hazards(self, added=(), removed=()):
+        """Add and retract (lat, lng, radius_m, weight) circles without recomputing the others."""
+        penalty = self._hazards.penalty + edge_penalties(self.graph, added) - edge_penalties(self.graph, removed)
+        # what is left of a retracted circle is float rounding, not unsafety
+        penalty[penalty < 1e-9] = 0.0
+        self._hazards = self._weigh(penalty)
+
+    def route(self, source, target):
+        """A* from node to node over safety-weighted lengths; returns a Route or None."""
+        indptr, indices = self._indptr, self._indices
+        penalty, weights = self._hazards
+        lats, lngs = self._lats, self._lngs
+        t_lat, t_lng = lats[target], lngs[target]
+        k_lat, k_lng = self._m_per_deg_lat, self._m_per_deg_lng
+
+        def h(node):
+            return math.hypot((lats[node] - t_lat) * k_lat, (lngs[node] - t_lng) * k_lng)
+
+        # flat lists beat dicts once a search settles more than a few hundred nodes
+        best = [math.inf] * len(lats)
+        previous = [-1] * len(lats)
+        # the edge each node was reached by; parallel edges make the node pair ambiguous
+        via = [-1] * len(lats)
+        best[source] = 0.0
+        heap = [(h(source), 0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+        while heap:
+            _, cost, node = pop(heap)
+            if node == target:
+                nodes, edges = [node], []
+                while node != source:
+                    edges.append(via[node])
+                    node = previous[node]
+                    nodes.append(node)
+                edges.reverse()
+                lengths = self._lengths
+                return Route(
+                    nodes[::-1],
+                    edges,
+                    sum(lengths[k] for k in edges),
+                    cost,
+                    sum(lengths[k] for k in edges if penalty[k] > 0),
+                )
+            if cost > best[node]:
+                continue
+            for k in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[k]
+                new_cost = cost + weights[k]
+                if new_cost < best[neighbour]:
+                    best[neighbour] = new_cost
+                    previous[neighbour] = node
+                    via[neighbour] = k
+                    push(heap, (new_cost + h(neighbour), new_cost, neighbour))
+        return None
+
+    def coordinates(self, path):
+        return [[self._lats[node], self._lngs[node]] for node in path]
+
+
+def area_hazard(lat, lng, radius):
+    return (lat, lng, radius, 1.0)
+
+
+def alert_hazard(lat, lng):
+    return (lat, lng, ALERT_RADIUS_M, ALERT_WEIGHT)
+
+
+def current_hazards():
+    from .models import SOSAlert, UnsafeArea
+    circles = [
+        area_hazard(lat, lng, radius)
+        for lat, lng, radius in UnsafeArea.objects.values_list('latitude', 'longitude', 'radius').iterator()
+    ]
+    circles.extend(
+        alert_hazard(lat, lng)
+        for lat, lng in SOSAlert.objects.values_list('latitude', 'longitude').iterator()
+    )
+    return circles
+
+
+_router = None
+_router_lock = threading.Lock()
+_changes = queue.SimpleQueue()
+_apply_lock = threading.Lock()
+_wake = threading.Event()
+_refresher = None
+
+
+def get_router():
+    """Router for settings.ROUTING['GRAPH_PATH'] (.npz from build_road_graph, or an .osm file).
+
+    Only the first call loads anything; later hazard changes are applied by a
+    background thread that swaps in new edge costs, so requests never wait on them.
+    """
+    global _router
+    from django.conf import settings
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                conf = getattr(settings, 'ROUTING', {})
+                path = str(conf.get('GRAPH_PATH') or '')
+                if not path:
+                    return None
+                graph = RoadGraph.from_osm(path) if path.endswith('.osm') else RoadGraph.load(path)
+                router = SafeRouter(graph, conf.get('SAFETY_WEIGHT', DEFAULT_SAFETY_WEIGHT))
+                router.set_hazards(current_hazards())
+                _router = router
+    return _router
+
+
+def reset_router():
+    global _router
+    with _router_lock, _apply_lock:
+        _router = None
+        while not _changes.empty():
+            _changes.get_nowait()
+
+
+def hazards_changed(added=(), removed=()):
+    """Queue added and retracted hazard circles for the loaded router; call once the change is committed."""
+    global _refresher
+    if _router is None:
+        # the router, once loaded, reads every hazard from the database
+        return
+    _changes.put((tuple(added), tuple(removed)))
+    if _refresher is None:
+        with _router_lock:
+            if _refresher is None:
+                _refresher = threading.Thread(target=_refresh_forever, name='route-hazards', daemon=True)
+                _refresher.start()
+    _wake.set()
+
+
+def apply_hazard_changes():
+    """Apply every queued hazard change now; returns how many were applied."""
+    with _apply_lock:
+        added, removed = [], []
+        while not _changes.empty():
+            batch_added, batch_removed = _changes.get_nowait()
+            added.extend(batch_added)
+            removed.extend(batch_removed)
+        if _router is not None and (added or removed):
+            _router.update_hazards(added, removed)
+        return len(added) + len(removed)
+
+
+def _refresh_forever():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        try:
+            apply_hazard_changes()
+        except Exception:
+            logger.exception("Applying hazard changes to the router failed")
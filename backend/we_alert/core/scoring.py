@@ -0,0 +1,135 @@
+import math
+import threading
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+HOURS_PER_WEEK = 7 * 24
+DEFAULTS = {
+    'CELL_SIZE': 0.01,  # degrees, ~1.1 km
+    'TIME_ZONE': 'Asia/Kolkata',  # hour of week is taken in local time
+    'SCALE': 5.0,  # density at which the score reaches ~0.63
+}
+# each event also counts, at half weight, in the neighbouring cells and hours
+KERNEL = (0.5, 1.0, 0.5)
+
+
+def score_settings():
+    return {**DEFAULTS, **getattr(settings, 'SAFETY_SCORES', {})}
+
+
+class SafetyScoreIndex:
+    """Event density per (spatial cell, hour of week), smoothed on write so reads are one lookup.
+
+    Cells are rows of a (cells, 168) float32 array that grows as new cells appear.
+    """
+
+    def __init__(self, cell_size=DEFAULTS['CELL_SIZE'], tz=DEFAULTS['TIME_ZONE'], scale=DEFAULTS['SCALE']):
+        self.cell_size = cell_size
+        self.tz = ZoneInfo(tz)
+        self.scale = scale
+        self.events = 0
+        self._rows = {}
+        self._density = np.zeros((64, HOURS_PER_WEEK), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def cell(self, lat, lng):
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def hour_of_week(self, when):
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when, timezone.get_default_timezone())
+        local = when.astimezone(self.tz)
+        return local.weekday() * 24 + local.hour
+
+    def _row(self, cell):
+        row = self._rows.get(cell)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._density):
+                grown = np.zeros((row * 2, HOURS_PER_WEEK), dtype=np.float32)
+                grown[:row] = self._density
+                self._density = grown
+            # published only once the array has the row: density() and hourly() read without the lock
+            self._rows[cell] = row
+        return row
+
+    def add(self, lat, lng, when, weight=1.0):
+        row0, col0 = self.cell(lat, lng)
+        hour = self.hour_of_week(when)
+        with self._lock:
+            for dr, w_row in zip((-1, 0, 1), KERNEL):
+                for dc, w_col in zip((-1, 0, 1), KERNEL):
+                    row = self._row((row0 + dr, col0 + dc))
+                    for dh, w_hour in zip((-1, 0, 1), KERNEL):
+                        self._density[row, (hour + dh) % HOURS_PER_WEEK] += weight * w_row * w_col * w_hour
+            self.events += 1
+
+    def density(self, lat, lng, when=None):
+        row = self._rows.get(self.cell(lat, lng))
+        if row is None:
+            return 0.0
+        return float(self._density[row, self.hour_of_week(when or timezone.now())])
+
+    def score(self, lat, lng, when=None):
+        """0 (no history) .. 1 (many alerts here at this hour of the week)."""
+        return 1.0 - math.exp(-self.density(lat, lng, when) / self.scale)
+
+    def hourly(self, lat, lng):
+        """Density for each hour of the week (Monday 00:00 first) at a point."""
+        row = self._rows.get(self.cell(lat, lng))
+        if row is None:
+            return np.zeros(HOURS_PER_WEEK, dtype=np.float32)
+        return self._density[row].copy()
+
+    @classmethod
+    def from_events(cls, events, **kwargs):
+        index = cls(**kwargs)
+        for lat, lng, when in events:
+            index.add(lat, lng, when)
+        return index
+
+
+def historical_events():
+    from .models import PastSOSAlert, SOSAlert, SOSSession
+    yield from SOSAlert.objects.values_list('latitude', 'longitude', 'timestamp').iterator()
+    yield from PastSOSAlert.objects.values_list('latitude', 'longitude', 'timestamp').iterator()
+    # sessions count where they started, as record_event saw them; rows from before the
+    # start columns only have their last position
+    yield from SOSSession.objects.values_list(
+        Coalesce('start_latitude', 'current_latitude'), Coalesce('start_longitude', 'current_longitude'), 'start_time',
+    ).iterator()
+
+
+_scores = None
+_scores_lock = threading.Lock()
+
+
+def get_safety_scores():
+    global _scores
+    if _scores is None:
+        with _scores_lock:
+            if _scores is None:
+                conf = score_settings()
+                _scores = SafetyScoreIndex.from_events(
+                    historical_events(), cell_size=conf['CELL_SIZE'], tz=conf['TIME_ZONE'], scale=conf['SCALE'],
+                )
+    return _scores
+
+
+def record_event(lat, lng, when):
+    # a cold index reads the row from the database when it is built
+    if _scores is not None:
+        _scores.add(lat, lng, when)
+
+
+def reset_safety_scores():
+    global _scores
+    with _scores_lock:
+        _scores = None
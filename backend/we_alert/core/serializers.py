@@ -1,45 +1,229 @@
-from rest_framework import serializers
-from .models import SOSAlert, PastSOSAlert, UnsafeArea, CrimeStats,EmergencyContact,UserSettings,SOSSession
+import datetime
+import math
+import time
+from operator import itemgetter
 
-class SOSAlertSerializer(serializers.ModelSerializer):
+from django.db import connection
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import current_timings
+from .models import SOSAlert, PastSOSAlert, UnsafeArea, CrimeStats,EmergencyContact,UserSettings,SOSSession,ContactNotification
+
+
+def requested_fields(request):
+    """Field names from ?fields=a,b on a read request, or None for all fields."""
+    if request is None or request.method != 'GET':
+        return None
+    fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+    return fields or None
+
+
+class DynamicFieldsMixin:
+    # drops every field not named in ?fields=; unknown names are ignored
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        # counted as serialization time by core.metrics; nested serializers only once
+        timings = current_timings()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializing = False
+            timings.serialize += time.perf_counter() - start
+
+class ValuesReader:
+    """Builds serializer.data for a list straight from queryset.values(), skipping per-field objects.
+
+    Only for serializers whose fields all map to concrete model columns. Columns whose
+    values() type is already what the DRF field returns are passed through, the other
+    simple fields get the same builtin conversion DRF applies, and anything else still
+    goes through the field's own to_representation, so the output is the same.
+    Float columns are checked for NaN and infinity, which DRF's renderer refuses under
+    STRICT_JSON but orjson would write as null.
+    """
+
+    # DRF fields whose to_representation amounts to this builtin
+    simple_types = {
+        serializers.IntegerField: int,
+        serializers.FloatField: float,
+        serializers.CharField: str,
+        serializers.BooleanField: bool,
+    }
+    # ...and the model fields that already come back from the database as that type
+    native_types = {
+        serializers.IntegerField: {
+            'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+            'PositiveIntegerField', 'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+        },
+        serializers.FloatField: {'FloatField'},
+        serializers.CharField: {'CharField', 'TextField'},
+        serializers.BooleanField: {'BooleanField'},
+    }
+
+    def __init__(self, names, keys, converters, expressions, floats=()):
+        self.names = names
+        self.keys = keys
+        self.converters = converters
+        self.expressions = expressions
+        self.floats = floats if api_settings.STRICT_JSON else ()
+        # values() rows are already the output when keys match and nothing needs converting
+        self.plain = names == keys and not any(converters)
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        """A reader for the serializer's readable fields, or None if it needs the full serializer."""
+        model = serializer.Meta.model
+        names, keys, converters, expressions, floats = [], [], [], {}, []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except Exception:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            key = model_field.attname
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                converter = None
+            elif type(field) in cls.simple_types:
+                native = model_field.get_internal_type() in cls.native_types[type(field)]
+                converter = None if native else cls.simple_types[type(field)]
+            elif type(field) is serializers.DateTimeField and not model_field.is_relation:
+                converter, as_text = cls.datetime_converter(field)
+                if as_text:
+                    key = f'_text_{model_field.attname}'
+                    expressions[key] = Cast(model_field.attname, TextField())
+            elif isinstance(field, serializers.SerializerMethodField) or model_field.is_relation:
+                return None
+            else:
+                converter = field.to_representation
+            if type(field) is serializers.FloatField:
+                floats.append(name)
+            names.append(name)
+            keys.append(key)
+            converters.append(converter)
+        return cls(names, keys, converters, expressions, floats)
+
+    @staticmethod
+    def datetime_converter(field):
+        """(converter, read the column as text) for a DateTimeField.
+
+        DateTimeField.to_representation looks up the current timezone for every value, so
+        for the usual ISO 8601 output that is done once here. On SQLite the column is read
+        as its stored text, the str() of the UTC datetime, which for UTC output only needs
+        a 'T' and a 'Z' rather than parsing into a datetime and formatting it again.
+        """
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation, False
+        as_text = connection.vendor == 'sqlite'
+        utc_text = as_text and _is_utc(connection.timezone) and _is_utc(field_timezone)
+
+        def convert(value):
+            if isinstance(value, str):
+                if utc_text and len(value) in (19, 26) and value[10] == ' ':
+                    return f'{value[:10]}T{value[11:]}Z'
+                value = connection.ops.convert_datetimefield_value(value, None, connection)
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            text = value.astimezone(field_timezone).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert, as_text
+
+    def values(self, queryset, *extra):
+        """queryset.values() with the columns the reader needs, plus `extra` (e.g. pagination keys)."""
+        columns = [key for key in self.keys if key not in self.expressions]
+        return queryset.values(*dict.fromkeys([*columns, *extra]), **self.expressions)
+
+    def rows(self, values):
+        if self.plain:
+            size = len(self.keys)
+            # extra keys asked for by values() still have to be dropped
+            rows = [row if len(row) == size else {key: row[key] for key in self.keys} for row in values]
+        else:
+            fields = list(zip(self.names, self.keys, self.converters))
+            rows = []
+            for row in values:
+                item = {}
+                for name, key, convert in fields:
+                    value = row[key]
+                    item[name] = value if value is None or convert is None else convert(value)
+                rows.append(item)
+        for name in self.floats:
+            if not all(value is None or math.isfinite(value) for value in map(itemgetter(name), rows)):
+                # the error DRF's JSONRenderer raises for the same data
+                raise ValueError("Out of range float values are not JSON compliant")
+        return rows
+
+
+def _is_utc(tz):
+    return tz is datetime.timezone.utc or getattr(tz, 'key', None) in ('UTC', 'Etc/UTC')
+
+
+class SOSAlertSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model=SOSAlert
         fields=['id','user','timestamp','latitude','longitude','is_resolved']
         read_only_fields=['id','user','timestamp','is_resolved']
 
-class PastSOSAlertSerializer(serializers.ModelSerializer):
+class PastSOSAlertSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model=PastSOSAlert
         fields=['id','user','timestamp','latitude','longitude','is_resolved']
         read_only_fields=['id','user','timestamp','is_resolved']
 
-class UnsafeAreaSerializer(serializers.ModelSerializer):
+class UnsafeAreaSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model=UnsafeArea
         fields=['id','name','latitude','longitude','radius','created_at']
         read_only_fields=['id','created_at']
 
-class CrimeStatsSerializer(serializers.ModelSerializer):
+class CrimeStatsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model=CrimeStats
         fields=['id','state_ut','crime_head','year','total_cases']
 
-class EmergencyContactSerializer(serializers.ModelSerializer):
+class EmergencyContactSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = EmergencyContact
         fields = ['id', 'name', 'phone_number', 'relationship']
         
-class UserSettingsSerializer(serializers.ModelSerializer):
+class UserSettingsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserSettings
-        fields = ['id', 'decoy_mode_enabled', 'voice_detection_enabled', 'gesture_detection_enabled', 'auto_sos_in_unsafe_area']
+        fields = ['id', 'decoy_mode_enabled', 'voice_detection_enabled', 'gesture_detection_enabled', 'auto_sos_in_unsafe_area', 'available_as_responder']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # responders are told where an SOS is, so only staff enable it, after verifying the user
+        request = self.context.get('request')
+        if 'available_as_responder' in fields and not (request and request.user.is_staff):
+            fields['available_as_responder'].read_only = True
+        return fields
         
-class SOSSessionSerializer(serializers.ModelSerializer):
+class SOSSessionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SOSSession
         fields = ['id', 'user', 'start_time', 'end_time', 'current_latitude', 'current_longitude', 'is_active', 'activation_method']
         read_only_fields = ['id', 'user', 'start_time', 'end_time']
 
-
-
-
+class ContactNotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ContactNotification
+        fields = ['id', 'session', 'contact', 'phone_number', 'status', 'attempts', 'created_at', 'updated_at']
+        read_only_fields = fields
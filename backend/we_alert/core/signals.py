@@ -0,0 +1,153 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .heatmap import invalidate_circle
+from .metrics import install_query_timer
+from .models import CrimeStats, EmergencyContact, SOSAlert, SOSSession, UnsafeArea, UserSettings
+from .offline import record_change
+from .responders import get_live_locations
+from .rollups import apply_rows
+from .routing import alert_hazard, area_hazard, hazards_changed
+from .scoring import record_event
+from .spatial import discard_unsafe_area, update_unsafe_area
+from .usercache import invalidate_user_records
+
+
+@receiver(post_init, sender=UnsafeArea)
+def remember_unsafe_area(sender, instance, **kwargs):
+    # the circle as loaded, so an edit can also clear the heatmap tiles and route costs it used to cover
+    instance._saved_circle = (instance.latitude, instance.longitude, instance.radius) if instance.pk else None
+
+
+@receiver(post_save, sender=UnsafeArea)
+def index_unsafe_area(sender, instance, **kwargs):
+    # the index, tiles and route costs follow committed rows only; a rolled-back edit leaves them be
+    area_id = instance.pk
+    previous = getattr(instance, '_saved_circle', None)
+    current = (instance.latitude, instance.longitude, instance.radius)
+
+    def apply():
+        update_unsafe_area(area_id, *current)
+        if previous is not None and previous != current:
+            invalidate_circle(*previous)
+        invalidate_circle(*current)
+        if previous != current:
+            hazards_changed(added=[area_hazard(*current)], removed=[area_hazard(*previous)] if previous is not None else [])
+
+    transaction.on_commit(apply)
+    instance._saved_circle = current
+
+
+@receiver(post_delete, sender=UnsafeArea)
+def unindex_unsafe_area(sender, instance, **kwargs):
+    area_id = instance.pk
+    circle = getattr(instance, '_saved_circle', None) or (instance.latitude, instance.longitude, instance.radius)
+
+    def apply():
+        discard_unsafe_area(area_id)
+        invalidate_circle(*circle)
+        hazards_changed(removed=[area_hazard(*circle)])
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=SOSAlert)
+@receiver(post_delete, sender=SOSAlert)
+def refresh_alert_tiles(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_circle(instance.latitude, instance.longitude, 0))
+
+
+def _rollup_row(instance):
+    return (instance.state_ut, instance.crime_head, instance.year, instance.total_cases)
+
+
+@receiver(pre_save, sender=CrimeStats)
+def remember_crime_stats(sender, instance, **kwargs):
+    # what the stored row contributes to the rollups, so an update can retract it; read on
+    # save rather than post_init, which would run for every row a list loads
+    if instance._state.adding or instance.pk is None:
+        instance._rollup_row = None
+    else:
+        instance._rollup_row = sender.objects.filter(pk=instance.pk).values_list(
+            'state_ut', 'crime_head', 'year', 'total_cases',
+        ).first()
+
+
+@receiver(post_save, sender=CrimeStats)
+def rollup_crime_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_row', None)
+    current = _rollup_row(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_rows([previous], sign=-1)
+    apply_rows([current])
+    instance._rollup_row = current
+
+
+@receiver(post_delete, sender=CrimeStats)
+def unroll_crime_stats(sender, instance, **kwargs):
+    apply_rows([_rollup_row(instance)], sign=-1)
+
+
+@receiver(post_save, sender=SOSAlert)
+def route_around_alert(sender, instance, created, **kwargs):
+    if created:
+        hazard = alert_hazard(instance.latitude, instance.longitude)
+        transaction.on_commit(lambda: hazards_changed(added=[hazard]))
+
+
+@receiver(post_delete, sender=SOSAlert)
+def stop_routing_around_alert(sender, instance, **kwargs):
+    hazard = alert_hazard(instance.latitude, instance.longitude)
+    transaction.on_commit(lambda: hazards_changed(removed=[hazard]))
+
+
+@receiver(post_save, sender=SOSAlert)
+def score_alert(sender, instance, created, **kwargs):
+    # archiving deletes alerts but they stay part of the history, so deletes are not subtracted
+    if created:
+        event = (instance.latitude, instance.longitude, instance.timestamp)
+        transaction.on_commit(lambda: record_event(*event))
+
+
+@receiver(post_save, sender=SOSSession)
+def score_session(sender, instance, created, **kwargs):
+    if created:
+        event = (instance.start_latitude, instance.start_longitude, instance.start_time)
+        transaction.on_commit(lambda: record_event(*event))
+
+
+@receiver(post_save, sender=UnsafeArea)
+@receiver(post_delete, sender=UnsafeArea)
+def track_area_change(sender, instance, **kwargs):
+    record_change('AREA', instance.pk, deleted='created' not in kwargs)
+
+
+@receiver(post_save, sender=EmergencyContact)
+@receiver(post_delete, sender=EmergencyContact)
+def track_contact_change(sender, instance, **kwargs):
+    record_change('CONTACT', instance.pk, user_id=instance.user_id, deleted='created' not in kwargs)
+
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+@receiver(post_save, sender=EmergencyContact)
+@receiver(post_delete, sender=EmergencyContact)
+def refresh_user_records(sender, instance, **kwargs):
+    invalidate_user_records(instance.user_id)
+
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+def drop_live_location(sender, instance, **kwargs):
+    # opting out takes the user off the responder index at once rather than when the position expires
+    if 'created' not in kwargs or not instance.available_as_responder:
+        get_live_locations().remove(instance.user_id)
+
+
+@receiver(connection_created)
+def time_connection_queries(sender, connection, **kwargs):
+    install_query_timer(connection)
@@ -0,0 +1,133 @@
+import math
+import threading
+from collections import defaultdict
+
+from .geo import haversine_m, meters_to_degrees
+
+# ~2.2 km cells; an area is registered in every cell its bounding box touches
+DEFAULT_CELL_SIZE_DEG = 0.02
+# largest radius the nearby endpoint accepts
+MAX_QUERY_RADIUS_M = 50_000
+
+
+class UnsafeAreaIndex:
+    """In-process grid index over UnsafeArea circles (radius in meters).
+
+    Safe to share between threads: signal handlers edit it while requests read it.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE_DEG):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self._areas = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._areas)
+
+    def _cell_range(self, lat, lng, meters):
+        dlat, dlng = meters_to_degrees(meters, lat)
+        size = self.cell_size
+        return (
+            range(math.floor((lat - dlat) / size), math.floor((lat + dlat) / size) + 1),
+            range(math.floor((lng - dlng) / size), math.floor((lng + dlng) / size) + 1),
+        )
+
+    def insert(self, area_id, lat, lng, radius):
+        rows, cols = self._cell_range(lat, lng, radius)
+        with self._lock:
+            self._remove(area_id)
+            self._areas[area_id] = (lat, lng, radius)
+            for row in rows:
+                for col in cols:
+                    self._cells[(row, col)].append(area_id)
+
+    def remove(self, area_id):
+        with self._lock:
+            self._remove(area_id)
+
+    def _remove(self, area_id):
+        area = self._areas.pop(area_id, None)
+        if area is None:
+            return
+        rows, cols = self._cell_range(*area)
+        for row in rows:
+            for col in cols:
+                bucket = self._cells.get((row, col))
+                if bucket is None:
+                    continue
+                bucket.remove(area_id)
+                if not bucket:
+                    del self._cells[(row, col)]
+
+    def get(self, area_id):
+        with self._lock:
+            return self._areas.get(area_id)
+
+    def candidates(self, lat, lng):
+        """Ids of areas registered in the point's cell, without the distance check."""
+        size = self.cell_size
+        with self._lock:
+            return tuple(self._cells.get((math.floor(lat / size), math.floor(lng / size)), ()))
+
+    def query(self, lat, lng, radius=0.0):
+        """Ids of areas whose circle intersects the circle (lat, lng, radius)."""
+        if not (math.isfinite(radius) and radius >= 0):
+            raise ValueError("radius must be a finite number of meters")
+        rows, cols = self._cell_range(lat, lng, radius)
+        with self._lock:
+            if len(rows) * len(cols) > len(self._areas):
+                # a radius wider than the data: checking every area beats walking the cells
+                circles = list(self._areas.items())
+            else:
+                circles = {}
+                for row in rows:
+                    for col in cols:
+                        for area_id in self._cells.get((row, col), ()):
+                            circles[area_id] = self._areas[area_id]
+                circles = list(circles.items())
+        return [
+            area_id for area_id, (a_lat, a_lng, a_radius) in circles
+            if haversine_m(lat, lng, a_lat, a_lng) <= a_radius + radius
+        ]
+
+    @classmethod
+    def from_rows(cls, rows, cell_size=DEFAULT_CELL_SIZE_DEG):
+        index = cls(cell_size)
+        for area_id, lat, lng, radius in rows:
+            index.insert(area_id, lat, lng, radius)
+        return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_unsafe_area_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from .models import UnsafeArea
+                rows = UnsafeArea.objects.values_list('id', 'latitude', 'longitude', 'radius').iterator()
+                _index = UnsafeAreaIndex.from_rows(rows)
+    return _index
+
+
+def update_unsafe_area(area_id, lat, lng, radius):
+    # only touch an index that is already loaded; a cold one picks the row up on build
+    if _index is not None:
+        with _index_lock:
+            _index.insert(area_id, lat, lng, radius)
+
+
+def discard_unsafe_area(area_id):
+    if _index is not None:
+        with _index_lock:
+            _index.remove(area_id)
+
+
+def reset_unsafe_area_index():
+    global _index
+    with _index_lock:
+        _index = None
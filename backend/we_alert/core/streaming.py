@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import EmergencyContact, SOSSession
+from .trails import append_many, valid_point
+from .writer import write
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = re.compile(r'^/ws/sos-sessions/(?P<session_id>\d+)/location/?$')
+
+DEFAULTS = {
+    'BROKER': 'core.streaming.InMemoryBroker',
+    'FLUSH_INTERVAL': 1.0,
+    'SUBSCRIBER_QUEUE_SIZE': 64,
+}
+
+
+def stream_settings():
+    return {**DEFAULTS, **getattr(settings, 'LOCATION_STREAM', {})}
+
+
+class InMemoryBroker:
+    """Per-process pub/sub keyed by channel name.
+
+    Each subscriber gets a bounded queue; a slow subscriber loses its oldest
+    positions rather than holding up the publisher, since only the latest
+    position matters for a live map.
+    """
+
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        subscribers = self._subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    async def publish(self, channel, message):
+        for queue in tuple(self._subscribers.get(channel, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def subscriber_count(self, channel):
+        return len(self._subscribers.get(channel, ()))
+
+
+def write_locations(trails):
+    """trails maps session_id -> [(timestamp_ms, lat, lng), ...] in arrival order.
+
+    Sessions that have ended keep the final position end_session left them with.
+    Runs on the batched writer (core/writer.py).
+    """
+    write(_write_locations, trails)
+
+
+def _write_locations(trails):
+    with transaction.atomic():
+        active = SOSSession.objects.filter(pk__in=trails, is_active=True)
+        trails = {session_id: trails[session_id] for session_id in active.values_list('pk', flat=True)}
+        sessions = [
+            SOSSession(pk=session_id, current_latitude=points[-1][1], current_longitude=points[-1][2])
+            for session_id, points in trails.items()
+        ]
+        # bulk_update keeps the is_active filter, so a session ended meanwhile is not touched either
+        active.bulk_update(sessions, ['current_latitude', 'current_longitude'])
+        append_many(trails)
+
+
+class LocationWriteBack:
+    """Buffers streamed positions and flushes them every `interval` seconds.
+
+    A flush stores the latest position on each SOSSession and appends the
+    buffered points to the session trail, in one round of bulk writes. A batch
+    the writer fails on is kept and retried with the next one.
+    """
+
+    def __init__(self, interval=1.0, writer=write_locations):
+        self.interval = interval
+        self.writer = writer
+        self._pending = defaultdict(list)
+        self._task = None
+
+    def update(self, session_id, lat, lng, timestamp_ms=None):
+        self._pending[session_id].append((timestamp_ms or time.time() * 1000.0, lat, lng))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, defaultdict(list)
+        if not pending:
+            return
+        try:
+            await sync_to_async(self.writer)(pending)
+        except Exception:
+            logger.exception("Storing streamed positions for %d sessions failed; retrying next flush", len(pending))
+            # the failed points go back ahead of those that arrived during the write
+            for session_id, points in self._pending.items():
+                pending[session_id].extend(points)
+            self._pending = pending
+
+
+_broker = None
+_write_back = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        conf = stream_settings()
+        _broker = import_string(conf['BROKER'])(queue_size=conf['SUBSCRIBER_QUEUE_SIZE'])
+    return _broker
+
+
+def get_write_back():
+    global _write_back
+    if _write_back is None:
+        _write_back = LocationWriteBack(interval=stream_settings()['FLUSH_INTERVAL'])
+    return _write_back
+
+
+def session_channel(session_id):
+    return f"sos-session.{session_id}.location"
+
+
+@sync_to_async
+def authenticate(token):
+    from authapp.authentication import CachedJWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+    try:
+        return CachedJWTAuthentication().resolve(token)[0]
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@sync_to_async
+def session_is_active(session_id):
+    return SOSSession.objects.filter(pk=session_id, is_active=True).exists()
+
+
+@sync_to_async
+def session_role(user, session_id):
+    # the victim publishes, their emergency contacts (matched by phone number) subscribe;
+    # read from the database, not the user record cache, so a removed contact is cut off at the
+    # next check (relay_locations repeats it once per flush interval)
+    owner_id = SOSSession.objects.filter(pk=session_id, is_active=True).values_list('user_id', flat=True).first()
+    if owner_id is None:
+        return None
+    if owner_id == user.pk:
+        return 'publisher'
+    if EmergencyContact.objects.filter(user_id=owner_id, phone_number=user.phone_number).exists():
+        return 'subscriber'
+    return None
+
+
+def parse_location(text):
+    try:
+        data = json.loads(text)
+        lat = float(data['latitude'])
+        lng = float(data['longitude'])
+        timestamp = float(data.get('timestamp') or time.time())
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not valid_point(timestamp * 1000.0, lat, lng):
+        return None
+    return {'latitude': lat, 'longitude': lng, 'timestamp': timestamp}
+
+
+async def publish_locations(session_id, receive, send):
+    broker = get_broker()
+    write_back = get_write_back()
+    channel = session_channel(session_id)
+    # whether the session is still active is looked up at most once per flush interval
+    check_interval = stream_settings()['FLUSH_INTERVAL']
+    checked_at = time.monotonic()
+    while True:
+        event = await receive()
+        if event['type'] == 'websocket.disconnect':
+            return
+        location = parse_location(event.get('text') or event.get('bytes') or '')
+        if location is None:
+            await send({'type': 'websocket.send', 'text': json.dumps({'error': 'Expected {"latitude", "longitude"}'})})
+            continue
+        if time.monotonic() - checked_at >= check_interval:
+            if not await session_is_active(session_id):
+                await send({'type': 'websocket.send', 'text': json.dumps({'error': 'SOS session has ended'})})
+                await send({'type': 'websocket.close', 'code': 4410})
+                return
+            checked_at = time.monotonic()
+        await broker.publish(channel, location)
+        write_back.update(session_id, location['latitude'], location['longitude'], location['timestamp'] * 1000.0)
+
+
+async def relay_locations(session_id, user, receive, send):
+    broker = get_broker()
+    channel = session_channel(session_id)
+    queue = broker.subscribe(channel)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    # like publish_locations, the session and the contact are looked up again once per flush
+    # interval, so the socket closes when the session ends or the contact is removed
+    check_interval = stream_settings()['FLUSH_INTERVAL']
+    checked_at = time.monotonic()
+    next_location = None
+    try:
+        while True:
+            if next_location is None:
+                next_location = asyncio.ensure_future(queue.get())
+            wait = max(check_interval - (time.monotonic() - checked_at), 0)
+            done, _ = await asyncio.wait({next_location, disconnected}, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                return
+            if next_location in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(next_location.result())})
+                next_location = None
+            if time.monotonic() - checked_at >= check_interval:
+                if await session_role(user, session_id) != 'subscriber':
+                    if await session_is_active(session_id):
+                        await send({'type': 'websocket.send', 'text': json.dumps({'error': 'No longer an emergency contact'})})
+                        await send({'type': 'websocket.close', 'code': 4403})
+                    else:
+                        await send({'type': 'websocket.send', 'text': json.dumps({'error': 'SOS session has ended'})})
+                        await send({'type': 'websocket.close', 'code': 4410})
+                    return
+                checked_at = time.monotonic()
+    finally:
+        if next_location is not None:
+            next_location.cancel()
+        disconnected.cancel()
+        broker.unsubscribe(channel, queue)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI app for /ws/sos-sessions/<id>/location/?token=<JWT access token>."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    match = STREAM_PATH.match(scope['path'])
+    if match is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user = await authenticate(token) if token else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    session_id = int(match['session_id'])
+    role = await session_role(user, session_id)
+    if role is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    await send({'type': 'websocket.accept'})
+    if role == 'publisher':
+        await publish_locations(session_id, receive, send)
+    else:
+        await relay_locations(session_id, user, receive, send)
@@ -1,3 +1,1299 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from django.http import HttpResponse
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_init
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authapp.models import CustomUser
+
+from . import streaming
+from .archive import archive_sos_alerts
+from .geo import haversine_m
+from .geofence import GeofenceEngine, GeofenceEntry, geofence_engine, open_auto_sessions
+from .heatmap import MAX_ZOOM, MIN_ZOOM, TILE_SIZE, invalidate_circle, pixel_coordinates, tile_bounds, tile_cache, tile_range
+from .importer import import_crime_stats, import_crime_stats_file
+from .incidents import Gazetteer, cluster_incidents, extract_date, extract_incident, extract_incidents
+from .loadtest import FLOW, EndpointStats, LoadClient, Sample, SMSInbox, regressions, seed_load_data, summarize
+from .metrics import Histogram, SlowRequestProfiler, get_registry
+from .models import ContactNotification, CrimeStats, CrimeStatsRollup, EmergencyContact, LocationTrailChunk, PastSOSAlert, SOSAlert, SOSSession, UnsafeArea, UserSettings
+from .notifications import FakeTransport, NotificationDispatcher, set_dispatcher
+from .offline import decode_bundle
+from .query_plans import hot_queries, plan_problems, seed_hot_tables
+from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+from .responders import LiveLocationIndex, get_live_locations, reset_live_locations
+from .rollups import query_rollups, rebuild_rollups
+from .routing import RoadGraph, SafeRouter, alert_hazard, apply_hazard_changes, area_hazard, get_router, reset_router
+from .scoring import SafetyScoreIndex, get_safety_scores, reset_safety_scores
+from .serializers import CrimeStatsSerializer, SOSAlertSerializer, UnsafeAreaSerializer, ValuesReader
+from .spatial import MAX_QUERY_RADIUS_M, UnsafeAreaIndex, reset_unsafe_area_index
+from .throttling import DEFAULTS as RATE_LIMIT_DEFAULTS
+from .throttling import PriorityAdmissionMiddleware, TokenBucketLimiter, reset_limiters
+from .trails import MAX_CHUNK_POINTS, append_many, append_points, build_chunks, decode_chunk, load_trail
+from .usercache import get_emergency_contacts, get_many_user_settings, get_user_settings
+from .writer import BatchWriter, WriterBusy, write
+
+
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_hot_tables()
+
+    def test_hot_queries_are_index_backed(self):
+        others = [user.pk for user in self.users[1:20]]
+        session_id = SOSSession.objects.filter(user=self.users[0]).values_list('id', flat=True).first()
+        for name, queryset in hot_queries(self.users[0], others, session_id).items():
+            with self.subTest(name):
+                problems, plan = plan_problems(queryset)
+                self.assertEqual(problems, [], f"{name}:\n{plan}")
+
+    def test_active_session_lookups_use_partial_index(self):
+        _, plan = plan_problems(hot_queries(self.users[0], [self.users[1].pk])['active_sessions_for_users'])
+        self.assertIn('sossession_active_user_idx', plan)
+
+    def test_full_scan_is_reported(self):
+        problems, _ = plan_problems(SOSSession.objects.filter(activation_method='VOICE'))
+        self.assertEqual(problems, ['full scan of core_sossession'])
+
+
+class TokenBucketLimiterTests(TestCase):
+    def test_burst_then_refill(self):
+        now = [0.0]
+        limiter = TokenBucketLimiter(burst=3, period=30, clock=lambda: now[0])
+        self.assertEqual([limiter.take('a') for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.take('a'), 10.0)
+        self.assertEqual(limiter.take('b'), 0)
+        now[0] += 10
+        self.assertEqual(limiter.take('a'), 0)
+        self.assertGreater(limiter.take('a'), 0)
+
+    def test_memory_is_bounded(self):
+        limiter = TokenBucketLimiter(burst=1, period=60, max_keys=100)
+        for i in range(1000):
+            limiter.take(f'key{i}')
+        self.assertEqual(len(limiter), 100)
+
+
+@override_settings(RATE_LIMITS={'RATES': {**RATE_LIMIT_DEFAULTS['RATES'], 'sos': (2, 60)}})
+class SOSThrottleTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        self.addCleanup(reset_limiters)
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create(phone_number='+919876543210'))
+
+    def test_creates_are_limited_per_user_but_reads_are_not(self):
+        codes = [self.client.post('/api/core/sos-alerts/', {'latitude': 28.6, 'longitude': 77.2}).status_code for _ in range(3)]
+        self.assertEqual(codes, [201, 201, 429])
+        self.assertEqual(self.client.get('/api/core/sos-alerts/').status_code, 200)
+
+
+class PriorityAdmissionMiddlewareTests(TestCase):
+    def test_otp_is_shed_while_sos_is_admitted(self):
+        middleware = PriorityAdmissionMiddleware(lambda request: HttpResponse('ok'))
+        middleware.in_flight = middleware.shed_at
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.post('/api/auth/send-otp/')).status_code, 503)
+        self.assertEqual(middleware(factory.post('/api/core/sos-sessions/')).status_code, 200)
+        self.assertEqual(middleware.in_flight, middleware.shed_at)
+
+
+class UserRecordCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        EmergencyContact.objects.create(user=self.user, name='Mom', phone_number='+919999999999', relationship='mother')
+
+    def test_warm_reads_need_no_queries(self):
+        get_user_settings(self.user.pk, create=True)
+        get_emergency_contacts(self.user.pk)
+        get_many_user_settings([self.user.pk, 12345])
+        with self.assertNumQueries(0):
+            self.assertFalse(get_user_settings(self.user.pk).auto_sos_in_unsafe_area)
+            self.assertEqual([c.name for c in get_emergency_contacts(self.user.pk)], ['Mom'])
+            self.assertEqual(list(get_many_user_settings([self.user.pk, 12345])), [self.user.pk])
+
+    def test_saves_and_deletes_invalidate(self):
+        user_settings = get_user_settings(self.user.pk, create=True)
+        contacts = get_emergency_contacts(self.user.pk)
+        user_settings.auto_sos_in_unsafe_area = True
+        user_settings.save()
+        contacts[0].delete()
+        self.assertTrue(get_user_settings(self.user.pk).auto_sos_in_unsafe_area)
+        self.assertEqual(get_emergency_contacts(self.user.pk), [])
+
+    def test_decisions_read_the_database(self):
+        # QuerySet.update() skips the invalidating signals, leaving the cache stale
+        get_emergency_contacts(self.user.pk)
+        get_many_user_settings([self.user.pk])
+        UserSettings.objects.create(user=self.user, auto_sos_in_unsafe_area=True)
+        get_user_settings(self.user.pk)
+        UserSettings.objects.filter(user=self.user).update(auto_sos_in_unsafe_area=False)
+        self.assertEqual(open_auto_sessions([GeofenceEntry(self.user.pk, frozenset({1}), 28.6, 77.2)]), [])
+
+        mom = CustomUser.objects.create(phone_number='+919999999999')
+        session = SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.assertEqual(async_to_sync(streaming.session_role)(mom, session.pk), 'subscriber')
+        EmergencyContact.objects.filter(user=self.user).update(phone_number='+918888888888')
+        self.assertIsNone(async_to_sync(streaming.session_role)(mom, session.pk))
+
+    def test_settings_updates_start_from_the_stored_row(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertFalse(client.get('/api/core/user-settings/0/').data['decoy_mode_enabled'])
+        UserSettings.objects.filter(user=self.user).update(decoy_mode_enabled=True)
+        response = client.patch('/api/core/user-settings/0/', {'voice_detection_enabled': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        stored = UserSettings.objects.get(user=self.user)
+        self.assertEqual((stored.decoy_mode_enabled, stored.voice_detection_enabled), (True, False))
+
+
+class LoadTestHarnessTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        self.inbox = SMSInbox()
+        set_dispatcher(NotificationDispatcher(self.inbox))
+        self.addCleanup(set_dispatcher, None)
+
+    def test_flow_covers_every_endpoint(self):
+        phone_numbers = seed_load_data(users=2, contacts_per_user=2, areas=5, crime_rows=5)
+        samples = []
+        self.assertTrue(LoadClient(self.inbox, samples).run_flow(phone_numbers[0], updates=2, trail_points=3))
+        self.assertEqual(sorted({s.endpoint for s in samples}), sorted(FLOW))
+        self.assertTrue(all(s.ok for s in samples))
+        self.assertFalse(SOSSession.objects.get().is_active)
+
+    def test_regressions_against_baseline(self):
+        stats = summarize([Sample('send_otp', 0.010, True)] * 99 + [Sample('send_otp', 0.050, True)], elapsed=1.0)
+        self.assertEqual(stats['send_otp'].requests, 100)
+        self.assertEqual(regressions(stats, stats), [])
+        fast = {'send_otp': EndpointStats(100, 0, 5.0, 5.0, 5.0, 100.0), 'end_session': stats['send_otp']}
+        self.assertEqual(
+            [problem.split(':')[0] for problem in regressions(stats, fast)],
+            ['send_otp', 'send_otp', 'end_session'],
+        )
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        get_registry().clear()
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_route_breakdown(self):
+        self.client.get('/api/core/sos-sessions/')
+        stats = get_registry().snapshot()['GET sossession-list']
+        self.assertEqual(stats['wall_ms']['count'], 1)
+        self.assertGreaterEqual(stats['queries']['max'], 1)
+        self.assertGreater(stats['db_ms']['max'], 0)
+        self.assertGreater(stats['serialize_ms']['max'], 0)
+        self.assertLessEqual(stats['db_ms']['max'] + stats['serialize_ms']['max'], stats['wall_ms']['max'])
+
+    def test_sms_time_counts_as_external(self):
+        set_dispatcher(NotificationDispatcher(FakeTransport(latency=0.02)))
+        self.addCleanup(set_dispatcher, None)
+        APIClient().post('/api/auth/send-otp/', {'phone_number': '+919876543210'})
+        self.assertGreaterEqual(get_registry().snapshot()['POST send_otp']['external_ms']['max'], 20)
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/core/metrics/').status_code, 403)
+        self.user.is_staff = True
+        self.client.get('/api/core/sos-sessions/')
+        response = self.client.get('/api/core/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET sossession-list', response.data['routes'])
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram()
+        for value in [1.0] * 90 + [30.0] * 10:
+            histogram.add(value)
+        self.assertEqual(histogram.quantile(0.5), 1.6)
+        self.assertEqual(histogram.quantile(0.99), 30.0)
+        self.assertAlmostEqual(histogram.snapshot()['mean'], 3.9)
+
+    def test_profiler_samples_the_request_thread(self):
+        profiler = SlowRequestProfiler(interval=0.001)
+        profiler.begin()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        samples = profiler.end()
+        self.assertTrue(any('test_profiler_samples_the_request_thread' in stack for stack in samples))
+        profiler.keep('GET test', 50.0, samples)
+        self.assertEqual(profiler.slow[0]['route'], 'GET test')
+
+
+class FastListTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        for i in range(5):
+            SOSAlert.objects.create(user=self.user, latitude=28.6 + i / 100, longitude=77.2, is_resolved=i % 2 == 0)
+            CrimeStats.objects.create(state_ut='Delhi', crime_head=f'Head {i}', year=2010 + i, total_cases=i * 1000)
+        UnsafeArea.objects.create(name='Underpass \u2028', latitude=28.6, longitude=77.2, radius=1e-05)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_match_the_serializer(self):
+        alerts = SOSAlert.objects.order_by('-timestamp', '-id')
+        response = self.client.get('/api/core/sos-alerts/?page_size=3')
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(SOSAlertSerializer(alerts[:3], many=True).data)))
+        rest = self.client.get(response.json()['next']).json()
+        self.assertEqual([row['id'] for row in rest['results']], [alert.id for alert in alerts[3:]])
+        self.assertIsNone(rest['next'])
+
+        crimes = CrimeStats.objects.order_by('-year', '-id')
+        response = self.client.get('/api/core/crime-stats/?fields=year,total_cases')
+        self.assertEqual(response.content, JSONRenderer().render({
+            'next': None,
+            'results': [{'year': crime.year, 'total_cases': crime.total_cases} for crime in crimes],
+        }))
+
+    def test_fast_json_is_byte_identical(self):
+        data = CrimeStatsSerializer(CrimeStats.objects.all(), many=True).data
+        data.append({'name': 'Underpass \u2028\u00e9', 'at': SOSAlert.objects.first().timestamp, 'ok': None})
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_reader_rejects_non_finite_floats_like_drf(self):
+        for serializer, queryset in ((SOSAlertSerializer(), SOSAlert.objects.all()), (UnsafeAreaSerializer(), UnsafeArea.objects.all())):
+            reader = ValuesReader.for_serializer(serializer)
+            for value in (math.nan, math.inf, -math.inf):
+                values = list(reader.values(queryset))
+                values[-1]['latitude'] = value
+                with self.assertRaises(ValueError):
+                    reader.rows(values)
+        # None is fine, and the check is skipped when DRF would write NaN anyway
+        self.assertEqual(len(reader.rows([{**values[0], 'latitude': None}])), 1)
+        with override_settings(REST_FRAMEWORK={'STRICT_JSON': False}):
+            self.assertEqual(ValuesReader.for_serializer(UnsafeAreaSerializer()).floats, ())
+
+    @unittest.skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_by_format_or_accept(self):
+        expected = self.client.get('/api/core/unsafe-areas/').json()
+        for response in (
+            self.client.get('/api/core/unsafe-areas/?format=msgpack'),
+            self.client.get('/api/core/unsafe-areas/', HTTP_ACCEPT='application/msgpack'),
+        ):
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(response.content, MessagePackRenderer().render(expected))
+
+
+class BatchWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.writer = BatchWriter(max_batch=16)
+        self.addCleanup(self.writer.shutdown)
+
+    def create_session(self, lat):
+        if lat < 0:
+            raise ValueError("bad latitude")
+        return SOSSession.objects.create(user=self.user, current_latitude=lat, current_longitude=77.2, activation_method='MANUAL')
+
+    def test_queued_jobs_share_a_transaction(self):
+        # hold the writer on one job while sixteen more queue up behind it
+        release = threading.Event()
+        blocker = self.writer.submit(release.wait)
+        futures = [self.writer.submit(self.create_session, 28.0 + i / 100) for i in range(16)]
+        release.set()
+        blocker.result()
+        sessions = [future.result() for future in futures]
+        self.assertEqual(sorted(s.pk for s in sessions), list(SOSSession.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual((self.writer.batches, self.writer.jobs), (2, 17))
+
+    def test_failing_job_leaves_the_rest_of_the_batch(self):
+        futures = [self.writer.submit(self.create_session, lat) for lat in (28.6, -1.0, 28.7)]
+        self.assertIsNotNone(futures[0].result())
+        with self.assertRaises(ValueError):
+            futures[1].result()
+        self.assertIsNotNone(futures[2].result())
+        self.assertEqual(SOSSession.objects.count(), 2)
+
+    def test_a_failing_batch_does_not_stop_the_thread(self):
+        with mock.patch('core.writer.close_old_connections', side_effect=RuntimeError("connection check failed")):
+            with self.assertLogs('core.writer', 'ERROR'):
+                with self.assertRaises(RuntimeError):
+                    self.writer.submit(self.create_session, 28.6).result(timeout=5)
+        self.assertTrue(self.writer.alive)
+        self.assertIsNotNone(self.writer.submit(self.create_session, 28.6).result(timeout=5))
+
+    @override_settings(DB_WRITER={'TIMEOUT': 0.05})
+    def test_write_takes_back_a_job_stuck_in_the_queue(self):
+        # hold the writer before it opens its transaction, which would keep the inline write waiting
+        release = threading.Event()
+        with mock.patch('core.writer.close_old_connections', side_effect=release.wait):
+            blocker = self.writer.submit(lambda: None)
+            time.sleep(0.05)
+            with mock.patch('core.writer.get_writer', return_value=self.writer), self.assertLogs('core.writer', 'WARNING'):
+                session = write(self.create_session, 28.6)
+            release.set()
+            blocker.result(timeout=5)
+        self.writer.submit(lambda: None).result(timeout=5)
+        # the cancelled queue entry was skipped, not run a second time
+        self.assertEqual(list(SOSSession.objects.values_list('pk', flat=True)), [session.pk])
+
+    @override_settings(DB_WRITER={'TIMEOUT': 0.05})
+    def test_write_gives_up_on_a_running_job(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch('core.writer.get_writer', return_value=self.writer), self.assertLogs('core.writer', 'ERROR'):
+            with self.assertRaises(WriterBusy) as raised:
+                write(release.wait)
+        self.assertEqual(raised.exception.status_code, 503)
+        release.set()
+        self.assertTrue(self.writer.alive)
+
+    def test_auto_sessions_and_streamed_locations_go_through_the_writer(self):
+        UserSettings.objects.create(user=self.user, auto_sos_in_unsafe_area=True)
+        with mock.patch('core.writer.get_writer', return_value=self.writer):
+            [session] = open_auto_sessions([GeofenceEntry(self.user.pk, frozenset({1}), 28.6, 77.2)])
+            streaming.write_locations({session.pk: [(1_700_000_000_000.0, 28.61, 77.21)]})
+        self.assertEqual(self.writer.jobs, 2)
+        session.refresh_from_db()
+        self.assertEqual((session.activation_method, session.current_latitude), ('AUTO', 28.61))
+
+    def test_write_runs_inline_without_a_writer_thread(self):
+        self.writer.shutdown()
+        with mock.patch('core.writer.get_writer', return_value=self.writer), self.assertLogs('core.writer', 'ERROR'):
+            self.assertIsNotNone(write(self.create_session, 28.6))
+
+    def test_writer_time_counts_against_the_request(self):
+        reset_limiters()
+        get_registry().clear()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('core.writer.get_writer', return_value=self.writer):
+            self.assertEqual(client.post('/api/core/sos-alerts/', {'latitude': 28.6, 'longitude': 77.2}).status_code, 201)
+        stats = get_registry().snapshot()['POST sosalert-list']
+        self.assertGreater(stats['writer_ms']['max'], 0)
+        # the INSERT ran on the writer thread but is counted for this request
+        self.assertGreaterEqual(stats['queries']['max'], 1)
+        self.assertEqual(self.writer.jobs, 1)
+
+
+class WriteInlineTests(TestCase):
+    def test_runs_inline_inside_a_transaction(self):
+        # the writer thread could not see this test's uncommitted rows
+        self.assertTrue(connection.in_atomic_block)
+        user = CustomUser.objects.create(phone_number='+919876543210')
+        session = write(SOSSession.objects.create, user=user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.assertEqual(SOSSession.objects.get().pk, session.pk)
+
+
+class LiveLocationIndexTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.index = LiveLocationIndex(cell_size=0.01, ttl=60, clock=lambda: self.now)
+
+    def test_nearest_and_within_match_brute_force(self):
+        rng = random.Random(1)
+        points = {user_id: (28.6 + rng.uniform(-0.05, 0.05), 77.2 + rng.uniform(-0.05, 0.05)) for user_id in range(500)}
+        for user_id, (lat, lng) in points.items():
+            self.index.update(user_id, lat, lng)
+        distances = sorted((haversine_m(28.61, 77.21, lat, lng), user_id) for user_id, (lat, lng) in points.items())
+
+        nearest = self.index.nearest(28.61, 77.21, 5, 2000, exclude={distances[0][1]})
+        self.assertEqual([user_id for user_id, _ in nearest], [user_id for _, user_id in distances[1:6]])
+        within = self.index.within(28.61, 77.21, 1500)
+        self.assertEqual([user_id for user_id, _ in within], [user_id for d, user_id in distances if d <= 1500])
+        self.assertEqual(self.index.nearest(28.61, 77.21, 5, 10), [])
+
+    def test_moves_and_expiry(self):
+        self.index.update(1, 28.6, 77.2)
+        self.now = 50.0
+        self.index.update(1, 28.7, 77.3)
+        self.index.update(2, 28.6, 77.2)
+        self.assertEqual([user_id for user_id, _ in self.index.within(28.6, 77.2, 1000)], [2])
+        self.now = 100.0
+        self.assertEqual(self.index.get(1), (28.7, 77.3))
+        self.now = 111.0
+        self.assertIsNone(self.index.get(1))
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index._cells, {})
+
+
+class NearbyResponderTests(TestCase):
+    def setUp(self):
+        reset_limiters()
+        reset_live_locations()
+        self.addCleanup(reset_live_locations)
+        self.transport = FakeTransport()
+        self.dispatcher = NotificationDispatcher(self.transport)
+        set_dispatcher(self.dispatcher)
+        self.addCleanup(set_dispatcher, None)
+        self.victim = CustomUser.objects.create(phone_number='+919876543210')
+        self.responder = CustomUser.objects.create(phone_number='+919812345678')
+        UserSettings.objects.create(user=self.responder, available_as_responder=True)
+
+    def ping(self, user, lat, lng):
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post('/api/core/geofence/pings/', {'pings': [{'latitude': lat, 'longitude': lng}]}, format='json')
+
+    def test_sos_texts_responders_nearby(self):
+        self.ping(self.responder, 28.6010, 77.2000)
+        self.ping(self.victim, 28.6000, 77.2000)
+        self.assertIsNone(get_live_locations().get(self.victim.pk))
+        client = APIClient()
+        client.force_authenticate(self.victim)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/core/sos-sessions/', {
+                'current_latitude': 28.6, 'current_longitude': 77.2, 'activation_method': 'MANUAL',
+            }, format='json')
+        self.dispatcher.shutdown()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([to for to, _ in self.transport.sent], ['+919812345678'])
+        self.assertIn('about 110 m from you', self.transport.sent[0][1])
+        self.assertNotIn('28.6', self.transport.sent[0][1])
+
+    def test_only_staff_enable_responding(self):
+        client = APIClient()
+        client.force_authenticate(self.victim)
+        response = client.patch('/api/core/user-settings/0/', {'available_as_responder': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['available_as_responder'])
+        self.assertFalse(UserSettings.objects.get(user=self.victim).available_as_responder)
+
+        self.victim.is_staff = True
+        self.victim.save()
+        client.patch('/api/core/user-settings/0/', {'available_as_responder': True}, format='json')
+        self.assertTrue(UserSettings.objects.get(user=self.victim).available_as_responder)
+
+    def test_bad_ping_does_not_move_the_responder(self):
+        self.ping(self.responder, 28.6010, 77.2000)
+        for lat, lng in (('nan', 77.2), (28.6, 'inf'), (91, 77.2), (28.6, -181)):
+            self.ping(self.responder, lat, lng)
+        self.assertEqual(get_live_locations().get(self.responder.pk), (28.601, 77.2))
+        with self.assertRaises(ValueError):
+            get_live_locations().update(self.responder.pk, math.nan, 77.2)
+
+    def test_opting_out_leaves_the_index(self):
+        self.ping(self.responder, 28.6010, 77.2000)
+        user_settings = UserSettings.objects.get(user=self.responder)
+        user_settings.available_as_responder = False
+        user_settings.save()
+        self.assertIsNone(get_live_locations().get(self.responder.pk))
+
+
+class UnsafeAreaIndexTests(TestCase):
+    def test_query_matches_brute_force(self):
+        rng = random.Random(2)
+        circles = {area_id: (28.6 + rng.uniform(-0.3, 0.3), 77.2 + rng.uniform(-0.3, 0.3), rng.uniform(50, 3000)) for area_id in range(300)}
+        index = UnsafeAreaIndex.from_rows((area_id, *circle) for area_id, circle in circles.items())
+        for radius in (0, 500, 20000, 2e7):
+            expected = {area_id for area_id, (lat, lng, r) in circles.items() if haversine_m(28.6, 77.2, lat, lng) <= r + radius}
+            self.assertEqual(set(index.query(28.6, 77.2, radius)), expected)
+
+    def test_moves_and_removals(self):
+        index = UnsafeAreaIndex()
+        index.insert(1, 28.6, 77.2, 100)
+        index.insert(1, 28.7, 77.3, 100)
+        self.assertEqual(index.query(28.6, 77.2), [])
+        self.assertEqual(index.query(28.7, 77.3), [1])
+        self.assertEqual(index.candidates(28.7, 77.3), (1,))
+        index.remove(1)
+        self.assertEqual((len(index), index.query(28.7, 77.3), dict(index._cells)), (0, [], {}))
+
+    def test_rejects_non_finite_radius(self):
+        for radius in (float('nan'), float('inf'), -1):
+            with self.assertRaises(ValueError):
+                UnsafeAreaIndex().query(28.6, 77.2, radius)
+
+
+class NearbyUnsafeAreaTests(TestCase):
+    def setUp(self):
+        reset_unsafe_area_index()
+        self.addCleanup(reset_unsafe_area_index)
+        self.area = UnsafeArea.objects.create(name='Underpass', latitude=28.6, longitude=77.2, radius=200)
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create(phone_number='+919876543210'))
+
+    def test_nearby(self):
+        response = self.client.get('/api/core/unsafe-areas/nearby/?lat=28.601&lng=77.2')
+        self.assertEqual([area['id'] for area in response.json()], [self.area.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            UnsafeArea.objects.create(name='Market', latitude=28.62, longitude=77.2, radius=200)
+        response = self.client.get('/api/core/unsafe-areas/nearby/?lat=28.601&lng=77.2&radius=2000')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_rolled_back_edit_stays_out_of_the_index(self):
+        self.client.get('/api/core/unsafe-areas/nearby/?lat=28.601&lng=77.2')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.area.latitude = 10.0
+            self.area.save()
+            UnsafeArea.objects.create(name='Market', latitude=28.602, longitude=77.2, radius=200)
+            raise RuntimeError
+        response = self.client.get('/api/core/unsafe-areas/nearby/?lat=28.601&lng=77.2')
+        self.assertEqual([area['id'] for area in response.json()], [self.area.id])
+
+    def test_rejects_bad_parameters(self):
+        for query in ('radius=nan', 'radius=inf', 'radius=-1', f'radius={MAX_QUERY_RADIUS_M + 1}', 'lat=nan', 'lat=91'):
+            params = dict(item.split('=') for item in ('lat=28.6', 'lng=77.2', query))
+            self.assertEqual(self.client.get('/api/core/unsafe-areas/nearby/', params).status_code, 400, query)
+        self.assertEqual(APIClient().get('/api/core/unsafe-areas/nearby/?lat=28.6&lng=77.2').status_code, 401)
+
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        reset_unsafe_area_index()
+        reset_safety_scores()
+        self.addCleanup(reset_unsafe_area_index)
+        self.addCleanup(reset_safety_scores)
+        self.area = UnsafeArea.objects.create(name='Underpass', latitude=28.6, longitude=77.2, radius=300)
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.addCleanup(geofence_engine.forget, self.user.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ping(self, lat, lng):
+        return self.client.post('/api/core/geofence/pings/', {'pings': [{'latitude': lat, 'longitude': lng}]}, format='json')
+
+    def test_entries_are_reported_once(self):
+        index = UnsafeAreaIndex.from_rows([(1, 28.6, 77.2, 300), (2, 28.7, 77.2, 300)])
+        engine = GeofenceEngine(index)
+        self.assertEqual(engine.evaluate([(7, 28.5, 77.2)]), [])
+        [entry] = engine.evaluate([(7, 28.601, 77.2), (7, 28.602, 77.2)])
+        self.assertEqual(entry.area_ids, {1})
+        self.assertEqual(engine.evaluate([(7, 28.6, 77.2)]), [])
+        self.assertEqual([e.area_ids for e in engine.evaluate([(7, 28.5, 77.2), (7, 28.7, 77.2)])], [{2}])
+        engine.evaluate([(7, 28.5, 77.2)])
+        self.assertEqual(engine.inside(7), frozenset())
+
+    def test_entry_opens_one_auto_session(self):
+        UserSettings.objects.create(user=self.user, auto_sos_in_unsafe_area=True)
+        scores = get_safety_scores()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.ping(28.601, 77.2)
+        self.assertEqual(response.json()['entered_areas'], [self.area.id])
+        self.assertEqual(response.json()['sos_session']['activation_method'], 'AUTO')
+        # created with save(), so the post_save receivers saw it
+        self.assertEqual(scores.events, 1)
+        self.ping(28.5, 77.2)
+        self.assertIsNone(self.ping(28.601, 77.2).json()['sos_session'])
+        self.assertEqual(SOSSession.objects.filter(user=self.user).count(), 1)
+
+    def test_rejects_bad_coordinates(self):
+        for lat, lng in (('nan', 77.2), (28.6, 'inf'), (91, 77.2), (28.6, -181)):
+            self.assertEqual(self.ping(lat, lng).status_code, 400)
+        self.assertEqual(self.client.post('/api/core/geofence/pings/', {'pings': [{}]}, format='json').status_code, 400)
+
+
+class FlakyTransport(FakeTransport):
+    """Fails the first `failures` sends."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def send(self, to, body):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("gateway timeout")
+        return super().send(to, body)
+
+
+class NotificationDispatcherTests(TransactionTestCase):
+    def dispatcher(self, transport):
+        dispatcher = NotificationDispatcher(transport, max_workers=2, max_attempts=3, backoff_seconds=0.5)
+        self.addCleanup(dispatcher.shutdown)
+        return dispatcher
+
+    def test_retries_with_backoff_then_gives_up(self):
+        # only the dispatcher's clock: other threads (the request profiler, ...) sleep too
+        with mock.patch('core.notifications.time') as clock, self.assertLogs('core.notifications', 'WARNING'):
+            sleep = clock.sleep
+            result = self.dispatcher(FlakyTransport(failures=2)).send('+919999999999', 'hi')
+            self.assertEqual((result.status, result.attempts, result.message_id), ('SENT', 3, 'FAKE00000001'))
+            delays = [call.args[0] for call in sleep.call_args_list]
+            self.assertTrue(0.25 <= delays[0] <= 0.75 and 0.5 <= delays[1] <= 1.5, delays)
+
+            sleep.reset_mock()
+            result = self.dispatcher(FlakyTransport(failures=5)).send('+919999999999', 'hi')
+            self.assertEqual((result.status, result.attempts, result.error), ('FAILED', 3, 'gateway timeout'))
+            self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(DB_WRITER={'ENABLED': False})
+    def test_contacts_are_texted_and_recorded(self):
+        user = CustomUser.objects.create(phone_number='+919876543210')
+        for i, phone_number in enumerate(('+919999999991', '+919999999992')):
+            EmergencyContact.objects.create(user=user, name=f'Contact {i}', phone_number=phone_number, relationship='friend')
+        session = SOSSession.objects.create(user=user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        transport = FakeTransport()
+        futures = self.dispatcher(transport).dispatch_sos(session.pk).result()
+        self.assertEqual(sorted(future.result().to for future in futures), ['+919999999991', '+919999999992'])
+        self.assertIn('28.6, 77.2', transport.sent[0][1])
+        self.assertEqual(
+            list(ContactNotification.objects.filter(session=session).values_list('status', 'attempts')),
+            [('SENT', 1), ('SENT', 1)],
+        )
+
+
+class LocationStreamTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.contact = CustomUser.objects.create(phone_number='+919999999999')
+        EmergencyContact.objects.create(user=self.user, name='Mom', phone_number='+919999999999', relationship='mother')
+        self.session = SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.written = []
+        self.addCleanup(setattr, streaming, '_write_back', streaming._write_back)
+        self.addCleanup(setattr, streaming, '_broker', streaming._broker)
+        streaming._write_back = streaming.LocationWriteBack(interval=60, writer=self.written.append)
+        streaming._broker = streaming.InMemoryBroker()
+
+    def connect(self, user):
+        communicator = ApplicationCommunicator(streaming.websocket_application, {
+            'type': 'websocket',
+            'path': f'/ws/sos-sessions/{self.session.pk}/location/',
+            'query_string': f'token={AccessToken.for_user(user)}'.encode(),
+        })
+        return communicator
+
+    async def open(self, user):
+        communicator = self.connect(user)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output()
+
+    async def test_contacts_receive_what_the_victim_publishes(self):
+        stranger = await CustomUser.objects.acreate(phone_number='+918888888888')
+        _, refused = await self.open(stranger)
+        self.assertEqual(refused, {'type': 'websocket.close', 'code': 4403})
+
+        subscriber, accepted = await self.open(self.contact)
+        publisher, _ = await self.open(self.user)
+        self.assertEqual(accepted['type'], 'websocket.accept')
+        await asyncio.sleep(0)
+        await publisher.send_input({'type': 'websocket.receive', 'text': '{"latitude": 28.61, "longitude": 77.21, "timestamp": 1700000000}'})
+        relayed = await subscriber.receive_output()
+        self.assertEqual(json.loads(relayed['text']), {'latitude': 28.61, 'longitude': 77.21, 'timestamp': 1700000000.0})
+        write_back = streaming.get_write_back()
+        write_back._task.cancel()
+        await write_back.flush()
+        self.assertEqual(self.written, [{self.session.pk: [(1700000000000.0, 28.61, 77.21)]}])
+        for communicator in (publisher, subscriber):
+            await communicator.send_input({'type': 'websocket.disconnect'})
+            await communicator.wait()
+
+    @override_settings(LOCATION_STREAM={'FLUSH_INTERVAL': 0})
+    async def test_publishing_stops_once_the_session_ends(self):
+        publisher, _ = await self.open(self.user)
+        await sync_to_async(self.session.end_session)()
+        await publisher.send_input({'type': 'websocket.receive', 'text': '{"latitude": 28.61, "longitude": 77.21}'})
+        self.assertEqual(json.loads((await publisher.receive_output())['text']), {'error': 'SOS session has ended'})
+        self.assertEqual(await publisher.receive_output(), {'type': 'websocket.close', 'code': 4410})
+        await publisher.wait()
+
+    @override_settings(LOCATION_STREAM={'FLUSH_INTERVAL': 0.01})
+    async def test_subscribers_are_closed_when_the_session_ends(self):
+        subscriber, _ = await self.open(self.contact)
+        await sync_to_async(self.session.end_session)()
+        self.assertEqual(json.loads((await subscriber.receive_output())['text']), {'error': 'SOS session has ended'})
+        self.assertEqual(await subscriber.receive_output(), {'type': 'websocket.close', 'code': 4410})
+        await subscriber.wait()
+        self.assertEqual(streaming.get_broker().subscriber_count(streaming.session_channel(self.session.pk)), 0)
+
+    @override_settings(LOCATION_STREAM={'FLUSH_INTERVAL': 0.01})
+    async def test_removed_contact_is_cut_off(self):
+        subscriber, _ = await self.open(self.contact)
+        await EmergencyContact.objects.filter(user=self.user).adelete()
+        self.assertEqual(json.loads((await subscriber.receive_output())['text']), {'error': 'No longer an emergency contact'})
+        self.assertEqual(await subscriber.receive_output(), {'type': 'websocket.close', 'code': 4403})
+        await subscriber.wait()
+
+    async def test_failed_write_back_is_retried(self):
+        batches = []
+
+        def writer(trails):
+            batches.append({session_id: list(points) for session_id, points in trails.items()})
+            if len(batches) == 1:
+                raise RuntimeError("database is locked")
+
+        write_back = streaming.LocationWriteBack(interval=60, writer=writer)
+        write_back._pending[1].append((1.0, 28.6, 77.2))
+        with self.assertLogs('core.streaming', 'ERROR'):
+            await write_back.flush()
+        write_back._pending[1].append((2.0, 28.7, 77.3))
+        await write_back.flush()
+        self.assertEqual(batches[1], {1: [(1.0, 28.6, 77.2), (2.0, 28.7, 77.3)]})
+        self.assertFalse(write_back._pending)
+
+    def test_write_back_skips_ended_sessions(self):
+        live = SOSSession.objects.create(user=self.contact, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.session.end_session()
+        streaming.write_locations({
+            self.session.pk: [(1700000000000.0, 10.0, 10.0)],
+            live.pk: [(1700000000000.0, 28.7, 77.3), (1700000001000.0, 28.8, 77.4)],
+        })
+        self.session.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((self.session.current_latitude, live.current_latitude, live.current_longitude), (28.6, 28.8, 77.4))
+        self.assertEqual(len(load_trail(self.session.pk)[0]), 0)
+        self.assertEqual(len(load_trail(live.pk)[0]), 2)
+
+
+class LocationTrailTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.session = SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start_ms = 1_700_000_000_000
+
+    def test_chunks_round_trip(self):
+        points = [(self.start_ms + i * 1000, 28.6 + i * 1e-5, 77.2 - i * 1e-5) for i in range(700)][::-1]
+        chunks = build_chunks(self.session.pk, points)
+        self.assertEqual([chunk.point_count for chunk in chunks], [300, 300, 100])
+        times_ms, lats, lngs = decode_chunk(chunks[0].start_ms, chunks[0].point_count, chunks[0].data)
+        self.assertEqual(times_ms[:2].tolist(), [self.start_ms, self.start_ms + 1000])
+        self.assertAlmostEqual(lats[1], 28.60001, places=6)
+
+    def test_write_back_extends_the_open_chunk(self):
+        for i in range(10):
+            append_many({self.session.pk: [(self.start_ms + i * 1000, 28.6, 77.2 + i * 1e-5)]})
+        self.assertEqual(list(LocationTrailChunk.objects.values_list('point_count', flat=True)), [10])
+        # a full chunk is left alone; points older than the open chunk get their own
+        append_points(self.session.pk, [(self.start_ms + 20_000 + i, 28.6, 77.2) for i in range(MAX_CHUNK_POINTS)])
+        append_points(self.session.pk, [(self.start_ms - 1000, 28.6, 77.2)])
+        self.assertEqual(sorted(LocationTrailChunk.objects.values_list('point_count', flat=True)), [1, 10, MAX_CHUNK_POINTS])
+        times_ms, _, _ = load_trail(self.session.pk)
+        self.assertEqual(len(times_ms), MAX_CHUNK_POINTS + 11)
+        self.assertTrue((times_ms[1:] >= times_ms[:-1]).all())
+
+    def test_upload_and_read(self):
+        url = f'/api/core/sos-sessions/{self.session.pk}/trail/'
+        points = [{'timestamp': 1_700_000_000 + i, 'latitude': 28.6, 'longitude': 77.2 + i / 1000} for i in range(3)]
+        self.assertEqual(self.client.post(url, {'points': points}, format='json').json(), {'stored': 3, 'chunks': 1})
+        trail = self.client.get(url).json()
+        self.assertEqual((trail['timestamps'][0], trail['longitudes'][2]), (1_700_000_000.0, 77.202))
+
+    def test_rejects_bad_timestamps(self):
+        url = f'/api/core/sos-sessions/{self.session.pk}/trail/'
+        for timestamp in ('nan', 'inf', 1e30, -1):
+            response = self.client.post(url, {'points': [{'timestamp': timestamp, 'latitude': 28.6, 'longitude': 77.2}]}, format='json')
+            self.assertEqual(response.status_code, 400, timestamp)
+        self.assertFalse(LocationTrailChunk.objects.exists())
+
+
+class ArchiveTests(TestCase):
+    def test_moves_resolved_and_old_alerts_in_chunks(self):
+        user = CustomUser.objects.create(phone_number='+919876543210')
+        alerts = [SOSAlert.objects.create(user=user, latitude=28.6, longitude=77.2 + i, is_resolved=i == 0) for i in range(4)]
+        old = timezone.now() - timedelta(days=40)
+        SOSAlert.objects.filter(pk__in=[alerts[1].pk, alerts[2].pk]).update(timestamp=old)
+
+        self.assertEqual(archive_sos_alerts(chunk_size=1, max_rows=2)[0], 2)
+        tile_cache.clear()
+        x, _, y, _ = tile_range(12, 28.6, 79.2, 28.6, 79.2)
+        tile_cache.put((12, x, y), b'png')
+        with mock.patch('core.archive.hazards_changed') as changed, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(archive_sos_alerts(chunk_size=1)[0], 1)
+        # one callback for the chunk, none from per-row delete signals
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(tile_cache), 0)
+        changed.assert_called_once_with(removed=[alert_hazard(28.6, 77.2 + 2)])
+        self.assertEqual(list(SOSAlert.objects.values_list('pk', flat=True)), [alerts[3].pk])
+        archived = PastSOSAlert.objects.order_by('longitude')
+        self.assertEqual([(a.longitude, a.is_resolved) for a in archived], [(77.2, True), (78.2, False), (79.2, False)])
+        # the original timestamps come along
+        self.assertEqual(archived[1].timestamp, old)
+
+
+class CrimeRollupTests(TestCase):
+    def setUp(self):
+        self.rows = [
+            CrimeStats.objects.create(state_ut='Delhi', crime_head='Rape', year=2021, total_cases=100),
+            CrimeStats.objects.create(state_ut='Delhi', crime_head='Assault', year=2022, total_cases=50),
+            CrimeStats.objects.create(state_ut='Goa', crime_head='Rape', year=2022, total_cases=7),
+            # raw values that used to double as the "all" marker
+            CrimeStats.objects.create(state_ut='', crime_head='Rape', year=0, total_cases=1),
+        ]
+
+    def totals(self, filters, group_by=()):
+        return [tuple(row) for row in query_rollups(filters, group_by).values_list(*group_by, 'total_cases', 'row_count')]
+
+    def test_signals_keep_rollups_in_step(self):
+        self.assertEqual(self.totals({}), [(158, 4)])
+        self.assertEqual(self.totals({'crime_head': 'Rape'}, ['year']), [(0, 1, 1), (2021, 100, 1), (2022, 7, 1)])
+        self.assertEqual(self.totals({'state_ut': ''}), [(1, 1)])
+        self.rows[0].total_cases = 90
+        self.rows[0].year = 2022
+        self.rows[0].save()
+        self.rows[2].delete()
+        self.assertEqual(self.totals({'year': 2022}, ['state_ut']), [('Delhi', 140, 2)])
+        incremental = set(CrimeStatsRollup.objects.values_list('state_ut', 'crime_head', 'year', 'rolled_up', 'total_cases', 'row_count'))
+        rebuild_rollups()
+        self.assertEqual(set(CrimeStatsRollup.objects.values_list('state_ut', 'crime_head', 'year', 'rolled_up', 'total_cases', 'row_count')), incremental)
+
+    def test_loading_rows_runs_no_hooks(self):
+        # lists load thousands of rows; the old values are only read when one is saved
+        self.assertFalse(post_init.has_listeners(CrimeStats))
+
+    def test_aggregate_endpoint(self):
+        response = APIClient().get('/api/core/crime-stats/aggregate/?year=2022&group_by=state_ut')
+        self.assertEqual(response.json()['results'], [
+            {'state_ut': 'Delhi', 'total_cases': 50, 'row_count': 1},
+            {'state_ut': 'Goa', 'total_cases': 7, 'row_count': 1},
+        ])
+        self.assertEqual(APIClient().get('/api/core/crime-stats/aggregate/?year=2022&group_by=year').status_code, 400)
+
+
+class CrimeImportTests(TestCase):
+    fixture_path = Path(__file__).parent / 'fixtures' / 'ncrb_crimes_against_women_sample.csv'
+
+    def test_wide_table_is_upserted_once(self):
+        result = import_crime_stats_file(self.fixture_path, batch_size=10)
+        self.assertEqual((result.records, result.created, result.updated, result.skipped), (64, 63, 0, 1))
+        self.assertEqual(
+            CrimeStats.objects.get(state_ut='Delhi', crime_head='Rape (Sec. 376 IPC)', year=2021).total_cases, 1250,
+        )
+        self.assertTrue(CrimeStats.objects.filter(state_ut='Andaman and Nicobar Islands').exists())
+        self.assertEqual(import_crime_stats_file(self.fixture_path).created + import_crime_stats_file(self.fixture_path).updated, 0)
+        self.assertEqual(query_rollups({}).get().total_cases, CrimeStats.objects.aggregate(total=Sum('total_cases'))['total'])
+
+    def test_long_table_updates_rollups(self):
+        table = "State/UT,Crime Head,Year,Total Cases\nNCT of Delhi,Stalking,2022,\"1,200\"\nTotal,Stalking,2022,1200\n"
+        self.assertEqual(import_crime_stats(io.BytesIO(table.encode()), 'long.csv').created, 1)
+        table = table.replace('1,200', '1,300')
+        self.assertEqual(import_crime_stats(io.BytesIO(table.encode()), 'long.csv').updated, 1)
+        self.assertEqual(list(query_rollups({'state_ut': 'Delhi'}).values_list('total_cases', 'row_count')), [(1300, 1)])
+
+    def test_unreadable_files_are_rejected(self):
+        admin = CustomUser.objects.create(phone_number='+919876543210', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        for name, content in (('stats.xlsx', b'not a zip'), ('stats.csv', b'State/UT,Crime Head,Year\n"' + b'x' * 200_000), ('stats.csv', b'a,b\n')):
+            upload = SimpleUploadedFile(name, content)
+            response = client.post('/api/core/crime-stats/import/', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400, name)
+
+
+class IncidentTests(TestCase):
+    gazetteer_path = Path(__file__).parent / 'fixtures' / 'delhi_gazetteer.csv'
+
+    def article(self, url, title, body, published=''):
+        return {'url': url, 'title': title, 'body': body, 'published': published}
+
+    def write_articles(self, directory, articles):
+        path = Path(directory) / 'articles.jsonl'
+        path.write_text(''.join(json.dumps(a) + '\n' for a in articles))
+        return path
+
+    def test_extracts_most_mentioned_locality_and_date(self):
+        gazetteer = Gazetteer.from_csv(self.gazetteer_path)
+        article = self.article(
+            'https://example.com/1',
+            'Woman harassed in Lajpat Nagar',
+            'The accused, from Saket, was produced before the Saket court. Police in Lajpat Nagar said '
+            'the incident took place on 12 March, 2024.',
+        )
+        incident = extract_incident(article, gazetteer)
+        self.assertEqual(incident['locality'], 'Lajpat Nagar')
+        self.assertEqual((incident['latitude'], incident['longitude']), (28.5677, 77.2433))
+        self.assertEqual(incident['date'], '2024-03-12')
+        # a court seat is not an incident location
+        self.assertEqual(list(gazetteer.mentions('produced before the Saket district court')), [])
+
+        self.assertEqual(extract_date({'published': '2023-11-20T09:15:00+05:30', 'body': 'on 1 Jan 2020'}), '2023-11-20')
+        self.assertEqual(extract_date({'body': 'reported on March 5, 2022'}), '2022-03-05')
+        self.assertIsNone(extract_date({'body': 'on 31 Feb 2022'}))
+        self.assertIsNone(extract_incident(self.article('u', 'Nothing here', 'No place named.'), gazetteer)['locality'])
+
+    def test_clusters_nearby_incidents(self):
+        incidents = [
+            {'url': 'a', 'locality': 'Saket', 'latitude': 28.5245, 'longitude': 77.2066},
+            {'url': 'b', 'locality': 'Saket', 'latitude': 28.5245, 'longitude': 77.2066},
+            {'url': 'c', 'locality': 'Nearby', 'latitude': 28.5290, 'longitude': 77.2066},
+            {'url': 'd', 'locality': 'Dwarka', 'latitude': 28.5921, 'longitude': 77.0460},
+            {'url': 'e', 'locality': None},
+        ]
+        areas = cluster_incidents(incidents, eps_m=750, base_radius_m=300, min_incidents=2)
+        self.assertEqual(len(areas), 1)
+        area = areas[0]
+        self.assertEqual((area['name'], area['incidents']), ('Saket', 3))
+        spread = haversine_m(area['latitude'], area['longitude'], 28.5290, 77.2066)
+        self.assertAlmostEqual(area['radius'], spread + 300)
+        self.assertEqual(len(cluster_incidents(incidents, min_incidents=1)), 2)
+        self.assertEqual(cluster_incidents([]), [])
+
+    def test_extraction_is_cached_per_url(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = Path(directory) / 'cache.jsonl'
+            articles = [self.article('https://example.com/1', 'Stalking in Dwarka', 'Dwarka police said.')]
+            records = extract_incidents(articles, str(self.gazetteer_path), str(cache_path), workers=1)
+            self.assertEqual([r['locality'] for r in records], ['Dwarka'])
+            articles.append(self.article('https://example.com/2', 'Assault near Saket', ''))
+            progress = []
+            records = extract_incidents(articles, str(self.gazetteer_path), str(cache_path), workers=1, progress=progress.append)
+            self.assertEqual(progress, [1])
+            self.assertEqual(sorted(r['locality'] for r in records), ['Dwarka', 'Saket'])
+            self.assertEqual(len(cache_path.read_text().splitlines()), 2)
+
+    def test_command_upserts_unsafe_areas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_articles(directory, [
+                self.article(f'https://example.com/{i}', 'Woman harassed in Lajpat Nagar', '') for i in range(3)
+            ] + [self.article('https://example.com/solo', 'Theft in Dwarka', '')])
+            out = io.StringIO()
+            call_command('extract_incidents', str(path), '--workers', '1', '--dry-run', stdout=out)
+            self.assertIn('Lajpat Nagar: 3 incidents', out.getvalue())
+            self.assertFalse(UnsafeArea.objects.exists())
+
+            call_command('extract_incidents', str(path), '--workers', '1', stdout=io.StringIO())
+            call_command('extract_incidents', str(path), '--workers', '1', stdout=io.StringIO())
+            area = UnsafeArea.objects.get()
+            self.assertEqual((area.name, area.latitude, area.longitude, area.radius), ('Lajpat Nagar', 28.5677, 77.2433, 300.0))
+
+
+class HeatmapTests(TestCase):
+    def setUp(self):
+        tile_cache.clear()
+        reset_unsafe_area_index()
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tile_math(self):
+        self.assertEqual(tile_bounds(0, 0, 0)[1::2], (-180.0, 180.0))
+        self.assertAlmostEqual(tile_bounds(0, 0, 0)[2], 85.0511, places=4)
+        # the tile containing central Delhi at zoom 12
+        south, west, north, east = tile_bounds(12, 2926, 1707)
+        self.assertTrue(south < 28.63 < north and west < 77.21 < east)
+        lats, lngs = pixel_coordinates(12, 2926, 1707)
+        self.assertEqual((len(lats), len(lngs)), (TILE_SIZE, TILE_SIZE))
+        # pixel centres run north to south and west to east, inside the tile
+        self.assertTrue(north > lats[0] > lats[-1] > south)
+        self.assertTrue(west < lngs[0] < lngs[-1] < east)
+
+    def test_invalidation_drops_only_overlapping_tiles(self):
+        for key in ((12, 2926, 1707), (12, 2926, 1708), (12, 2000, 1000)):
+            tile_cache.put(key, b'png')
+        south, west, north, east = tile_bounds(12, 2926, 1707)
+        self.assertEqual(invalidate_circle((south + north) / 2, (west + east) / 2, 10), 1)
+        self.assertIsNone(tile_cache.get((12, 2926, 1707)))
+        self.assertEqual(tile_cache.get((12, 2926, 1708)), b'png')
+        self.assertEqual(tile_cache.invalidate_bbox(-90, -180, 90, 180), 2)
+
+    def test_invalidation_looks_up_the_covered_tiles_at_every_zoom(self):
+        covering = [(z, *tile_range(z, 28.6, 77.2, 28.6, 77.2)[::2]) for z in range(MIN_ZOOM, MAX_ZOOM + 1)]
+        for z, x, y in covering:
+            south, west, north, east = tile_bounds(z, x, y)
+            self.assertTrue(south <= 28.6 <= north and west <= 77.2 <= east)
+            tile_cache.put((z, x, y), b'png')
+        for x in range(1000):
+            tile_cache.put((MAX_ZOOM, x, 0), b'png')
+        self.assertEqual(invalidate_circle(28.6, 77.2, 0), len(covering))
+        self.assertEqual(len(tile_cache), 1000)
+
+    def test_alert_clears_its_tiles_on_commit(self):
+        tile_cache.put((12, 2926, 1707), b'png')
+        with self.captureOnCommitCallbacks(execute=True):
+            SOSAlert.objects.create(user=self.user, latitude=28.63, longitude=77.21)
+            self.assertEqual(len(tile_cache), 1)
+        self.assertEqual(len(tile_cache), 0)
+
+    def test_tiles_follow_unsafe_area_edits(self):
+        response = self.client.get('/api/core/heatmap/12/2926/1707/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        empty = response.content
+        self.assertEqual(len(tile_cache), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            area = UnsafeArea.objects.create(name='Connaught Place', latitude=28.6315, longitude=77.2167, radius=800)
+        self.assertEqual(len(tile_cache), 0)
+        self.assertNotEqual(self.client.get('/api/core/heatmap/12/2926/1707/').content, empty)
+        # moving the area away clears the tile it used to cover
+        area.latitude = 10.0
+        with self.captureOnCommitCallbacks(execute=True):
+            area.save()
+        self.assertEqual(len(tile_cache), 0)
+        self.assertEqual(self.client.get('/api/core/heatmap/12/2926/1707/').content, empty)
+
+    def test_tiles_need_authentication_and_a_city_zoom(self):
+        self.assertEqual(self.client.get(f'/api/core/heatmap/{MIN_ZOOM - 1}/0/0/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/core/heatmap/{MAX_ZOOM + 1}/0/0/').status_code, 404)
+        self.assertEqual(self.client.get('/api/core/heatmap/12/4096/0/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/core/heatmap/12/2926/1707/').status_code, 401)
+
+
+class SafeRouteTests(TestCase):
+    # 0 -> 1 straight east (~1 km) through a hazard, or 0 -> 2 -> 1 around it (~4.5 km)
+    lats = [28.60, 28.60, 28.62]
+    lngs = [77.20, 77.21, 77.205]
+    hazard = area_hazard(28.60, 77.205, 600)
+
+    def setUp(self):
+        reset_router()
+        self.addCleanup(reset_router)
+
+    def graph(self):
+        sources, targets = [0, 1, 0, 2, 2, 1], [1, 0, 2, 0, 1, 2]
+        return RoadGraph.from_edges(self.lats, self.lngs, sources, targets)
+
+    def test_route_avoids_hazards(self):
+        router = SafeRouter(self.graph(), safety_weight=10)
+        direct = router.route(0, 1)
+        self.assertEqual(direct.nodes, [0, 1])
+        self.assertAlmostEqual(direct.cost, direct.length)
+        self.assertEqual(direct.unsafe_length, 0)
+
+        router.set_hazards([self.hazard])
+        detour = router.route(0, 1)
+        self.assertEqual(detour.nodes, [0, 2, 1])
+        self.assertEqual(detour.unsafe_length, 0)
+        self.assertGreater(detour.length, 4 * direct.length)
+        self.assertEqual(router.coordinates(detour.nodes)[1], [28.62, 77.205])
+
+        router.update_hazards(removed=[self.hazard])
+        self.assertFalse(router.penalty.any())
+        self.assertEqual(router.route(0, 1).nodes, [0, 1])
+        router.update_hazards(added=[self.hazard])
+        self.assertEqual(router.route(0, 1).nodes, [0, 2, 1])
+
+    def test_parallel_edges_report_the_edge_taken(self):
+        # two roads from 0 to 1; the search takes the shorter, listed second
+        graph = RoadGraph(self.lats[:2], self.lngs[:2], [0, 2, 2], [1, 1], [1500.0, 980.0])
+        route = SafeRouter(graph).route(0, 1)
+        self.assertEqual(route.edges, [1])
+        self.assertEqual(route.length, 980.0)
+
+    def test_hazard_changes_are_applied_off_the_request(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'graph.npz'
+            self.graph().save(path)
+            with override_settings(ROUTING={'GRAPH_PATH': str(path), 'SAFETY_WEIGHT': 10}):
+                user = CustomUser.objects.create(phone_number='+919876543210')
+                client = APIClient()
+                query = '/api/core/routes/safest/?from_lat=28.6&from_lng=77.2&to_lat=28.6&to_lng=77.21'
+                self.assertEqual(client.get(query).status_code, 401)
+                client.force_authenticate(user)
+                self.assertEqual(len(client.get(query).data['path']), 2)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    area = UnsafeArea.objects.create(name='Market', latitude=28.60, longitude=77.205, radius=600)
+                apply_hazard_changes()
+                response = client.get(query)
+                self.assertEqual(len(response.data['path']), 3)
+                self.assertEqual(response.data['unsafe_distance_m'], 0)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    area.delete()
+                apply_hazard_changes()
+                self.assertFalse(get_router().penalty.any())
+                self.assertEqual(len(client.get(query).data['path']), 2)
+
+
+class SafetyScoreTests(TestCase):
+    def setUp(self):
+        reset_safety_scores()
+        self.addCleanup(reset_safety_scores)
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+
+    def test_events_are_smoothed_over_neighbouring_cells_and_hours(self):
+        index = SafetyScoreIndex(cell_size=0.01, tz='Asia/Kolkata')
+        # Monday 22:30 in Delhi
+        when = datetime(2025, 3, 3, 17, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(index.hour_of_week(when), 22)
+        index.add(28.605, 77.205, when)
+        self.assertEqual(index.density(28.605, 77.205, when), 1.0)
+        self.assertEqual(index.density(28.615, 77.205, when), 0.5)
+        self.assertEqual(index.density(28.615, 77.215, when + timedelta(hours=1)), 0.125)
+        self.assertEqual(index.density(28.625, 77.205, when), 0.0)
+        self.assertEqual(index.hourly(28.605, 77.205).sum(), 2.0)
+        self.assertAlmostEqual(index.score(28.605, 77.205, when), 1 - math.exp(-1 / index.scale))
+
+    def test_sessions_count_where_they_started(self):
+        live = get_safety_scores()
+        with self.captureOnCommitCallbacks(execute=True):
+            session = SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+            session.current_latitude, session.current_longitude = 28.9, 77.5
+            session.save()
+        self.assertEqual((session.start_latitude, session.start_longitude), (28.6, 77.2))
+
+        reset_safety_scores()
+        rebuilt = get_safety_scores()
+        self.assertEqual(rebuilt.events, live.events)
+        self.assertEqual(rebuilt.hourly(28.6, 77.2).tolist(), live.hourly(28.6, 77.2).tolist())
+        self.assertFalse(rebuilt.hourly(28.9, 77.5).any())
+
+    def test_rolled_back_events_are_not_counted(self):
+        scores = get_safety_scores()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            SOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2)
+            SOSSession.objects.create(user=self.user, current_latitude=28.6, current_longitude=77.2, activation_method='MANUAL')
+            raise RuntimeError
+        self.assertEqual(scores.events, 0)
+        self.assertFalse(scores.hourly(28.6, 77.2).any())
+
+    def test_rows_are_published_after_the_array_grows(self):
+        index = SafetyScoreIndex()
+        size = len(index._density)
+
+        class Rows(dict):
+            def __setitem__(self, cell, row):
+                # what an unlocked reader sees the moment the row becomes visible
+                assert row < len(index._density)
+                super().__setitem__(cell, row)
+
+        index._rows = Rows()
+        for i in range(size + 1):
+            index.add(i * 0.05, 77.2, timezone.now())
+        self.assertGreater(len(index._density), size)
+
+    def test_view(self):
+        SOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2)
+        client = APIClient()
+        self.assertEqual(client.get('/api/core/safety-score/?lat=28.6&lng=77.2').status_code, 401)
+        client.force_authenticate(self.user)
+        response = client.get('/api/core/safety-score/', {'lat': 28.6, 'lng': 77.2, 'time': timezone.now().isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['score'], 0)
+        self.assertEqual(response.data['density'], 1.0)
+        for params in ({'lat': 28.6}, {'lat': 95, 'lng': 77.2}, {'lat': 28.6, 'lng': 77.2, 'time': 'tonight'}):
+            self.assertEqual(client.get('/api/core/safety-score/', params).status_code, 400)
+
+
+class OfflineBundleTests(TestCase):
+    def setUp(self):
+        reset_unsafe_area_index()
+        self.addCleanup(reset_unsafe_area_index)
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        other = CustomUser.objects.create(phone_number='+919876543211')
+        self.near = UnsafeArea.objects.create(name='Underpass', latitude=28.6, longitude=77.2, radius=300)
+        self.far = UnsafeArea.objects.create(name='Ghat', latitude=25.3, longitude=83.0, radius=300)
+        self.contact = EmergencyContact.objects.create(user=self.user, name='Asha', phone_number='+919800000001', relationship='Sister')
+        EmergencyContact.objects.create(user=other, name='Ravi', phone_number='+919800000002', relationship='Friend')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fetch(self, **params):
+        response = self.client.get('/api/core/offline/bundle/', params)
+        self.assertEqual(response.status_code, 200)
+        bundle = decode_bundle(response.content)
+        self.assertEqual(bundle['version'], int(response['X-Sync-Version']))
+        return bundle
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/core/offline/bundle/').status_code, 401)
+
+    def test_full_bundle(self):
+        bundle = self.fetch()
+        self.assertFalse(bundle['delta'])
+        self.assertEqual([a[:2] for a in bundle['areas']], [(self.near.id, 'Underpass'), (self.far.id, 'Ghat')])
+        self.assertEqual(bundle['contacts'], [(self.contact.id, 'Asha', '+919800000001', 'Sister')])
+        self.assertEqual([a[0] for a in self.fetch(lat=28.6, lng=77.2, radius=5000)['areas']], [self.near.id])
+
+    def test_delta_since_version(self):
+        version = self.fetch()['version']
+        self.near.radius = 500
+        self.near.save()
+        contact_id = self.contact.id
+        self.contact.delete()
+        added = EmergencyContact.objects.create(user=self.user, name='Meera', phone_number='+919800000003', relationship='Mother')
+        bundle = self.fetch(since=version)
+        self.assertTrue(bundle['delta'])
+        self.assertEqual([(a[0], a[4]) for a in bundle['areas']], [(self.near.id, 500.0)])
+        self.assertEqual([c[0] for c in bundle['contacts']], [added.id])
+        self.assertEqual(bundle['deleted_contacts'], [contact_id])
+        self.assertEqual(bundle['deleted_areas'], [])
+        self.assertEqual(self.fetch(since=bundle['version'])['areas'], [])
+
+    def test_region_delta_drops_areas_that_left_the_region(self):
+        region = {'lat': 28.6, 'lng': 77.2, 'radius': 5000}
+        version = self.fetch(**region)['version']
+        self.near.latitude = 28.9
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near.save()
+        bundle = self.fetch(since=version, **region)
+        self.assertEqual(bundle['areas'], [])
+        self.assertEqual(bundle['deleted_areas'], [self.near.id])
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'lat': 28.6}, {'lat': 28.6, 'lng': 77.2, 'radius': 'inf'}, {'lat': 28.6, 'lng': 77.2, 'radius': -1},
+                       {'lat': 'nan', 'lng': 77.2}, {'since': -1}, {'since': 'x'}):
+            self.assertEqual(self.client.get('/api/core/offline/bundle/', params).status_code, 400, params)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(phone_number='+919876543210')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_ties_on_the_timestamp_are_broken_by_id(self):
+        now = timezone.now()
+        alerts = [SOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2) for _ in range(7)]
+        # three alerts share a timestamp across the page boundary
+        SOSAlert.objects.filter(id__in=[a.id for a in alerts[:3]]).update(timestamp=now)
+        SOSAlert.objects.filter(id__in=[a.id for a in alerts[3:]]).update(timestamp=now - timedelta(minutes=1))
+        expected = list(SOSAlert.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/core/sos-alerts/?page_size=2'), expected)
+
+    def test_rows_added_between_pages_do_not_shift_them(self):
+        for year in range(2010, 2016):
+            CrimeStats.objects.create(state_ut='Delhi', crime_head='Stalking', year=year, total_cases=1)
+        first = self.client.get('/api/core/crime-stats/?page_size=3').data
+        CrimeStats.objects.create(state_ut='Delhi', crime_head='Stalking', year=2020, total_cases=1)
+        rest = self.walk(first['next'])
+        seen = [row['id'] for row in first['results']] + rest
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(list(CrimeStats.objects.filter(id__in=seen).order_by('-year', '-id').values_list('id', flat=True)), seen)
+        self.assertEqual(len(seen), 6)
+
+    def test_page_size_and_cursor_validation(self):
+        for _ in range(3):
+            SOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2)
+        self.assertEqual(len(self.client.get('/api/core/sos-alerts/?page_size=0').data['results']), 1)
+        self.assertEqual(len(self.client.get('/api/core/sos-alerts/?page_size=x').data['results']), 3)
+        for cursor in ('not-base64!', 'WzFd', 'eyJhIjoxfQ'):
+            self.assertEqual(self.client.get(f'/api/core/sos-alerts/?cursor={cursor}').status_code, 404, cursor)
+
+    def test_lists_are_scoped_to_the_user(self):
+        other = CustomUser.objects.create(phone_number='+919876543211')
+        mine = SOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2)
+        SOSAlert.objects.create(user=other, latitude=28.6, longitude=77.2)
+        PastSOSAlert.objects.create(user=other, latitude=28.6, longitude=77.2)
+        past = PastSOSAlert.objects.create(user=self.user, latitude=28.6, longitude=77.2)
+        self.assertEqual(self.walk('/api/core/sos-alerts/'), [mine.id])
+        self.assertEqual(self.walk('/api/core/past-sos-alerts/'), [past.id])
+        response = self.client.get('/api/core/past-sos-alerts/?fields=id,latitude')
+        self.assertEqual(response.data['results'], [{'id': past.id, 'latitude': 28.6}])
+
+    def test_other_lists_stay_unpaginated(self):
+        area = UnsafeArea.objects.create(name='Underpass', latitude=28.6, longitude=77.2, radius=200)
+        EmergencyContact.objects.create(user=self.user, name='Asha', phone_number='+919800000001', relationship='Sister')
+        self.assertEqual([row['id'] for row in self.client.get('/api/core/unsafe-areas/').data], [area.id])
+        self.assertEqual([row['name'] for row in self.client.get('/api/core/emergency-contacts/').data], ['Asha'])
+        self.assertIn('results', self.client.get('/api/core/sos-sessions/').data)
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    # scope -> (burst, seconds to refill the whole burst)
+    'RATES': {
+        'otp_phone': (3, 600),
+        'otp_ip': (20, 600),
+        'otp_verify_ip': (30, 600),
+        'sos': (30, 60),
+    },
+    'MAX_KEYS': 100_000,
+    # OTP requests are turned away while this many requests are in flight, so SOS keeps the capacity
+    'OTP_SHED_IN_FLIGHT': 32,
+    'LOW_PRIORITY_PATHS': ('/api/auth/send-otp/', '/api/auth/verify-otp/'),
+}
+
+
+def rate_limit_settings():
+    return {**DEFAULTS, **getattr(settings, 'RATE_LIMITS', {})}
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by string, O(1) per check, at most max_keys buckets (LRU evicted).
+
+    An evicted key comes back with a full bucket, so max_keys should comfortably exceed
+    the number of clients active within one refill period.
+    """
+
+    def __init__(self, burst, period, max_keys=DEFAULTS['MAX_KEYS'], clock=time.monotonic):
+        self.burst = burst
+        self.rate = burst / period
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, tokens=1.0):
+        """Spend tokens for key; returns 0 when allowed, else seconds until it would be."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= tokens:
+                bucket[0] -= tokens
+                return 0.0
+            return (tokens - bucket[0]) / self.rate
+
+    def refund(self, key, tokens=1.0):
+        """Give back tokens taken for a request that was turned away elsewhere."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + tokens)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(scope):
+    limiter = _limiters.get(scope)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(scope)
+            if limiter is None:
+                conf = rate_limit_settings()
+                burst, period = conf['RATES'][scope]
+                limiter = _limiters[scope] = TokenBucketLimiter(burst, period, conf['MAX_KEYS'])
+    return limiter
+
+
+def reset_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def get_buckets(self, request, view):
+        """[(scope, key)] to take a token from, in order; none is spent unless all allow."""
+        key = self.get_key(request, view)
+        return [] if key is None else [(self.scope, key)]
+
+    def allow_request(self, request, view):
+        taken = []
+        for scope, key in self.get_buckets(request, view):
+            self._wait = get_limiter(scope).take(key)
+            if self._wait:
+                for taken_scope, taken_key in taken:
+                    get_limiter(taken_scope).refund(taken_key)
+                return False
+            taken.append((scope, key))
+        self._wait = 0.0
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class OTPPhoneThrottle(TokenBucketThrottle):
+    scope = 'otp_phone'
+
+    def get_key(self, request, view):
+        phone_number = request.data.get('phone_number')
+        return str(phone_number).strip() if phone_number else None
+
+
+class OTPIPThrottle(TokenBucketThrottle):
+    scope = 'otp_ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class OTPVerifyIPThrottle(OTPIPThrottle):
+    scope = 'otp_verify_ip'
+
+
+class OTPSendThrottle(OTPPhoneThrottle):
+    # the phone bucket first: texts refused for one number do not use up the sender's IP allowance
+    def get_buckets(self, request, view):
+        return [*super().get_buckets(request, view), (OTPIPThrottle.scope, self.get_ident(request))]
+
+
+class SOSThrottle(TokenBucketThrottle):
+    # only creating alerts/sessions is limited, and generously; reads, trails and ending are free
+    scope = 'sos'
+
+    def get_key(self, request, view):
+        if getattr(view, 'action', None) != 'create':
+            return None
+        return f"user:{request.user.pk}" if request.user.is_authenticated else f"ip:{self.get_ident(request)}"
+
+
+class PriorityAdmissionMiddleware:
+    """Sheds OTP traffic first when the server is busy.
+
+    Counts requests in flight in this process; once OTP_SHED_IN_FLIGHT are running,
+    LOW_PRIORITY_PATHS get a 503 with Retry-After and everything else, SOS
+    included, is still admitted. Only useful when a process serves requests
+    concurrently (threaded workers such as gunicorn --threads, or ASGI): a sync
+    WSGI worker runs one request at a time and so never reaches the threshold.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        conf = rate_limit_settings()
+        self.shed_at = conf['OTP_SHED_IN_FLIGHT']
+        self.low_priority = tuple(conf['LOW_PRIORITY_PATHS'])
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        low_priority = request.path.startswith(self.low_priority)
+        with self._lock:
+            if low_priority and self.in_flight >= self.shed_at:
+                response = JsonResponse({"error": "Server busy, please retry shortly"}, status=503)
+                response['Retry-After'] = '5'
+                return response
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
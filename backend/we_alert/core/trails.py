@@ -0,0 +1,122 @@
+import zlib
+
+import numpy as np
+from django.db.models import OuterRef, Subquery
+
+from .models import LocationTrailChunk
+
+# A chunk covers at most CHUNK_MS of trail and MAX_CHUNK_POINTS points.
+CHUNK_MS = 5 * 60 * 1000
+MAX_CHUNK_POINTS = 2048
+# fixed-point coordinates, 1e-6 degrees is ~0.1 m
+COORD_SCALE = 1_000_000
+MAX_BATCH_POINTS = 20_000
+# accepted point timestamps (2000-01-01 .. 2100-01-01); anything else is a client bug
+MIN_TIMESTAMP_MS = 946_684_800_000
+MAX_TIMESTAMP_MS = 4_102_444_800_000
+
+
+def valid_point(timestamp_ms, lat, lng):
+    # the comparisons are False for NaN as well
+    return MIN_TIMESTAMP_MS <= timestamp_ms < MAX_TIMESTAMP_MS and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def encode_chunk(times_ms, lats, lngs):
+    """Pack sorted points as zlib-compressed int32 deltas.
+
+    Layout is three little-endian int32 rows (time offset from start_ms, lat, lng);
+    the first column holds absolute values and the rest are deltas.
+    """
+    start_ms = int(times_ms[0])
+    columns = np.stack([
+        times_ms - start_ms,
+        np.rint(lats * COORD_SCALE).astype(np.int64),
+        np.rint(lngs * COORD_SCALE).astype(np.int64),
+    ])
+    deltas = np.diff(columns, axis=1, prepend=0)
+    return start_ms, zlib.compress(deltas.astype('<i4').tobytes())
+
+
+def decode_chunk(start_ms, point_count, data):
+    columns = np.frombuffer(zlib.decompress(bytes(data)), dtype='<i4').reshape(3, point_count)
+    columns = np.cumsum(columns, axis=1, dtype=np.int64)
+    return columns[0] + start_ms, columns[1] / COORD_SCALE, columns[2] / COORD_SCALE
+
+
+def build_chunks(session_id, points):
+    """points: iterable of (timestamp_ms, lat, lng), in any order."""
+    points = np.asarray(list(points), dtype=np.float64).reshape(-1, 3)
+    if not len(points):
+        return []
+    points = points[np.argsort(points[:, 0], kind='stable')]
+    times_ms = points[:, 0].astype(np.int64)
+
+    chunks = []
+    begin = 0
+    while begin < len(points):
+        end = int(np.searchsorted(times_ms, times_ms[begin] + CHUNK_MS, side='left'))
+        end = min(max(end, begin + 1), begin + MAX_CHUNK_POINTS)
+        start_ms, data = encode_chunk(times_ms[begin:end], points[begin:end, 1], points[begin:end, 2])
+        chunks.append(LocationTrailChunk(
+            session_id=session_id,
+            start_ms=start_ms,
+            end_ms=int(times_ms[end - 1]),
+            point_count=end - begin,
+            data=data,
+        ))
+        begin = end
+    return chunks
+
+
+def append_points(session_id, points):
+    return append_many({session_id: points})
+
+
+def append_many(trails):
+    """Store points for several sessions at once; trails maps session_id -> points.
+
+    Points no older than a session's latest chunk go into that chunk while it has room
+    (it is re-encoded in place), so a trail written back a second at a time still ends
+    up as a few full rows. Returns the chunks written.
+    """
+    trails = {session_id: list(points) for session_id, points in trails.items()}
+    trails = {session_id: points for session_id, points in trails.items() if points}
+    if not trails:
+        return []
+    latest = LocationTrailChunk.objects.filter(session_id=OuterRef('session_id')).order_by('-start_ms', '-id').values('id')[:1]
+    open_chunks = {
+        chunk.session_id: chunk
+        for chunk in LocationTrailChunk.objects.filter(session_id__in=trails, id=Subquery(latest))
+    }
+    extended, created = [], []
+    for session_id, points in trails.items():
+        chunk = open_chunks.get(session_id)
+        if chunk is not None and chunk.point_count < MAX_CHUNK_POINTS and min(p[0] for p in points) >= chunk.start_ms:
+            times_ms, lats, lngs = decode_chunk(chunk.start_ms, chunk.point_count, chunk.data)
+            points = list(zip(times_ms.tolist(), lats.tolist(), lngs.tolist())) + points
+            first, *rest = build_chunks(session_id, points)
+            first.pk = chunk.pk
+            extended.append(first)
+            created.extend(rest)
+        else:
+            created.extend(build_chunks(session_id, points))
+    if extended:
+        LocationTrailChunk.objects.bulk_update(extended, ['start_ms', 'end_ms', 'point_count', 'data'])
+    return extended + LocationTrailChunk.objects.bulk_create(created)
+
+
+def load_trail(session_id):
+    """Return (timestamps_ms, lats, lngs) arrays for the whole session, in time order."""
+    rows = list(
+        LocationTrailChunk.objects.filter(session_id=session_id)
+        .order_by('start_ms')
+        .values_list('start_ms', 'point_count', 'data')
+    )
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty.astype(np.float64), empty.astype(np.float64)
+    times, lats, lngs = zip(*(decode_chunk(*row) for row in rows))
+    times, lats, lngs = np.concatenate(times), np.concatenate(lats), np.concatenate(lngs)
+    # uploads from different devices/batches may overlap in time
+    order = np.argsort(times, kind='stable')
+    return times[order], lats[order], lngs[order]
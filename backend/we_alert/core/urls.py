@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SOSAlertViewSet, UnsafeAreaViewSet, CrimeViewSet,EmergencyContactViewSet, UserSettingsViewSet, SOSSessionViewSet
+from .views import SOSAlertViewSet, PastSOSAlertViewSet, UnsafeAreaViewSet, CrimeViewSet,EmergencyContactViewSet, UserSettingsViewSet, SOSSessionViewSet, GeofencePingView, HeatmapTileView, SafeRouteView, SafetyScoreView, OfflineBundleView, MetricsView
 
 router=DefaultRouter()
 
 router.register(r'sos-alerts',SOSAlertViewSet,basename='sosalert')
+router.register(r'past-sos-alerts',PastSOSAlertViewSet,basename='pastsosalert')
 router.register(r'unsafe-areas',UnsafeAreaViewSet,basename='unsafearea')
 router.register(r'crime-stats',CrimeViewSet,basename='crimestat')
 router.register(r'emergency-contacts', EmergencyContactViewSet, basename='emergencycontact')
@@ -13,4 +14,10 @@ router.register(r'sos-sessions', SOSSessionViewSet, basename='sossession')
 
 urlpatterns=[
     path('',include(router.urls)),
+    path('geofence/pings/', GeofencePingView.as_view(), name='geofence_pings'),
+    path('heatmap/<int:z>/<int:x>/<int:y>/', HeatmapTileView.as_view(), name='heatmap_tile'),
+    path('routes/safest/', SafeRouteView.as_view(), name='safe_route'),
+    path('safety-score/', SafetyScoreView.as_view(), name='safety_score'),
+    path('offline/bundle/', OfflineBundleView.as_view(), name='offline_bundle'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
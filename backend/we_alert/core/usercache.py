@@ -0,0 +1,80 @@
+# Read-through cache of the small per-user records the SOS path needs (settings and
+# emergency contacts), on Django's cache framework. With the default local-memory
+# cache each worker keeps its own copy; configure a shared CACHES backend so an edit
+# made through one worker is seen by all of them at once rather than after TIMEOUT.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import EmergencyContact, UserSettings
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+_MISSING = 'missing'
+
+
+def user_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'USER_RECORD_CACHE', {})}
+
+
+def _cache():
+    return caches[user_cache_settings()['CACHE_ALIAS']]
+
+
+def _settings_key(user_id):
+    return f"core:user-settings:{user_id}"
+
+
+def _contacts_key(user_id):
+    return f"core:emergency-contacts:{user_id}"
+
+
+def get_user_settings(user_id, create=False):
+    """The user's UserSettings, or None if they have none and create is False."""
+    cache = _cache()
+    cached = cache.get(_settings_key(user_id))
+    if cached is not None and (cached != _MISSING or not create):
+        return None if cached == _MISSING else cached
+    if create:
+        instance, _ = UserSettings.objects.get_or_create(user_id=user_id)
+    else:
+        instance = UserSettings.objects.filter(user_id=user_id).first()
+    cache.set(_settings_key(user_id), _MISSING if instance is None else instance, user_cache_settings()['TIMEOUT'])
+    return instance
+
+
+def get_many_user_settings(user_ids):
+    """{user_id: UserSettings} for the users that have settings, one query for all misses."""
+    cache = _cache()
+    keys = {_settings_key(user_id): user_id for user_id in user_ids}
+    found = {}
+    for key, value in cache.get_many(keys).items():
+        found[keys[key]] = value
+    missing = [user_id for user_id in keys.values() if user_id not in found]
+    if missing:
+        loaded = {row.user_id: row for row in UserSettings.objects.filter(user_id__in=missing)}
+        cache.set_many(
+            {_settings_key(user_id): loaded.get(user_id, _MISSING) for user_id in missing},
+            user_cache_settings()['TIMEOUT'],
+        )
+        found.update((user_id, loaded.get(user_id, _MISSING)) for user_id in missing)
+    return {user_id: value for user_id, value in found.items() if value != _MISSING}
+
+
+def get_emergency_contacts(user_id):
+    """The user's emergency contacts, oldest first."""
+    cache = _cache()
+    contacts = cache.get(_contacts_key(user_id))
+    if contacts is None:
+        contacts = list(EmergencyContact.objects.filter(user_id=user_id).order_by('id'))
+        cache.set(_contacts_key(user_id), contacts, user_cache_settings()['TIMEOUT'])
+    return contacts
+
+
+def invalidate_user_records(user_id):
+    cache = _cache()
+    cache.delete_many([_settings_key(user_id), _contacts_key(user_id)])
+    # a reader may re-cache the old rows before the writer commits, so clear again after
+    transaction.on_commit(lambda: cache.delete_many([_settings_key(user_id), _contacts_key(user_id)]))
@@ -1,34 +1,151 @@
+import time
+
 from django.shortcuts import render
 from rest_framework import generics,permissions,status,viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import SOSAlert, PastSOSAlert, UnsafeArea, CrimeStats,EmergencyContact,UserSettings,SOSSession
-from .serializers import SOSAlertSerializer, PastSOSAlertSerializer, UnsafeAreaSerializer, CrimeStatsSerializer,SOSSessionSerializer,EmergencyContactSerializer,UserSettingsSerializer
+from .models import SOSAlert, PastSOSAlert, UnsafeArea, CrimeStats,EmergencyContact,UserSettings,SOSSession,ContactNotification
+from .serializers import SOSAlertSerializer, PastSOSAlertSerializer, UnsafeAreaSerializer, CrimeStatsSerializer,SOSSessionSerializer,EmergencyContactSerializer,UserSettingsSerializer,ContactNotificationSerializer
 from django.utils import timezone
 from rest_framework.decorators import action
-from twilio.rest import Client
 from django.conf import settings
+from .spatial import MAX_QUERY_RADIUS_M, get_unsafe_area_index
+from .geofence import process_pings
+from .notifications import notify_nearby_responders, notify_sos_session
+from .trails import append_points, load_trail, valid_point, MAX_BATCH_POINTS
+from .rollups import DIMENSIONS, query_rollups
+from .importer import import_crime_stats
+from rest_framework.parsers import MultiPartParser
+from .heatmap import MAX_ZOOM, MIN_ZOOM, get_tile
+from django.http import HttpResponse
+from .routing import get_router
+from .scoring import get_safety_scores
+from django.utils.dateparse import parse_datetime
+from .offline import CONTENT_TYPE as BUNDLE_CONTENT_TYPE, build_bundle
+from .serializers import ValuesReader, requested_fields
+from .throttling import SOSThrottle
+from .usercache import get_user_settings
+from .metrics import current_timings, get_profiler, get_registry
+from .responders import get_live_locations, nearby_responders
+from .writer import write
+from .pagination import KeysetPagination
+
+class FieldSelectionMixin:
+    # with ?fields=, load only the requested columns (plus the pagination keys)
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = requested_fields(self.request)
+        if fields:
+            columns = {field.name for field in queryset.model._meta.concrete_fields}
+            keys = {name.lstrip('-') for name in getattr(self, 'ordering', None) or ('id',)}
+            queryset = queryset.only('id', *keys, *(name for name in fields if name in columns))
+        return queryset
+
+
+class ValuesListMixin:
+    # list() reads plain rows with .values() instead of building model and serializer field
+    # objects per row; the output is what the serializer would give (see ValuesReader)
+    def list(self, request, *args, **kwargs):
+        reader = ValuesReader.for_serializer(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        keys = [name.lstrip('-') for name in getattr(self, 'ordering', None) or ('id',)]
+        values = reader.values(self.filter_queryset(self.get_queryset()), *keys)
+        page = self.paginate_queryset(values)
+        rows = self.read_rows(reader, values if page is None else page)
+        return Response(rows) if page is None else self.get_paginated_response(rows)
 
-class SOSAlertViewSet(viewsets.ModelViewSet):
-    queryset=SOSAlert.objects.all()
+    def read_rows(self, reader, values):
+        start = time.perf_counter()
+        rows = reader.rows(values)
+        timings = current_timings()
+        if timings is not None:
+            timings.serialize += time.perf_counter() - start
+        return rows
+
+
+class SOSAlertViewSet(ValuesListMixin, FieldSelectionMixin, viewsets.ModelViewSet):
     serializer_class=SOSAlertSerializer
     permission_classes=[permissions.IsAuthenticated]
+    pagination_class=KeysetPagination
+    throttle_classes=[SOSThrottle]
+    ordering=('-timestamp', '-id')
+
+    def get_queryset(self):
+        return SOSAlert.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        write(serializer.save, user=self.request.user)
+
+class PastSOSAlertViewSet(ValuesListMixin, FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class=PastSOSAlertSerializer
+    permission_classes=[permissions.IsAuthenticated]
+    pagination_class=KeysetPagination
+    ordering=('-timestamp', '-id')
 
-class UnsafeAreaViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        return PastSOSAlert.objects.filter(user=self.request.user)
+
+class UnsafeAreaViewSet(ValuesListMixin, FieldSelectionMixin, viewsets.ModelViewSet):
     queryset=UnsafeArea.objects.all()
     serializer_class=UnsafeAreaSerializer
     permission_classes=[permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', 0))
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required, radius is optional (meters)"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 <= radius <= MAX_QUERY_RADIUS_M):
+            return Response({"error": f"Coordinates out of range or radius not within 0-{MAX_QUERY_RADIUS_M} meters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        area_ids = get_unsafe_area_index().query(lat, lng, radius)
+        areas = UnsafeArea.objects.filter(id__in=area_ids) if area_ids else UnsafeArea.objects.none()
+        reader = ValuesReader.for_serializer(self.get_serializer())
+        return Response(self.read_rows(reader, reader.values(areas)))
 
-class CrimeViewSet(viewsets.ModelViewSet):
+
+class CrimeViewSet(ValuesListMixin, FieldSelectionMixin, viewsets.ModelViewSet):
     queryset=CrimeStats.objects.all()
     serializer_class=CrimeStatsSerializer
-    permission_classes=[permissions.AllowAny]    
+    permission_classes=[permissions.AllowAny]
+    pagination_class=KeysetPagination
+    ordering=('-year', '-id')
+
+    @action(detail=False, methods=['get'])
+    def aggregate(self, request):
+        # e.g. ?year=2022&group_by=state_ut or ?crime_head=Rape&group_by=year
+        group_by = [dim for dim in request.query_params.get('group_by', '').split(',') if dim]
+        if any(dim not in DIMENSIONS for dim in group_by):
+            return Response({"error": f"group_by must be a subset of {', '.join(DIMENSIONS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        filters = {dim: request.query_params[dim] for dim in DIMENSIONS if dim in request.query_params}
+        if set(filters) & set(group_by):
+            return Response({"error": "A dimension cannot be both filtered and grouped"}, status=status.HTTP_400_BAD_REQUEST)
+        if 'year' in filters:
+            try:
+                filters['year'] = int(filters['year'])
+            except ValueError:
+                return Response({"error": "year must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = query_rollups(filters, group_by).values(*group_by, 'total_cases', 'row_count')
+        return Response({"filters": filters, "group_by": group_by, "results": list(rows)})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser], permission_classes=[permissions.IsAdminUser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload a CSV or XLSX file as 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = int(request.query_params.get('batch_size', 2000))
+            result = import_crime_stats(upload.file, upload.name, batch_size=max(batch_size, 1))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result._asdict(), status=status.HTTP_200_OK)
 
-class EmergencyContactViewSet(viewsets.ModelViewSet):
+class EmergencyContactViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     serializer_class = EmergencyContactSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -38,7 +155,7 @@ class EmergencyContactViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class UserSettingsViewSet(viewsets.ModelViewSet):
+class UserSettingsViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     serializer_class = UserSettingsSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -46,45 +163,220 @@ class UserSettingsViewSet(viewsets.ModelViewSet):
         return UserSettings.objects.filter(user=self.request.user)
     
     def get_object(self):
-        settings, created = UserSettings.objects.get_or_create(user=self.request.user)
-        return settings
-class SOSSessionViewSet(viewsets.ModelViewSet):
+        # reads may come from the cache; an update must start from the stored row or it
+        # would write stale fields back
+        if self.action == 'retrieve':
+            return get_user_settings(self.request.user.pk, create=True)
+        return UserSettings.objects.get_or_create(user=self.request.user)[0]
+class SOSSessionViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     serializer_class = SOSSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    throttle_classes = [SOSThrottle]
+    ordering = ('-start_time', '-id')
     
     def get_queryset(self):
         return SOSSession.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
-        session = serializer.save(user=self.request.user)
+        session = write(serializer.save, user=self.request.user)
         self.notify_emergency_contacts(session)
+        self.notify_nearby_responders(session)
         
         return session
+
+    def perform_update(self, serializer):
+        # location updates arrive from every active session every few seconds
+        write(serializer.save)
+
     @action(detail=True, methods=['post'])
     def end_session(self, request, pk=None):
         session = self.get_object()
         if session.is_active:
-            session.end_session()
+            write(session.end_session)
             return Response({"message": "SOS session ended"}, status=status.HTTP_200_OK)
         return Response({"message": "Session already ended"}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get'])
+    def notifications(self, request, pk=None):
+        session = self.get_object()
+        serializer = ContactNotificationSerializer(ContactNotification.objects.filter(session=session), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get', 'post'])
+    def trail(self, request, pk=None):
+        session = self.get_object()
+        if request.method == 'GET':
+            times_ms, lats, lngs = load_trail(session.pk)
+            return Response({
+                "timestamps": (times_ms / 1000.0).tolist(),
+                "latitudes": lats.tolist(),
+                "longitudes": lngs.tolist(),
+            })
+
+        points = request.data.get('points')
+        if not isinstance(points, list) or not points:
+            return Response({"error": "points must be a non-empty list of {latitude, longitude, timestamp}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(points) > MAX_BATCH_POINTS:
+            return Response({"error": f"At most {MAX_BATCH_POINTS} points per request"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # timestamps are epoch seconds
+            batch = [(float(p['timestamp']) * 1000.0, float(p['latitude']), float(p['longitude'])) for p in points]
+        except (KeyError, TypeError, ValueError):
+            return Response({"error": "Each point needs numeric latitude, longitude and timestamp"}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(valid_point(*point) for point in batch):
+            return Response({"error": "Coordinates or timestamp out of range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunks = write(append_points, session.pk, batch)
+        return Response({"stored": len(batch), "chunks": len(chunks)}, status=status.HTTP_201_CREATED)
+
     def notify_emergency_contacts(self, session):
-        contacts=EmergencyContactSerializer.objects.filter(user=session.user)
-        if contacts.exists():
-            client=Client(settings.TWILIO_ACCOUNT_SID,settings.TWILIO_AUTH_TOKEN)
-            message_body=(
-                f"EMERGENCY ALERT: {session.user.phone_number} has triggered an SOS alert. "
-                f"They are located at coordinates: {session.current_latitude}, {session.current_longitude}. "
-                f"Please check on them immediately."
-            )
-            for contact in contacts:
-                try:
-                    message = client.messages.create(
-                        body=message_body,
-                        from_=settings.TWILIO_NUMBER,
-                        to=contact.phone_number
-                    )
-                except Exception as e:
-                    
-                    print(f"Failed to send message to {contact.phone_number}: {str(e)}")
+        # fan-out runs on the dispatcher's worker pool once the session is committed
+        notify_sos_session(session)
+
+    def notify_nearby_responders(self, session):
+        # opted-in users whose live position (see core/responders.py) is closest to the SOS
+        responders = nearby_responders(session.current_latitude, session.current_longitude, exclude={session.user_id})
+        notify_nearby_responders(session, responders)
+
+
+class GeofencePingView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        pings = request.data.get('pings')
+        if not isinstance(pings, list) or not pings:
+            return Response({"error": "pings must be a non-empty list of {latitude, longitude}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch = [(request.user.id, float(p['latitude']), float(p['longitude'])) for p in pings]
+        except (KeyError, TypeError, ValueError):
+            return Response({"error": "Each ping needs numeric latitude and longitude"}, status=status.HTTP_400_BAD_REQUEST)
+        # NaN fails these comparisons too
+        if not all(-90 <= lat <= 90 and -180 <= lng <= 180 for _, lat, lng in batch):
+            return Response({"error": "Coordinates out of range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_settings = get_user_settings(request.user.id)
+        if user_settings is not None and user_settings.available_as_responder:
+            get_live_locations().update(*batch[-1])
+
+        entries, sessions = process_pings(batch)
+        for session in sessions:
+            notify_sos_session(session)
+        return Response({
+            "entered_areas": sorted(area_id for entry in entries for area_id in entry.area_ids),
+            "sos_session": SOSSessionSerializer(sessions[0]).data if sessions else None,
+        }, status=status.HTTP_200_OK)
+
+
+class HeatmapTileView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, z, x, y):
+        if not MIN_ZOOM <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return Response({"error": f"Tile out of range (zoom {MIN_ZOOM}-{MAX_ZOOM})"}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(get_tile(z, x, y), content_type='image/png')
+        response['Cache-Control'] = 'private, max-age=300'
+        return response
+
+
+class SafeRouteView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # e.g. ?from_lat=28.63&from_lng=77.21&to_lat=28.57&to_lng=77.24
+        try:
+            points = [float(request.query_params[k]) for k in ('from_lat', 'from_lng', 'to_lat', 'to_lng')]
+        except (KeyError, ValueError):
+            return Response({"error": "from_lat, from_lng, to_lat and to_lng are required"}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(-90 <= lat <= 90 and -180 <= lng <= 180 for lat, lng in (points[:2], points[2:])):
+            return Response({"error": "Coordinates out of range"}, status=status.HTTP_400_BAD_REQUEST)
+        router = get_router()
+        if router is None:
+            return Response({"error": "Routing is not configured"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        source = router.graph.nearest_node(*points[:2])
+        target = router.graph.nearest_node(*points[2:])
+        if source is None or target is None:
+            return Response({"error": "No road near the start or destination"}, status=status.HTTP_404_NOT_FOUND)
+        route = router.route(source, target)
+        if route is None:
+            return Response({"error": "No route between these points"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "distance_m": round(route.length, 1),
+            "unsafe_distance_m": round(route.unsafe_length, 1),
+            "cost": round(route.cost, 1),
+            "path": router.coordinates(route.nodes),
+        })
+
+
+class SafetyScoreView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # e.g. ?lat=28.63&lng=77.21&time=2025-03-01T22:30:00%2B05:30 (time defaults to now)
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required, time is optional (ISO 8601)"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"error": "Coordinates out of range"}, status=status.HTTP_400_BAD_REQUEST)
+        when = timezone.now()
+        if request.query_params.get('time'):
+            try:
+                when = parse_datetime(request.query_params['time'])
+            except ValueError:
+                when = None
+            if when is None:
+                return Response({"error": "time must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+
+        scores = get_safety_scores()
+        return Response({
+            "score": round(scores.score(lat, lng, when), 4),
+            "density": round(scores.density(lat, lng, when), 3),
+            "hour_of_week": scores.hour_of_week(when),
+        })
+
+
+class OfflineBundleView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # full bundle: ?lat=&lng=&radius= (region optional); delta: add ?since=<X-Sync-Version of the last bundle>
+        # and the same region; a client whose region moved must fetch a full bundle again
+        params = request.query_params
+        region = None
+        since = None
+        try:
+            if 'lat' in params or 'lng' in params:
+                region = (float(params['lat']), float(params['lng']), float(params.get('radius', 20000)))
+            if 'since' in params:
+                since = int(params['since'])
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng go together, radius is in meters and since is an integer version"}, status=status.HTTP_400_BAD_REQUEST)
+        if region is not None and not (-90 <= region[0] <= 90 and -180 <= region[1] <= 180 and 0 <= region[2] <= MAX_QUERY_RADIUS_M):
+            return Response({"error": "Coordinates or radius out of range"}, status=status.HTTP_400_BAD_REQUEST)
+        if since is not None and since < 0:
+            return Response({"error": "since must not be negative"}, status=status.HTTP_400_BAD_REQUEST)
+
+        version, bundle = build_bundle(request.user, region=region, since=since)
+        response = HttpResponse(bundle, content_type=BUNDLE_CONTENT_TYPE)
+        response['X-Sync-Version'] = str(version)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
+    def get(self, request):
+        # per-route histograms since the process started (times in ms); ?reset=1 starts over
+        registry = get_registry()
+        routes = registry.snapshot()
+        if request.query_params.get('reset') == '1':
+            registry.clear()
+        profiler = get_profiler()
+        return Response({
+            "routes": routes,
+            "slow_requests": list(profiler.slow) if profiler is not None else None,
+        })
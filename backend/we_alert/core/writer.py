@@ -0,0 +1,177 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import current_timings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # most jobs committed together; whatever queued up during the previous commit goes in the next
+    'MAX_BATCH': 64,
+    # seconds write() waits on a queued job before taking it back and running it inline, and
+    # then on a job already running before giving up with WriterBusy
+    'TIMEOUT': 5.0,
+}
+_STOP = object()
+
+
+class WriterBusy(APIException):
+    """A write job ran past write()'s timeout; views answer 503. The job may still commit."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server busy, please retry shortly"
+    default_code = 'writer_busy'
+
+
+def writer_settings():
+    return {**DEFAULTS, **getattr(settings, 'DB_WRITER', {})}
+
+
+class BatchWriter:
+    """One thread that runs write jobs, committing each batch of queued jobs in a single transaction.
+
+    SQLite allows one writer at a time, so funnelling small writes through here turns
+    many competing transactions (and fsyncs) into few, without "database is locked".
+    Each job runs in its own savepoint: one failing job does not undo the others.
+    Futures resolve only after the batch has committed. Jobs run in the context of
+    the submitting thread, so their queries count towards its request's timings.
+    """
+
+    def __init__(self, max_batch=DEFAULTS['MAX_BATCH']):
+        self.max_batch = max_batch
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self._queue.put((fn, args, kwargs, future, contextvars.copy_context()))
+        return future
+
+    def shutdown(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [job for job in batch if job is not _STOP]
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    # keep the thread alive whatever happens; nobody would notice it had died
+                    logger.exception("Writer failed on a batch of %d jobs", len(batch))
+                    for job in batch:
+                        if not job[3].done():
+                            job[3].set_exception(e)
+        connection.close()
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                for fn, args, kwargs, future, context in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, context.run(fn, *args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            logger.exception("Write batch of %d jobs failed to commit", len(batch))
+            for _, _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.jobs += len(outcomes)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BatchWriter(writer_settings()['MAX_BATCH'])
+    return _writer
+
+
+def reset_writer():
+    """Stops the writer thread (after it finishes what is queued); the next write starts a new one."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.shutdown()
+        _writer = None
+
+
+def write(fn, *args, **kwargs):
+    """Runs fn(*args, **kwargs) on the writer and returns its result once committed.
+
+    Runs inline when the writer is disabled or the caller is inside a transaction,
+    since the writer could not see (or would wait on) the caller's uncommitted rows,
+    and when the writer thread is gone. A job still queued after TIMEOUT seconds is
+    taken back and run inline; one already running is waited for another TIMEOUT
+    seconds, after which WriterBusy is raised. The wait is added to the request's
+    RequestTimings.writer.
+    """
+    conf = writer_settings()
+    if not conf['ENABLED'] or connection.in_atomic_block:
+        return fn(*args, **kwargs)
+    writer = get_writer()
+    if not writer.alive:
+        logger.error("Writer thread is not running; writing inline")
+        return fn(*args, **kwargs)
+    start = time.perf_counter()
+    future = writer.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=conf['TIMEOUT'])
+    except TimeoutError:
+        if future.cancel():
+            logger.warning("Write job waited %.1fs in the writer queue; running it inline", conf['TIMEOUT'])
+            return fn(*args, **kwargs)
+        try:
+            return future.result(timeout=conf['TIMEOUT'])
+        except TimeoutError:
+            logger.error("Write job still running after %.1fs; giving up on it", 2 * conf['TIMEOUT'])
+            raise WriterBusy() from None
+    finally:
+        timings = current_timings()
+        if timings is not None:
+            timings.writer += time.perf_counter() - start
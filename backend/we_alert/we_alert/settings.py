@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -23,6 +24,71 @@ TWILIO_ACCOUNT_SID = env("MY_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = env("TWILIO_AUTH_TOKEN")
 TWILIO_NUMBER = env("MY_TWILIO_NUMBER")
 
+# SOS contact fan-out and OTP texts; set TRANSPORT to 'core.notifications.FakeTransport' to run offline
+SOS_NOTIFICATIONS = {
+    'TRANSPORT': env("SOS_NOTIFICATION_TRANSPORT", default='core.notifications.TwilioTransport'),
+    'MAX_WORKERS': 8,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 0.5,
+}
+
+# Where OTP codes live (see authapp/otp.py). DatabaseOTPStore is shared by every worker;
+# authapp.otp.RedisOTPStore with OTP_REDIS_URL takes the load off the database. InMemoryOTPStore
+# is for tests only: a code issued by one worker is unknown to the others.
+OTP_STORE = {
+    'BACKEND': env("OTP_STORE", default='authapp.otp.DatabaseOTPStore'),
+    'OPTIONS': {'url': env("OTP_REDIS_URL")} if env("OTP_REDIS_URL", default='') else {},
+    'TTL_SECONDS': 240,
+    'MAX_ATTEMPTS': 3,
+}
+
+# Latest positions of users who opted in as responders (see core/responders.py), fed by
+# geofence pings. Each worker process indexes the pings it receives; a new SOS session
+# texts up to MAX_RESPONDERS of them within RADIUS_M meters.
+LIVE_LOCATIONS = {
+    'CELL_SIZE': 0.01,
+    'TTL_SECONDS': 120,
+    'RADIUS_M': 2000,
+    'MAX_RESPONDERS': 5,
+}
+
+# Token-bucket limits (see core/throttling.py): scope -> (burst, seconds to refill it).
+# Buckets live in each worker process and at most MAX_KEYS are kept per scope.
+# OTP_SHED_IN_FLIGHT (PriorityAdmissionMiddleware) needs threaded workers or ASGI; a sync
+# WSGI worker never has more than one request in flight.
+RATE_LIMITS = {
+    'RATES': {
+        'otp_phone': (3, 600),
+        'otp_ip': (20, 600),
+        'otp_verify_ip': (30, 600),
+        'sos': (30, 60),
+    },
+    'MAX_KEYS': 100_000,
+    'OTP_SHED_IN_FLIGHT': 32,
+}
+
+# Live SOS location streams (see core/streaming.py); positions are written back once per FLUSH_INTERVAL seconds
+LOCATION_STREAM = {
+    'BROKER': 'core.streaming.InMemoryBroker',
+    'FLUSH_INTERVAL': 1.0,
+    'SUBSCRIBER_QUEUE_SIZE': 64,
+}
+
+# Safety-weighted walking routes (see core/routing.py); GRAPH_PATH is an .npz from
+# `manage.py build_road_graph` or an OSM XML extract. Edge cost = length * (1 + SAFETY_WEIGHT * unsafety)
+ROUTING = {
+    'GRAPH_PATH': env("ROUTING_GRAPH_PATH", default=''),
+    'SAFETY_WEIGHT': 4.0,
+}
+
+# Time-of-day safety scores (see core/scoring.py): SOS alerts and sessions counted per
+# CELL_SIZE-degree cell and local hour of the week
+SAFETY_SCORES = {
+    'CELL_SIZE': 0.01,
+    'TIME_ZONE': 'Asia/Kolkata',
+    'SCALE': 5.0,
+}
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -50,11 +116,16 @@ INSTALLED_APPS = [
     'authapp',
     'rest_framework',
     'rest_framework_simplejwt',
+    # shared by all workers: logout blacklists the refresh and access tokens here
+    # (prune expired rows with `manage.py flushexpiredtokens`)
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'core.throttling.PriorityAdmissionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,13 +159,41 @@ WSGI_APPLICATION = 'we_alert.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL lets reads run alongside the single writer; synchronous=NORMAL is durable across
+# application crashes in WAL mode (only an OS crash can lose the last commits)
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-32000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': env.int("DB_CONN_MAX_AGE", default=600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # take the write lock at BEGIN, where the busy timeout applies, not mid-transaction;
+            # this makes every atomic() block a writer, read-only ones included, so keep them short
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+        },
     }
 }
 
+# Hot small writes (SOS alerts, manual and geofence AUTO sessions, streamed and REST location
+# updates, trails, delivery status) go through one writer thread that commits whatever has
+# queued up together (see core/writer.py). A write stuck past twice TIMEOUT answers 503.
+DB_WRITER = {
+    'ENABLED': env.bool("DB_BATCHED_WRITER", default=True),
+    'MAX_BATCH': 64,
+    'TIMEOUT': 5.0,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,16 +240,48 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authapp.authentication.CachedJWTAuthentication',
     ),
+    # reverse proxies in front of the app; IP throttles only read X-Forwarded-For past that many hops
+    'NUM_PROXIES': env.int("NUM_PROXIES", default=0),
+    # orjson-backed JSON (stock encoder without orjson); MessagePack for clients sending
+    # Accept: application/msgpack, offered when msgpack is installed (both are in requirements.txt)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ) + (('core.renderers.MessagePackRenderer',) if find_spec('msgpack') else ()),
+}
+
+# Per-route latency, query and serialization histograms, served at /api/core/metrics/ (see core/metrics.py).
+# Set PROFILE_SLOW_MS to sample request stacks and keep the ones of requests slower than that.
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'PROFILE_SLOW_MS': env.int("REQUEST_PROFILE_SLOW_MS", default=None),
+    'PROFILE_INTERVAL_MS': 5,
+    'PROFILE_KEEP': 50,
+}
+
+# Per-user settings and emergency contacts cached for the SOS path (see core/usercache.py)
+USER_RECORD_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
 }
 
 # JWT settings
 from datetime import timedelta
 
+# validated tokens and their users, cached per process (see authapp/authentication.py);
+# revocations are not cached, they are read from the token blacklist on every request
+JWT_AUTH_CACHE = {
+    'MAX_ENTRIES': 10_000,
+    'MAX_TTL_SECONDS': 300,
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30), 
     'REFRESH_TOKEN_LIFETIME': timedelta(days=90),
     'ROTATE_REFRESH_TOKENS': True,
+    # a rotated refresh token cannot be replayed
+    'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
 }
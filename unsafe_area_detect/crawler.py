@@ -0,0 +1,296 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin, urlparse
+
+
+def fingerprint(url):
+    url, _ = urldefrag(url.strip())
+    parts = urlparse(url)
+    normalized = f"{parts.netloc.lower().removeprefix('www.')}{parts.path.rstrip('/')}?{parts.query}"
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+class FingerprintStore:
+    """Set of seen URL fingerprints, appended to a file as they are added so a crash loses nothing."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._seen = set()
+        if self.path.exists():
+            self._seen.update(line.strip() for line in self.path.read_text().splitlines() if line.strip())
+        self._file = open(self.path, 'a')
+
+    def __contains__(self, url):
+        return fingerprint(url) in self._seen
+
+    def __len__(self):
+        return len(self._seen)
+
+    def add(self, url):
+        fp = fingerprint(url)
+        if fp in self._seen:
+            return False
+        self._seen.add(fp)
+        self._file.write(fp + '\n')
+        self._file.flush()
+        return True
+
+    def close(self):
+        self._file.close()
+
+
+class AiohttpFetcher:
+    def __init__(self, timeout=20, retries=2, headers=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = headers or {'User-Agent': 'Mozilla/5.0 (compatible; we-alert-crawler)'}
+        self._session = None
+
+    async def __aenter__(self):
+        import aiohttp
+        self._session = aiohttp.ClientSession(
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def fetch(self, url):
+        """Return the page text, or None for a missing page."""
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._session.get(url) as response:
+                    if response.status == 404:
+                        return None
+                    response.raise_for_status()
+                    return await response.text()
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+
+class DirectoryFetcher:
+    """Serves URLs from local files (the URL path is looked up under `root`), for tests and offline runs."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def fetch(self, url):
+        path = self.root / urlparse(url).path.lstrip('/')
+        if not path.is_file():
+            return None
+        return await asyncio.to_thread(path.read_text)
+
+
+class _LinkParser(HTMLParser):
+    # hrefs of <a> tags inside any element carrying `container_class`
+    # void elements have no end tag, so they must not count towards the nesting depth
+    VOID = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    def __init__(self, container_class):
+        super().__init__()
+        self.container_class = container_class
+        self.depth = 0
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.VOID:
+            return
+        if self.depth:
+            self.depth += 1
+        elif self.container_class in (attrs.get('class') or '').split():
+            self.depth = 1
+        if self.depth and tag == 'a' and attrs.get('href'):
+            self.links.append(attrs['href'])
+
+    def handle_endtag(self, tag):
+        if self.depth and tag not in self.VOID:
+            self.depth -= 1
+
+
+class _ArticleParser(HTMLParser):
+    SKIPPED = {'script', 'style', 'noscript', 'nav', 'footer', 'header', 'aside'}
+
+    def __init__(self):
+        super().__init__()
+        self.title = ''
+        self.published = ''
+        self.paragraphs = []
+        self._in_title = False
+        self._in_p = False
+        self._skip = 0
+        self._buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIPPED:
+            self._skip += 1
+        elif tag == 'h1' and not self.title:
+            self._in_title = True
+        elif tag == 'p' and not self._skip:
+            self._in_p = True
+            self._buffer = []
+        elif tag == 'meta' and attrs.get('property') in ('article:published_time', 'og:published_time'):
+            self.published = attrs.get('content') or self.published
+        elif tag == 'meta' and attrs.get('itemprop') == 'datePublished':
+            self.published = self.published or attrs.get('content') or ''
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED and self._skip:
+            self._skip -= 1
+        elif tag == 'h1':
+            self._in_title = False
+        elif tag == 'p' and self._in_p:
+            self._in_p = False
+            text = ' '.join(''.join(self._buffer).split())
+            if text:
+                self.paragraphs.append(text)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._in_p and not self._skip:
+            self._buffer.append(data)
+
+
+def extract_links(html, base_url, container_class):
+    parser = _LinkParser(container_class)
+    parser.feed(html)
+    return [urljoin(base_url, href) for href in parser.links]
+
+
+def extract_article(html):
+    parser = _ArticleParser()
+    parser.feed(html)
+    return {
+        'title': ' '.join(parser.title.split()),
+        'published': parser.published,
+        'body': '\n'.join(parser.paragraphs),
+    }
+
+
+class Crawler:
+    """Crawls a paginated listing for article links, then fetches each article.
+
+    Everything written to `output_dir` is appended as it is produced:
+      urls.csv          article URLs, in discovery order
+      seen.txt          URL fingerprints, the dedup store
+      articles.jsonl    one parsed article per line
+      fetched.txt       fingerprints of articles already downloaded
+      state.json        last listing page fully processed
+    Rerunning with the same directory resumes where the previous run stopped.
+    """
+
+    def __init__(self, fetcher, listing_url, output_dir, link_class='SrchLstPg_ttl-lnk',
+                 concurrency=8, max_pages=None, fetch_articles=True):
+        self.fetcher = fetcher
+        self.listing_url = listing_url
+        self.output_dir = Path(output_dir)
+        self.link_class = link_class
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.fetch_articles = fetch_articles
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.output_dir / 'state.json'
+        self.state = json.loads(self.state_path.read_text()) if self.state_path.exists() else {'last_page': 0}
+        self.seen = FingerprintStore(self.output_dir / 'seen.txt')
+        self.fetched = FingerprintStore(self.output_dir / 'fetched.txt')
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.state_path)
+
+    async def _fetch(self, url):
+        async with self._semaphore:
+            return await self.fetcher.fetch(url)
+
+    async def crawl_listing(self, urls_writer, urls_file):
+        """Fetch listing pages `concurrency` at a time until a page has no links."""
+        new_urls = []
+        page = self.state['last_page'] + 1
+        while self.max_pages is None or page <= self.max_pages:
+            last = page + self.concurrency if self.max_pages is None else min(page + self.concurrency, self.max_pages + 1)
+            pages = list(range(page, last))
+            results = await asyncio.gather(*(self._fetch(self.listing_url.format(page=p)) for p in pages),
+                                           return_exceptions=True)
+            exhausted = False
+            for p, html in zip(pages, results):
+                if isinstance(html, Exception):
+                    # stop before this page; state still points at the page before, so a rerun retries it
+                    print(f"Failed to fetch listing page {p}: {html}")
+                    exhausted = True
+                    break
+                links = extract_links(html, self.listing_url.format(page=p), self.link_class) if html else []
+                if not links:
+                    exhausted = True
+                    break
+                fresh = {}
+                for url in links:
+                    if url not in self.seen:
+                        fresh.setdefault(fingerprint(url), url)
+                fresh = list(fresh.values())
+                urls_writer.writerows([url] for url in fresh)
+                urls_file.flush()
+                # fingerprints are recorded only after the URLs are on disk
+                for url in fresh:
+                    self.seen.add(url)
+                new_urls.extend(fresh)
+                self.state['last_page'] = p
+                self._save_state()
+                print(f"Page {p} complete. Total URLs so far: {len(self.seen)}")
+            if exhausted:
+                break
+            page = last
+        return new_urls
+
+    async def fetch_article(self, url, articles_file):
+        try:
+            html = await self._fetch(url)
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            return False
+        if html is None:
+            return False
+        articles_file.write(json.dumps({'url': url, **extract_article(html)}) + '\n')
+        articles_file.flush()
+        self.fetched.add(url)
+        return True
+
+    async def run(self):
+        urls_path = self.output_dir / 'urls.csv'
+        new_file = not urls_path.exists()
+        async with self.fetcher:
+            with open(urls_path, 'a', newline='') as urls_file, \
+                    open(self.output_dir / 'articles.jsonl', 'a') as articles_file:
+                writer = csv.writer(urls_file)
+                if new_file:
+                    writer.writerow(['URL'])
+                await self.crawl_listing(writer, urls_file)
+                fetched = 0
+                if self.fetch_articles:
+                    with open(urls_path, newline='') as f:
+                        pending = [row[0] for row in list(csv.reader(f))[1:] if row and row[0] not in self.fetched]
+                    done = await asyncio.gather(*(self.fetch_article(url, articles_file) for url in pending))
+                    fetched = sum(done)
+        self.seen.close()
+        self.fetched.close()
+        print(f"Crawl complete. {len(self.seen)} unique URLs, {fetched} articles fetched this run.")
+        return len(self.seen), fetched
+
@@ -0,0 +1,109 @@
+# python -m unittest tests  (from this directory)
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from crawler import Crawler, DirectoryFetcher, extract_article, extract_links
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+LISTING_URL = 'https://www.ndtv.com/topic/page-{page}.html'
+
+
+class FlakyFetcher(DirectoryFetcher):
+    """DirectoryFetcher that raises for the given URLs."""
+
+    def __init__(self, root, failing):
+        super().__init__(root)
+        self.failing = set(failing)
+
+    async def fetch(self, url):
+        if url in self.failing:
+            raise ConnectionError(f"refused: {url}")
+        return await super().fetch(url)
+
+
+class ParserTests(unittest.TestCase):
+    def test_links_from_listing_fixture(self):
+        html = (FIXTURES / 'topic' / 'page-1.html').read_text()
+        links = extract_links(html, 'https://www.ndtv.com/topic/page-1.html', 'SrchLstPg_ttl-lnk')
+        self.assertEqual(links, [
+            'https://www.ndtv.com/delhi-news/man-arrested-for-assault-near-saket-metro-1001',
+            'https://www.ndtv.com/delhi-news/woman-harassed-in-lajpat-nagar-market-1002',
+            'https://www.ndtv.com/delhi-news/man-arrested-for-assault-near-saket-metro-1001#comments',
+        ])
+
+    def test_void_elements_do_not_extend_the_container(self):
+        html = (
+            '<div class="item"><img src="a.png"><br><input type="text"><a href="/in">in</a></div>'
+            '<a href="/out">out</a>'
+            '<div class="item"><img src="b.png"/><a href="/in-2">in</a></div>'
+            '<p><a href="/out-2">out</a></p>'
+        )
+        self.assertEqual(extract_links(html, 'https://example.com/', 'item'),
+                         ['https://example.com/in', 'https://example.com/in-2'])
+
+    def test_article_fixture(self):
+        html = (FIXTURES / 'delhi-news' / 'man-arrested-for-assault-near-saket-metro-1001').read_text()
+        article = extract_article(html)
+        self.assertEqual(article['title'], 'Man Arrested For Assault Near Saket Metro Station')
+        self.assertEqual(article['published'], '2024-03-12T21:40:00+05:30')
+        paragraphs = article['body'].split('\n')
+        self.assertEqual(len(paragraphs), 2)
+        self.assertTrue(paragraphs[0].startswith('New Delhi: A 32-year-old man'))
+        self.assertNotIn('NDTV navigation', article['body'])
+        self.assertNotIn('Copyright', article['body'])
+
+
+class CrawlerTests(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+
+    def crawl(self, fetcher=None, **kwargs):
+        crawler = Crawler(fetcher or DirectoryFetcher(FIXTURES), LISTING_URL, self.output.name, **kwargs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(crawler.run())
+
+    def read(self, name):
+        return (Path(self.output.name) / name).read_text()
+
+    def test_crawls_fixtures(self):
+        self.assertEqual(self.crawl(), (3, 3))
+        urls = self.read('urls.csv').split()
+        self.assertEqual(urls[0], 'URL')
+        # the #comments link is the same article as the first one
+        self.assertEqual(len(urls), 4)
+        articles = [json.loads(line) for line in self.read('articles.jsonl').splitlines()]
+        self.assertEqual(sorted(a['title'] for a in articles), [
+            'Man Arrested For Assault Near Saket Metro Station',
+            'Teen Stalked In Dwarka Sector 10, Accused Held',
+            'Woman Harassed In Lajpat Nagar Market',
+        ])
+        self.assertEqual(json.loads(self.read('state.json')), {'last_page': 2})
+
+    def test_rerun_resumes_without_duplicates(self):
+        self.crawl()
+        self.assertEqual(self.crawl(), (3, 0))
+        self.assertEqual(len(self.read('urls.csv').split()), 4)
+        self.assertEqual(len(self.read('articles.jsonl').splitlines()), 3)
+
+    def test_failed_listing_page_is_retried_on_the_next_run(self):
+        fetcher = FlakyFetcher(FIXTURES, [LISTING_URL.format(page=2)])
+        self.assertEqual(self.crawl(fetcher), (2, 2))
+        self.assertEqual(json.loads(self.read('state.json')), {'last_page': 1})
+
+        self.assertEqual(self.crawl(), (3, 1))
+        self.assertEqual(json.loads(self.read('state.json')), {'last_page': 2})
+
+    def test_failed_article_is_skipped(self):
+        failing = 'https://www.ndtv.com/delhi-news/teen-stalked-in-dwarka-sector-10-1003'
+        self.assertEqual(self.crawl(FlakyFetcher(FIXTURES, [failing])), (3, 2))
+        self.assertEqual(self.crawl(), (3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()